@@ -0,0 +1,123 @@
+# analytics.py – vectorised performance metrics for one project
+#
+# A project's profit / rr / date / symbol / session columns are read once
+# into NumPy arrays (numeric typing is done in SQL) and every metric is a
+# whole-array operation: no per-trade Python loops. Sharpe and Sortino are
+# per trade (mean P/L over its deviation), not annualised.
+
+import numpy as np
+
+EQUITY_POINTS = 500      # equity/drawdown curves are downsampled to this
+R_BIN_WIDTH = 0.5
+MAX_R_BINS = 40
+
+LOAD_SQL = """SELECT date, symbol, session_name,
+    CASE WHEN typeof(profit) IN ('integer', 'real') THEN profit END,
+    CASE WHEN typeof(rr) IN ('integer', 'real') THEN rr
+         WHEN trim(rr) = '' OR trim(rr) GLOB '*[^0-9.+-]*' THEN NULL
+         ELSE CAST(trim(rr) AS REAL) END
+    FROM trades WHERE project_id=? ORDER BY date, id"""
+
+
+ROW_DTYPE = np.dtype([("date", object), ("symbol", object), ("session", object),
+                      ("profit", float), ("rr", float)])     # None -> nan
+
+
+def to_arrays(rows):
+    """Column arrays from (date, symbol, session, profit, rr) rows.
+
+    np.fromiter consumes a cursor directly, so no list of row tuples is
+    ever built.
+    """
+    table = np.fromiter(rows, dtype=ROW_DTYPE)
+    return {name: table[name] for name in ROW_DTYPE.names}
+
+
+def load(db, project_id):
+    cur = db.cursor()
+    cur.row_factory = None          # plain tuples, whatever the connection uses
+    return to_arrays(cur.execute(LOAD_SQL, (project_id,)))
+
+
+def _runs(mask):
+    """Length of the longest run of True in `mask`."""
+    if not mask.any():
+        return 0
+    padded = np.concatenate(([False], mask, [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    return int((edges[1::2] - edges[::2]).max())
+
+
+def _sample(idx_count, points):
+    if idx_count <= points:
+        return np.arange(idx_count)
+    return np.unique(np.linspace(0, idx_count - 1, points).astype(int))
+
+
+def _grouped(keys, profit):
+    # Factorise through a dict (C-level lookups) rather than sorting strings
+    codes = {k: i for i, k in enumerate(dict.fromkeys(keys))}
+    inverse = np.fromiter(map(codes.__getitem__, keys), dtype=np.intp, count=len(keys))
+    counts = np.bincount(inverse, minlength=len(codes))
+    totals = np.bincount(inverse, weights=profit, minlength=len(codes))
+    wins = np.bincount(inverse, weights=profit > 0, minlength=len(codes))
+    return {("-" if k is None else str(k)): {"trades": int(c), "profit": round(float(t), 2),
+                                            "win_rate": round(float(w / c * 100), 2)}
+            for k, c, t, w in zip(codes, counts, totals, wins)}
+
+
+def compute(data, points=EQUITY_POINTS):
+    raw = data["profit"]
+    n = len(raw)
+    if n == 0:
+        return {"trades": 0}
+    p = np.nan_to_num(raw)                       # trades without P/L count as flat
+    equity = np.cumsum(p)
+    peak = np.maximum.accumulate(np.maximum(equity, 0))
+    drawdown = equity - peak
+
+    wins, losses = p > 0, p < 0
+    std = p.std(ddof=1) if n > 1 else 0.0
+    downside = np.sqrt(np.mean(np.minimum(p, 0) ** 2))
+    avg_win = p[wins].mean() if wins.any() else 0.0
+    avg_loss = -p[losses].mean() if losses.any() else 0.0
+
+    r = data["rr"][np.isfinite(data["rr"])]
+    if len(r):
+        lo, hi = np.floor(r.min()), np.ceil(r.max())
+        if hi == lo:
+            hi = lo + R_BIN_WIDTH
+        nbins = min(MAX_R_BINS, int(np.ceil((hi - lo) / R_BIN_WIDTH)))
+        counts, edges = np.histogram(r, bins=nbins, range=(lo, hi))
+        r_dist = {"edges": np.round(edges, 2).tolist(), "counts": counts.tolist(),
+                  "mean": round(float(r.mean()), 2), "median": round(float(np.median(r)), 2)}
+    else:
+        r_dist = {"edges": [], "counts": [], "mean": None, "median": None}
+
+    idx = _sample(n, points)
+    return {
+        "trades": n,
+        "net_profit": round(float(equity[-1]), 2),
+        "expectancy": round(float(p.mean()), 2),
+        "win_rate": round(float(wins.mean() * 100), 2),
+        "avg_win": round(float(avg_win), 2),
+        "avg_loss": round(float(avg_loss), 2),
+        "payoff_ratio": round(float(avg_win / avg_loss), 2) if avg_loss else None,
+        "max_drawdown": round(float(-drawdown.min()), 2),
+        "sharpe": round(float(p.mean() / std), 3) if std else None,
+        "sortino": round(float(p.mean() / downside), 3) if downside else None,
+        "longest_win_streak": _runs(wins),
+        "longest_loss_streak": _runs(losses),
+        "r_multiple": r_dist,
+        "by_symbol": _grouped(data["symbol"], p),
+        "by_session": _grouped(data["session"], p),
+        "equity_curve": {
+            "date": data["date"][idx].tolist(),
+            "equity": np.round(equity[idx], 2).tolist(),
+            "drawdown": np.round(drawdown[idx], 2).tolist(),
+        },
+    }
+
+
+def project_analytics(db, project_id, points=EQUITY_POINTS):
+    return compute(load(db, project_id), points)
@@ -0,0 +1,135 @@
+# api.py – batch writes for the JSON API
+#
+# Bots authenticate with a bearer token (`flask create-token`) and send
+# trades or setups in batches. Every record carries a client_id, unique
+# per project (trades) or per user (setups): a record whose client_id is
+# new is inserted and one already seen updates that row with the fields
+# given, so re-sending a batch after a timeout is harmless. A batch is
+# validated up front and written in one transaction, all or nothing.
+
+import hashlib, secrets
+import stats
+
+TRADE_FIELDS = ("date", "symbol", "direction", "entry", "exit", "lot_size", "rr",
+                "session_name", "result", "profit", "notes")
+SETUP_FIELDS = ("date", "title", "entry_notes", "result", "review_notes", "session_name",
+                "timeframe", "market", "entry_criteria", "exit_criteria", "r_multiple", "profit")
+TRADE_REQUIRED = ("date", "symbol", "direction")
+SETUP_REQUIRED = ("date", "title")
+CLIENT_ID_MAX = 64
+
+
+class BatchError(ValueError):
+    def __init__(self, message, index=None):
+        super().__init__(message)
+        self.index = index
+
+    def body(self):
+        return {"error": str(self)} if self.index is None else {"error": str(self), "index": self.index}
+
+
+def configure(app):
+    app.config.setdefault("API_MAX_BATCH", 1000)
+
+
+# ── tokens ──
+
+def _digest(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def create_token(db, user_id, name=None):
+    """A new token for `user_id`; only its hash is kept, so show it now or never."""
+    token = secrets.token_urlsafe(32)
+    db.execute("INSERT INTO api_tokens (user_id, token_hash, name) VALUES (?, ?, ?)",
+               (user_id, _digest(token), name))
+    return token
+
+
+def token_user(db, header):
+    """(token id, user id) for an `Authorization: Bearer …` header, or None."""
+    scheme, _, token = (header or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return db.execute("""SELECT t.id, t.user_id FROM api_tokens t JOIN users u ON u.id = t.user_id
+        WHERE t.token_hash=?""", (_digest(token.strip()),)).fetchone()
+
+
+def touch(db, token_id):
+    db.execute("UPDATE api_tokens SET last_used_at=CURRENT_TIMESTAMP WHERE id=?", (token_id,))
+
+
+# ── batches ──
+
+def is_int(v):
+    return isinstance(v, int) and not isinstance(v, bool)     # JSON true/false arrive as bool, an int subclass
+
+
+def validate(records, fields, required, max_batch):
+    if not isinstance(records, list) or not records:
+        raise BatchError("expected a non-empty list of records")
+    if len(records) > max_batch:
+        raise BatchError(f"at most {max_batch} records per batch")
+    allowed, seen = set(fields) | {"client_id"}, set()
+    for i, r in enumerate(records):
+        if not isinstance(r, dict):
+            raise BatchError("expected an object", i)
+        cid = r.get("client_id")
+        if not isinstance(cid, str) or not 0 < len(cid) <= CLIENT_ID_MAX:
+            raise BatchError(f"client_id must be a string of 1-{CLIENT_ID_MAX} characters", i)
+        if cid in seen:
+            raise BatchError(f"client_id {cid!r} appears twice", i)
+        seen.add(cid)
+        unknown = set(r) - allowed
+        if unknown:
+            raise BatchError(f"unknown field(s): {', '.join(sorted(unknown))}", i)
+        for k, v in r.items():
+            if v is not None and (isinstance(v, bool) or not isinstance(v, (str, int, float))):
+                raise BatchError(f"{k} must be a string or a number", i)
+
+
+def _existing(db, table, scope_col, scope_id, fields, client_ids):
+    rows = db.execute(f"""SELECT {', '.join(('id', 'client_id', *fields))} FROM {table}
+        WHERE {scope_col}=? AND client_id IN ({', '.join('?' * len(client_ids))})""",
+                      (scope_id, *client_ids)).fetchall()
+    return {r["client_id"]: r for r in rows}
+
+
+def _upsert(db, table, scope_col, scope_id, fields, required, records):
+    """Insert new client_ids and update changed ones; returns (created, [(old, new)], ids in input order)."""
+    existing = _existing(db, table, scope_col, scope_id, fields, [r["client_id"] for r in records])
+    created = [r for r in records if r["client_id"] not in existing]
+    for r in created:
+        missing = [f for f in required if r.get(f) in (None, "")]
+        if missing:
+            raise BatchError(f"new records need {', '.join(missing)}", records.index(r))
+    updated = [(old, {**dict(old), **r}) for old, r in
+               ((existing[r["client_id"]], r) for r in records if r["client_id"] in existing)
+               if any(r[f] != old[f] for f in fields if f in r)]     # a re-sent record changes nothing
+
+    cols = (scope_col, "client_id", *fields)
+    db.executemany(f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                   [(scope_id, r["client_id"], *(r.get(f) for f in fields)) for r in created])
+    db.executemany(f"UPDATE {table} SET {', '.join(f'{f}=?' for f in fields)} WHERE id=?",
+                   [(*(new[f] for f in fields), old["id"]) for old, new in updated])
+
+    ids = {cid: r["id"] for cid, r in existing.items()}
+    if created:
+        new = _existing(db, table, scope_col, scope_id, (), [r["client_id"] for r in created])
+        ids.update((cid, r["id"]) for cid, r in new.items())
+    return created, updated, [ids[r["client_id"]] for r in records]
+
+
+def upsert_trades(db, project_id, records):
+    created, updated, ids = _upsert(db, "trades", "project_id", project_id, TRADE_FIELDS, TRADE_REQUIRED, records)
+    if created:
+        stats.apply_batch(db, project_id, [{k: r.get(k) for k in ("result", "profit", "rr")} for r in created])
+    for old, new in updated:
+        stats.apply_trade(db, project_id, old, -1)
+        stats.apply_trade(db, project_id, new)
+    return {"created": len(created), "updated": len(updated), "ids": ids}
+
+
+def upsert_setups(db, user_id, records):
+    created, updated, ids = _upsert(db, "backtest_setups", "user_id", user_id, SETUP_FIELDS, SETUP_REQUIRED, records)
+    return {"created": len(created), "updated": len(updated), "ids": ids}
@@ -1,27 +1,123 @@
-import sqlite3, io
+import sqlite3, io, os, re, glob
 from flask import (
     Flask, render_template, redirect, url_for, request,
-    session, send_file, flash, g
+    session, send_file, flash, g, stream_template, Response, stream_with_context, jsonify
 )
 from werkzeug.security import generate_password_hash, check_password_hash
+from jinja2 import FileSystemBytecodeCache
 from functools import wraps
+import click
+import stats, image_store, thumbnails, db_pool, importer, exporter, reports, charts, search, cache, profiling, uploads, api, rollups, tenancy, maintenance, compression
+# numpy-backed modules (analytics, replay), Pillow, matplotlib, alembic and
+# pyarrow are imported where they're used, so a worker boots without them
 
 app = Flask(__name__)
 app.secret_key = "your_secret_key"
+app.config.setdefault("PAGE_SIZE", 50)
+app.config.setdefault("IMAGE_DIR", "images")
+app.config.setdefault("OHLC_DIR", "data/ohlc")
+app.config.setdefault("JINJA_CACHE_DIR", os.path.join(app.root_path, ".jinja_cache"))
+compression.configure(app)          # first, so its after_request runs last
+thumbnails.configure(app)
+charts.configure(app)
+cache.configure(app)
+profiling.configure(app)
+api.configure(app)
+tenancy.configure(app)
+db_pool.configure(app)
 DB_NAME = "journal.db"
 
+# Compiled templates persist across restarts (`flask compile-templates` fills the cache at build time)
+try:
+    os.makedirs(app.config["JINJA_CACHE_DIR"], exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config["JINJA_CACHE_DIR"])
+except OSError:
+    pass                            # read-only checkout: templates compile in memory as before
+
+# Columns the trade tables actually render; screenshots are only tested for
+# presence (legacy BLOBs included) so their bytes are never read.
+TRADE_LIST_COLS = """t.id, t.project_id, t.date, t.symbol, t.direction, t.entry, t.exit,
+    t.lot_size, t.rr, t.session_name, t.result, t.profit, t.screenshot_hash,
+    (t.screenshot_hash IS NOT NULL OR t.screenshot IS NOT NULL) AS has_screenshot"""
+SETUP_LIST_COLS = "s.id, s.date, s.title, s.timeframe, s.result, s.profit"
+
 # ────────────── DB helper ──────────────
+def db_path(user_id=None):
+    """The file holding user_id's data: their own in tenant mode (created on first use), else DB_NAME."""
+    if user_id is None or not tenancy.enabled(app.config):
+        return DB_NAME
+    path = tenancy.path(app.config, user_id)
+    if not os.path.exists(path):
+        tenancy.create(app.config, user_id, DB_NAME, init_db)
+    return path
+
+def open_db(path):
+    dbs = g.setdefault("dbs", {})
+    if path not in dbs:
+        size = None if path == DB_NAME else app.config["TENANT_POOL_SIZE"]
+        dbs[path] = profiling.wrap(db_pool.get_pool(path, app.config, size).acquire())
+    return dbs[path]
+
 def get_db():
-    if "db" not in g:
-        g.db = sqlite3.connect(DB_NAME)
-        g.db.row_factory = sqlite3.Row
-    return g.db
+    """The signed-in user's database (see tenancy.py); the catalog when nobody is."""
+    return open_db(db_path(tenancy.current()))
+
+def get_catalog():
+    """Where users and api_tokens live; the same connection as get_db() in single-file mode."""
+    return open_db(DB_NAME)
+
+def user_db(user_id):
+    return open_db(db_path(user_id))
+
+def commit_all():
+    for db in g.get("dbs", {}).values():
+        db.commit()
+
+@app.errorhandler(db_pool.Retiring)
+def account_retired(_):
+    session.clear()                 # the account was deleted while signed in
+    flash("This account has been deleted.")
+    return redirect(url_for("login"))
 
 @app.teardown_appcontext
 def close_db(_):
-    db = g.pop("db", None)
-    if db:
-        db.close()
+    for path, db in g.pop("dbs", {}).items():
+        db_pool.get_pool(path, app.config).release(profiling.unwrap(db))
+
+uploads.configure(app, get_db)
+maintenance.configure(app, lambda: each_db(catalog=True))
+
+def keyset_page(db, sql, params, prefix="", alias="t"):
+    """Run `sql` (ending in a WHERE clause) newest-first, one page at a time.
+
+    Pages are addressed by the (date, id) of the last row shown rather than
+    an OFFSET, so deep pages cost the same as the first one.
+    """
+    size = app.config["PAGE_SIZE"]
+    before_date = request.args.get(prefix + "before_date")
+    before_id = request.args.get(prefix + "before_id", type=int)
+    params = tuple(params)
+    if before_id is not None:
+        if before_date is None:
+            sql += f" AND {alias}.date IS NULL AND {alias}.id < ?"
+            params += (before_id,)
+        else:
+            sql += f" AND (({alias}.date, {alias}.id) < (?, ?) OR {alias}.date IS NULL)"
+            params += (before_date, before_id)
+    sql += f" ORDER BY {alias}.date DESC, {alias}.id DESC LIMIT ?"
+    rows = db.execute(sql, params + (size + 1,)).fetchall()
+
+    args = {k: v for k, v in request.args.items() if not k.startswith(prefix + "before_")}
+    pager = {"first": None, "next": None}
+    if before_id is not None:
+        pager["first"] = url_for(request.endpoint, **request.view_args, **args)
+    if len(rows) > size:
+        rows = rows[:size]
+        cursor = {prefix + "before_id": rows[-1]["id"]}
+        if rows[-1]["date"] is not None:
+            cursor[prefix + "before_date"] = rows[-1]["date"]
+        pager["next"] = url_for(request.endpoint, **request.view_args, **args, **cursor)
+    return rows, pager
 
 # ────────────── Auth decorators ──────────────
 def login_required(f):
@@ -40,6 +136,18 @@ def admin_required(f):
         return f(*a, **kw)
     return wrap
 
+def token_required(f):
+    """For the JSON API: a bearer token instead of a session; sets g.api_user."""
+    @wraps(f)
+    def wrap(*a, **kw):
+        row = api.token_user(get_catalog(), request.headers.get("Authorization"))
+        if row is None:
+            return jsonify(error="Invalid or missing API token"), 401
+        g.api_token, g.api_user = row
+        g.tenant = g.api_user
+        return f(*a, **kw)
+    return wrap
+
 # ────────────── Routes ──────────────
 @app.route("/")
 def home():
@@ -56,7 +164,7 @@ def register():
             return redirect(url_for("register"))
 
         email = f.get("email")
-        db = get_db()
+        db = get_catalog()
 
         # Check if email already exists
         existing = db.execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
@@ -86,7 +194,7 @@ def register():
 def login():
     if request.method == "POST":
         f = request.form
-        user = get_db().execute("SELECT * FROM users WHERE username=?", (f["username"],)).fetchone()
+        user = get_catalog().execute("SELECT * FROM users WHERE username=?", (f["username"],)).fetchone()
         if user and check_password_hash(user["password_hash"], f["password"]):
             session["user_id"] = user["id"]
             session["role"] = user["role"]
@@ -103,18 +211,62 @@ def logout():
 @app.route("/admin")
 @admin_required
 def admin_panel():
-    users = get_db().execute("SELECT id, username, role FROM users ORDER BY id").fetchall()
+    users = get_catalog().execute("SELECT id, username, role FROM users ORDER BY id").fetchall()
     return render_template("admin_panel.html", users=users)
 
+@app.route("/admin/overview")
+@admin_required
+def admin_overview():
+    db = get_catalog()
+    days = request.args.get("days", 30, type=int)
+    if days not in rollups.PERIODS:
+        days = 30
+    sort = request.args.get("sort", "net")
+    since = db.execute("SELECT date('now', ?)", (f"-{days - 1} days",)).fetchone()[0]
+    if tenancy.enabled(app.config):
+        users = db.execute("SELECT id, username, role FROM users").fetchall()
+        ids = {u["id"] for u in users}
+        parts = tenancy.fan_out(app.config, lambda tdb, _: rollups.overview(tdb, since, sort),
+                                [uid for uid in tenancy.tenants(app.config) if uid in ids])
+        view = rollups.merge(parts, users, sort)
+    else:
+        view = rollups.overview(db, since, sort)
+    return render_template("admin_overview.html", days=days, periods=rollups.PERIODS, sort=sort,
+                           sorts=rollups.USER_SORTS, **view)
+
+@app.route("/admin/maintenance")
+@admin_required
+def admin_maintenance():
+    dbs = each_db(catalog=True)
+    return render_template("admin_maintenance.html", tasks=maintenance.status(get_catalog(), app.config),
+                           files=maintenance.file_stats(dbs), backups=maintenance.backups(app.config),
+                           enabled=app.config["MAINTENANCE_ENABLED"])
+
+@app.route("/admin/maintenance/<task>", methods=["POST"])
+@admin_required
+def run_maintenance(task):
+    if task not in maintenance.TASKS:
+        return "Unknown task", 404
+    db = get_catalog()
+    maintenance.request(db, task)
+    db.commit()
+    maintenance.wake()
+    if app.config["MAINTENANCE_ENABLED"]:
+        flash(f"🧹 {task} will run within {app.config['MAINTENANCE_POLL']}s.")
+    else:
+        flash(f"⚠️ The scheduler is off; run `flask maintenance {task}`.")
+    return redirect(url_for("admin_maintenance"))
+
 @app.route("/admin/toggle/<int:uid>", methods=["POST"])
 @admin_required
 def toggle_role(uid):
-    db = get_db()
+    db = get_catalog()
     user = db.execute("SELECT * FROM users WHERE id=?", (uid,)).fetchone()
     if user:
         new_role = "user" if user["role"] == "admin" else "admin"
         db.execute("UPDATE users SET role=? WHERE id=?", (new_role, uid))
-        db.commit()
+        cache.bump(user_db(uid), uid)
+        commit_all()
         flash(f"{user['username']} updated to {new_role}")
     return redirect(url_for("admin_panel"))
 
@@ -124,38 +276,63 @@ def delete_user(uid):
     if uid == session.get("user_id"):
         flash("You can't delete yourself.")
         return redirect(url_for("admin_panel"))
-    db = get_db()
+    db = get_catalog()
     db.execute("DELETE FROM users WHERE id=?", (uid,))
-    db.commit()
+    db.execute("DELETE FROM api_tokens WHERE user_id=?", (uid,))
+    if tenancy.enabled(app.config):
+        path = tenancy.path(app.config, uid)
+        if os.path.exists(path):
+            tenant = sqlite3.connect(path)
+            cache.carry(db, uid, cache.version(tenant, uid))    # the file goes; its cached pages must not return
+            tenant.close()
+        db.commit()
+        if not tenancy.retire(app.config, uid):     # another worker still has the file open
+            maintenance.request(db, "gc")
+            db.commit()
+            maintenance.wake()
+    else:
+        cache.bump(db, uid)
+        maintenance.request(db, "gc")       # their projects, trades and setups are orphans now
+        db.commit()
+        maintenance.wake()
     flash("User deleted.")
     return redirect(url_for("admin_panel"))
 
+@app.route("/admin/cache.json")
+@admin_required
+def admin_cache_metrics():
+    return jsonify(cache.metrics())
+
 @app.route("/admin/user/<int:user_id>")
 @admin_required
 def admin_user_activity(user_id):
-    db = get_db()
-    user = db.execute("SELECT id, username FROM users WHERE id=?", (user_id,)).fetchone()
+    user = get_catalog().execute("SELECT id, username FROM users WHERE id=?", (user_id,)).fetchone()
     if not user:
         flash("User not found.")
         return redirect(url_for("admin_panel"))
-
-    trades = db.execute("""
-        SELECT t.*, p.name AS project_name
-        FROM trades t
-        JOIN projects p ON t.project_id = p.id
-        WHERE p.user_id = ?
-        ORDER BY t.date DESC
-    """, (user_id,)).fetchall()
-
-    setups = db.execute("""SELECT * FROM backtest_setups WHERE user_id = ? ORDER BY date DESC""", (user_id,)).fetchall()
-
-    return render_template("admin_user_activity.html", user=user, trades=trades, setups=setups)
+    db = user_db(user_id)
+
+    def load():
+        trades, trades_pager = keyset_page(db, f"""
+            SELECT {TRADE_LIST_COLS}, p.name AS project_name
+            FROM trades t
+            JOIN projects p ON t.project_id = p.id
+            WHERE p.user_id = ?""", (user_id,))
+        setups, setups_pager = keyset_page(db, f"SELECT {SETUP_LIST_COLS} FROM backtest_setups s WHERE s.user_id = ?",
+                                           (user_id,), prefix="s_", alias="s")
+        return {"trades": cache.plain(trades), "setups": cache.plain(setups),
+                "trades_pager": trades_pager, "setups_pager": setups_pager}
+
+    page = cache.cached(db, user_id, "admin_user_activity", sorted(request.args.items()), load)
+    return render_template("admin_user_activity.html", user=user, **page)
 
 # ────────────── Projects ──────────────
 @app.route("/select_project")
 @login_required
 def select_project():
-    projects = get_db().execute("SELECT * FROM projects WHERE user_id=?", (session["user_id"],)).fetchall()
+    db, uid = get_db(), session["user_id"]
+    projects = cache.cached(db, uid, "select_project", (), lambda: cache.plain(
+        db.execute("SELECT * FROM projects WHERE user_id=?", (uid,))))
     return render_template("select_project.html", projects=projects)
 
 @app.route("/open_project/<int:pid>")
@@ -169,10 +346,13 @@ def open_project(pid):
 def add_project():
     if request.method == "POST":
         f = request.form
-        get_db().execute(
+        db = get_db()
+        db.execute(
             "INSERT INTO projects (user_id,name,category) VALUES (?,?,?)",
             (session["user_id"], f["name"], f["category"])
-        ).connection.commit()
+        )
+        cache.bump(db, session["user_id"])
+        db.commit()
         return redirect(url_for("select_project"))
     return render_template("add_project.html")
 
@@ -188,6 +368,7 @@ def edit_project(pid):
     if request.method == "POST":
         f = request.form
         db.execute("UPDATE projects SET name=?, category=? WHERE id=?", (f["name"], f["category"], pid))
+        cache.bump(db, session["user_id"])
         db.commit()
         flash("Project updated")
         return redirect(url_for("select_project"))
@@ -198,8 +379,18 @@ def edit_project(pid):
 @login_required
 def delete_project(pid):
     db = get_db()
+    if not db.execute("SELECT 1 FROM projects WHERE id=? AND user_id=?", (pid, session["user_id"])).fetchone():
+        flash("Project not found")
+        return redirect(url_for("select_project"))
+    for (h,) in db.execute("SELECT screenshot_hash FROM trades WHERE project_id=? AND screenshot_hash IS NOT NULL",
+                           (pid,)).fetchall():
+        image_store.release(db, h)
     db.execute("DELETE FROM trades WHERE project_id=?", (pid,))
-    db.execute("DELETE FROM projects WHERE id=? AND user_id=?", (pid, session["user_id"]))
+    db.execute("DELETE FROM projects WHERE id=?", (pid,))
+    stats.forget_project(db, pid)
+    reports.forget(pid)
+    charts.forget(image_store.root(), pid)
+    cache.bump(db, session["user_id"])
     db.commit()
     if session.get("project_id") == pid:
         session.pop("project_id")
@@ -211,47 +402,64 @@ def delete_project(pid):
 @login_required
 def dashboard():
     db = get_db()
-    trades = db.execute(
-        "SELECT * FROM trades WHERE project_id=? ORDER BY date DESC",
-        (session.get("project_id"),)
-    ).fetchall()
-
-    total_trades = len(trades)
-    wins = [t for t in trades if t["result"] == "win"]
-    losses = [t for t in trades if t["result"] == "loss"]
-    breakevens = [t for t in trades if t["result"] == "break-even"]
-
-    total_profit = sum(t["profit"] for t in trades if t["profit"] is not None)
-    avg_rr = round(
-        sum(float(t["rr"]) for t in trades if t["rr"] and "." in t["rr"] and t["rr"].count(".") == 1) / total_trades,
-        2
-    ) if total_trades else 0
-
-    avg_profit = round(total_profit / total_trades, 2) if total_trades else 0
-
-    win_rate = round(len(wins) / total_trades * 100, 2) if total_trades else 0
-    best_trade = max([t["profit"] for t in trades if t["profit"] is not None], default=0)
-    worst_trade = min([t["profit"] for t in trades if t["profit"] is not None], default=0)
-
-    win_sum = sum(t["profit"] for t in wins if t["profit"] is not None)
-    loss_sum = sum(t["profit"] for t in losses if t["profit"] is not None)
-
-    profit_factor = round(win_sum / abs(loss_sum), 2) if loss_sum else "N/A"
-
-    return render_template("dashboard.html",
-        trades=trades,
-        total_trades=total_trades,
-        win_rate=win_rate,
-        total_profit=total_profit,
-        avg_rr=avg_rr,
-        avg_profit=avg_profit,
-        win_count=len(wins),
-        loss_count=len(losses),
-        be_count=len(breakevens),
-        best_trade=best_trade,
-        worst_trade=worst_trade,
-        profit_factor=profit_factor
-    )
+    pid = session.get("project_id")
+    trades, trades_pager = keyset_page(db, f"SELECT {TRADE_LIST_COLS} FROM trades t WHERE t.project_id=?", (pid,))
+
+    return render_template("dashboard.html", trades=trades, trades_pager=trades_pager, **stats.summary(db, pid))
+
+@app.route("/project/<int:pid>/analytics.json")
+@login_required
+def project_analytics(pid):
+    db = get_db()
+    if not db.execute("SELECT 1 FROM projects WHERE id=? AND user_id=?", (pid, session["user_id"])).fetchone():
+        return jsonify(error="Project not found"), 404
+    import analytics
+    points = min(request.args.get("points", analytics.EQUITY_POINTS, type=int), 5000)
+    # Every dashboard load asks for this; the arrays are only loaded again
+    # once the project's data_version moves.
+    etag = f"analytics-{tenancy.current()}-{pid}-{stats.data_version(db, pid)}-{points}"
+    if request.if_none_match.contains_weak(etag):       # compression weakens it
+        resp = app.response_class(status=304)
+    else:
+        resp = jsonify(reports.project_analytics(db, pid, points))
+    resp.set_etag(etag)
+    resp.cache_control.private = True
+    resp.cache_control.no_cache = True
+    return resp
+
+@app.route("/project/<int:pid>/chart/<chart>.<fmt>")
+@login_required
+def project_chart(pid, chart, fmt):
+    db = get_db()
+    if not db.execute("SELECT 1 FROM projects WHERE id=? AND user_id=?", (pid, session["user_id"])).fetchone():
+        return "Project not found", 404
+    size = request.args.get("size", "md")
+    if chart not in charts.CHARTS or fmt not in charts.FORMATS or size not in charts.SIZES:
+        return "Unknown chart", 404
+    return charts.send(db, pid, chart, fmt, size, request.args.get("v"))
+
+# ────────────── Reports ──────────────
+@app.route("/reports")
+@login_required
+def project_reports():
+    db = get_db()
+    pid = session.get("project_id")
+    if not pid:
+        return redirect(url_for("select_project"))
+    by = request.args.get("by", "symbol")
+    rows_dim = request.args.get("rows", "symbol")
+    cols_dim = request.args.get("cols", "weekday")
+    measure = request.args.get("measure", "net")
+    if by not in reports.DIMENSIONS or rows_dim not in reports.DIMENSIONS \
+            or cols_dim not in reports.DIMENSIONS or measure not in reports.MEASURES:
+        flash("⚠️ Unknown report")
+        return redirect(url_for("project_reports"))
+    return render_template("reports.html", by=by, rows_dim=rows_dim, cols_dim=cols_dim, measure=measure,
+                           dimensions=reports.DIMENSIONS, measures=reports.MEASURES,
+                           breakdown=reports.breakdown(db, pid, by),
+                           pivot=reports.pivot(db, pid, rows_dim, cols_dim, measure),
+                           setups=reports.setups_breakdown(db, session["user_id"]),
+                           pid=pid, version=stats.data_version(db, pid), charts=charts.CHARTS)
 
 # ────────────── Trade Routes ──────────────
 @app.route("/trade/add", methods=["GET", "POST"])
@@ -260,13 +468,17 @@ def add_trade():
     if request.method == "POST":
         f = request.form
         file = request.files.get("screenshot")
-        get_db().execute("""INSERT INTO trades (
+        db = get_db()
+        db.execute("""INSERT INTO trades (
             project_id,date,symbol,direction,entry,exit,lot_size,rr,session_name,
-            result,profit,notes,screenshot) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+            result,profit,notes,screenshot_hash) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)""",
             (session["project_id"], f["date"], f["symbol"], f["direction"], f["entry"], f["exit"],
              f.get("lot_size"), f.get("rr"), f.get("session"), f.get("result"),
-             f.get("profit"), f.get("notes"), file.read() if file and file.filename else None)
-        ).connection.commit()
+             f.get("profit"), f.get("notes"), image_store.put(db, file) if file and file.filename else None)
+        )
+        stats.apply_trade(db, session["project_id"], {"result": f.get("result"), "profit": f.get("profit"), "rr": f.get("rr")})
+        cache.bump(db, session["user_id"])
+        db.commit()
         return redirect(url_for("dashboard"))
     return render_template("add_trade.html")
 
@@ -274,7 +486,8 @@ def add_trade():
 @login_required
 def edit_trade(tid):
     db = get_db()
-    trade = db.execute("SELECT * FROM trades WHERE id=?", (tid,)).fetchone()
+    trade = db.execute("""SELECT id, project_id, date, symbol, direction, entry, exit, lot_size, rr,
+        session_name, result, profit, notes, screenshot_hash FROM trades WHERE id=?""", (tid,)).fetchone()
     if not trade:
         flash("Trade not found")
         return redirect(url_for("dashboard"))
@@ -282,13 +495,19 @@ def edit_trade(tid):
     if request.method == "POST":
         f = request.form
         file = request.files.get("screenshot")
-        shot = file.read() if file and file.filename else trade["screenshot"]
         db.execute("""UPDATE trades SET
             date=?,symbol=?,direction=?,entry=?,exit=?,lot_size=?,rr=?,
-            session_name=?,result=?,profit=?,notes=?,screenshot=? WHERE id=?""",
+            session_name=?,result=?,profit=?,notes=? WHERE id=?""",
             (f["date"], f["symbol"], f["direction"], f["entry"], f["exit"],
              f["lot_size"], f["rr"], f["session"], f["result"],
-             f["profit"], f["notes"], shot, tid))
+             f["profit"], f["notes"], tid))
+        if file and file.filename:
+            db.execute("UPDATE trades SET screenshot_hash=?, screenshot=NULL WHERE id=?",
+                       (image_store.put(db, file), tid))
+            image_store.release(db, trade["screenshot_hash"])
+        stats.apply_trade(db, trade["project_id"], trade, -1)
+        stats.apply_trade(db, trade["project_id"], {"result": f["result"], "profit": f["profit"], "rr": f["rr"]})
+        cache.bump(db, session["user_id"])
         db.commit()
         flash("Trade updated")
         return redirect(url_for("dashboard"))
@@ -298,40 +517,102 @@ def edit_trade(tid):
 @app.route("/trade/delete/<int:tid>", methods=["POST"])
 @login_required
 def delete_trade(tid):
-    get_db().execute("DELETE FROM trades WHERE id=?", (tid,)).connection.commit()
+    db = get_db()
+    trade = db.execute("SELECT project_id, result, profit, rr, screenshot_hash FROM trades WHERE id=?",
+                       (tid,)).fetchone()
+    if trade:
+        db.execute("DELETE FROM trades WHERE id=?", (tid,))
+        stats.apply_trade(db, trade["project_id"], trade, -1)
+        image_store.release(db, trade["screenshot_hash"])
+        cache.bump(db, session["user_id"])
+        db.commit()
     flash("Trade deleted")
     return redirect(url_for("dashboard"))
 
+@app.route("/trade/import", methods=["GET", "POST"])
+@login_required
+def import_trades():
+    db = get_db()
+    pid = session.get("project_id")
+    if not db.execute("SELECT 1 FROM projects WHERE id=? AND user_id=?", (pid, session["user_id"])).fetchone():
+        flash("Open a project first.")
+        return redirect(url_for("select_project"))
+
+    if request.method == "POST":
+        file = request.files.get("statement")
+        if not file or not file.filename:
+            flash("Choose a CSV or MT4/MT5 statement to import.")
+            return redirect(url_for("import_trades"))
+        uid = session["user_id"]
+        decimal = request.form.get("decimal") if request.form.get("decimal") in (".", ",") else None
+
+        def progress():
+            for p in importer.import_trades(db, pid, file.stream, decimal=decimal):
+                cache.bump(db, uid)     # each batch is already committed
+                db.commit()
+                yield p
+
+        # Streamed so progress shows while the batches are written
+        return stream_template("import_trades.html", progress=progress())
+    return render_template("import_trades.html")
+
 @app.route("/screenshot/<int:trade_id>")
 @login_required
 def screenshot(trade_id):
-    row = get_db().execute("SELECT screenshot FROM trades WHERE id=?", (trade_id,)).fetchone()
+    db = get_db()
+    row = db.execute("SELECT screenshot_hash FROM trades WHERE id=?", (trade_id,)).fetchone()
+    if row and row["screenshot_hash"]:
+        return image_store.send(db, row["screenshot_hash"], request.args.get("v"), request.args.get("size", type=int))
+    # Not yet moved by `flask migrate-images`
+    row = db.execute("SELECT screenshot FROM trades WHERE id=?", (trade_id,)).fetchone()
     if row and row["screenshot"]:
-        return send_file(io.BytesIO(row["screenshot"]), mimetype="image/png")
+        return send_file(io.BytesIO(row["screenshot"]), mimetype=image_store.sniff_mime(row["screenshot"][:16]))
     return "No screenshot", 404
 
 # ────────────── Setups ──────────────
+def with_first_screenshot(db, rows):
+    """Attach the first screenshot and screenshot count to each setup row.
+
+    One query for the whole page rather than one per setup.
+    """
+    ids = [r["id"] for r in rows]
+    first = {}
+    if ids:
+        first = {p["setup_id"]: dict(p) for p in db.execute(f"""
+            SELECT setup_id, id, image_hash, n FROM (
+                SELECT setup_id, id, image_hash,
+                       COUNT(*) OVER w AS n, ROW_NUMBER() OVER (w ORDER BY id) AS rn
+                FROM backtest_screenshots WHERE setup_id IN ({",".join("?" * len(ids))})
+                WINDOW w AS (PARTITION BY setup_id))
+            WHERE rn = 1""", ids)}
+    return [{**dict(r), "first_shot": first.get(r["id"]),
+             "shot_count": first[r["id"]]["n"] if r["id"] in first else 0} for r in rows]
+
 @app.route("/setups")
 @login_required
 def setups():
-    db = get_db()
-    raw = db.execute("SELECT * FROM backtest_setups WHERE user_id = ? ORDER BY date DESC", (session["user_id"],)).fetchall()
-    setups = []
-    for s in raw:
-        pics = db.execute("SELECT id FROM backtest_screenshots WHERE setup_id=?", (s["id"],)).fetchall()
-        setups.append({**dict(s), "screenshots": pics})
+    db, uid = get_db(), session["user_id"]
 
-    trades = db.execute("""SELECT t.*, p.name AS project_name
-                           FROM trades t JOIN projects p ON p.id = t.project_id
-                           WHERE p.user_id = ? ORDER BY t.date DESC""", (session["user_id"],)).fetchall()
+    def load():
+        raw, setups_pager = keyset_page(db, f"SELECT {SETUP_LIST_COLS} FROM backtest_setups s WHERE s.user_id = ?",
+                                        (uid,), prefix="s_", alias="s")
+        trades, trades_pager = keyset_page(db, f"""SELECT {TRADE_LIST_COLS}, p.name AS project_name
+                               FROM trades t JOIN projects p ON p.id = t.project_id
+                               WHERE p.user_id = ?""", (uid,))
+        return {"setups": with_first_screenshot(db, raw), "trades": cache.plain(trades),
+                "setups_pager": setups_pager, "trades_pager": trades_pager}
 
-    return render_template("setups.html", trades=trades, setups=setups)
+    return render_template("setups.html", **cache.cached(db, uid, "setups", sorted(request.args.items()), load))
 
 @app.route("/setups/add", methods=["GET", "POST"])
 @login_required
 def add_backtest_setup():
     if request.method == "POST":
         f = request.form
+        # Spool the files before taking the write lock; the upload workers
+        # validate and store them once the setup row has committed.
+        spooled = [(uploads.spool(file), file.filename)
+                   for file in request.files.getlist("screenshots") if file and file.filename]
         db = get_db()
         cur = db.cursor()
 
@@ -346,25 +627,49 @@ def add_backtest_setup():
         )
         sid = cur.lastrowid
 
-        for file in request.files.getlist("screenshots"):
-            if file and file.filename:
-                cur.execute("INSERT INTO backtest_screenshots (setup_id, image, filename) VALUES (?, ?, ?)",
-                            (sid, file.read(), file.filename))
+        for path, filename in spooled:
+            uploads.enqueue(db, sid, session["user_id"], path, filename)
 
+        cache.bump(db, session["user_id"])
         db.commit()
+        if spooled:
+            uploads.notify(app, tenancy.current())
+            flash(f"⏳ Processing {len(spooled)} screenshot(s)…")
+            return redirect(url_for("view_setup", setup_id=sid))
         return redirect(url_for("setups"))
     return render_template("add_backtest_setup.html")
 
 @app.route("/setup/<int:setup_id>")
 @login_required
 def view_setup(setup_id):
-    db = get_db()
-    setup = db.execute("SELECT * FROM backtest_setups WHERE id=? AND user_id=?", (setup_id, session["user_id"])).fetchone()
-    if not setup:
+    db, uid = get_db(), session["user_id"]
+
+    def load():
+        setup = db.execute("SELECT * FROM backtest_setups WHERE id=? AND user_id=?", (setup_id, uid)).fetchone()
+        if not setup:
+            return None
+        return {"setup": dict(setup), "screenshots": cache.plain(
+            db.execute("SELECT id, image_hash FROM backtest_screenshots WHERE setup_id=?", (setup_id,))),
+            "uploads": cache.plain(uploads.status(db, setup_id))}
+
+    page = cache.cached(db, uid, "view_setup", setup_id, load)
+    if not page:
         flash("Setup not found.")
         return redirect(url_for("setups"))
-    screenshots = db.execute("SELECT id FROM backtest_screenshots WHERE setup_id=?", (setup_id,)).fetchall()
-    return render_template("view_setup.html", setup=setup, screenshots=screenshots)
+    return render_template("view_setup.html", **page)
+
+@app.route("/setup/<int:setup_id>/uploads.json")
+@login_required
+def setup_uploads(setup_id):
+    """Polled by view_setup while screenshots are being processed."""
+    db = get_db()
+    if not db.execute("SELECT 1 FROM backtest_setups WHERE id=? AND user_id=?", (setup_id, session["user_id"])).fetchone():
+        return jsonify(error="Setup not found"), 404
+    jobs = [dict(j) for j in uploads.status(db, setup_id)]
+    pending = sum(j["status"] in ("pending", "processing") for j in jobs)
+    if pending:
+        uploads.notify(app, tenancy.current())     # e.g. jobs queued before this worker restarted
+    return jsonify(pending=pending, jobs=jobs)
 
 @app.route("/setup/edit/<int:setup_id>", methods=["GET", "POST"])
 @login_required
@@ -384,6 +689,7 @@ def edit_setup(setup_id):
              f.get("session_name"), f.get("timeframe"), f.get("market"),
              f.get("entry_criteria"), f.get("exit_criteria"), f.get("r_multiple"), f.get("profit"),
              setup_id))
+        cache.bump(db, session["user_id"])
         db.commit()
         flash("Setup updated.")
         return redirect(url_for("view_setup", setup_id=setup_id))
@@ -392,63 +698,214 @@ def edit_setup(setup_id):
 @app.route("/setup_screenshot/<int:id>")
 @login_required
 def setup_screenshot(id):
-    row = get_db().execute("SELECT image FROM backtest_screenshots WHERE id=?", (id,)).fetchone()
-    if row:
-        return send_file(io.BytesIO(row["image"]), mimetype="image/png")
+    db = get_db()
+    row = db.execute("SELECT image_hash FROM backtest_screenshots WHERE id=?", (id,)).fetchone()
+    if row and row["image_hash"]:
+        return image_store.send(db, row["image_hash"], request.args.get("v"), request.args.get("size", type=int))
+    row = db.execute("SELECT image FROM backtest_screenshots WHERE id=?", (id,)).fetchone()
+    if row and row["image"]:
+        return send_file(io.BytesIO(row["image"]), mimetype=image_store.sniff_mime(row["image"][:16]))
     return "Image not found", 404
 
 @app.route("/live_trade/<int:trade_id>")
 @login_required
 def view_live_trade(trade_id):
-    db = get_db()
-    trade = db.execute("""SELECT t.*, p.name AS project_name
-                          FROM trades t JOIN projects p ON t.project_id = p.id
-                          WHERE t.id = ? AND p.user_id = ?""", (trade_id, session["user_id"])).fetchone()
+    db, uid = get_db(), session["user_id"]
+
+    def load():
+        row = db.execute(f"""SELECT {TRADE_LIST_COLS}, t.notes, p.name AS project_name
+                            FROM trades t JOIN projects p ON t.project_id = p.id
+                            WHERE t.id = ? AND p.user_id = ?""", (trade_id, uid)).fetchone()
+        return dict(row) if row else None
+
+    trade = cache.cached(db, uid, "view_live_trade", trade_id, load)
     if not trade:
         flash("Trade not found.")
         return redirect(url_for("setups"))
     return render_template("view_live_trade.html", trade=trade)
 
-# ────────────── Init DB ──────────────
-def init_db():
-    db = sqlite3.connect(DB_NAME)
-    cur = db.cursor()
-
-    cur.execute("""CREATE TABLE IF NOT EXISTS users(
-        id INTEGER PRIMARY KEY, username TEXT UNIQUE, password_hash TEXT, role TEXT DEFAULT 'user')""")
-
-    cur.execute("""CREATE TABLE IF NOT EXISTS projects(
-        id INTEGER PRIMARY KEY, user_id INT, name TEXT, category TEXT)""")
-
-    cur.execute("""CREATE TABLE IF NOT EXISTS trades(
-        id INTEGER PRIMARY KEY, project_id INT, date TEXT, symbol TEXT, direction TEXT,
-        entry REAL, exit REAL, lot_size REAL, rr TEXT, session_name TEXT,
-        result TEXT, profit REAL, notes TEXT, screenshot BLOB)""")
-
-    cur.execute("""CREATE TABLE IF NOT EXISTS backtest_setups(
-        id INTEGER PRIMARY KEY, user_id INT, date TEXT, title TEXT,
-        entry_notes TEXT, result TEXT, review_notes TEXT)""")
-
-    cur.execute("""CREATE TABLE IF NOT EXISTS backtest_screenshots(
-        id INTEGER PRIMARY KEY, setup_id INT, image BLOB, filename TEXT)""")
+# ────────────── Search ──────────────
+@app.route("/search")
+@login_required
+def search_journal():
+    db = get_db()
+    a = request.args
+    q, kind = a.get("q", "").strip(), a.get("kind", "all")
+    filters = {"date_from": a.get("from") or None, "date_to": a.get("to") or None,
+               "result": a.get("result") if a.get("result") in search.RESULTS else None}
+    projects = db.execute("SELECT id, name FROM projects WHERE user_id=?", (session["user_id"],)).fetchall()
+    match = search.parse_query(q)
+    trades = setups = []
+    ranked = True
+    if match:
+        if kind in ("all", "trades"):
+            trades, ok = search.search_trades(db, session["user_id"], match, a.get("project", type=int), **filters)
+            ranked &= ok
+        if kind in ("all", "setups") and not a.get("project"):
+            setups, ok = search.search_setups(db, session["user_id"], match, **filters)
+            ranked &= ok
+    elif q:
+        flash("⚠️ Nothing searchable in that query")
+    return render_template("search.html", q=q, kind=kind, args=a, projects=projects, kinds=search.KINDS,
+                           results=search.RESULTS, trades=trades, setups=setups, ranked=ranked,
+                           highlight=search.highlight)
+
+# ────────────── JSON API ──────────────
+def api_batch(write):
+    """Run one batch write in a single transaction and answer compactly."""
+    db = get_db()
+    try:
+        result = write(db)
+    except api.BatchError as e:
+        db.rollback()
+        return jsonify(e.body()), 400
+    except sqlite3.IntegrityError:
+        db.rollback()       # a concurrent batch inserted the same client_id first
+        return jsonify(error="Conflicting concurrent batch; retry"), 409
+    api.touch(get_catalog(), g.api_token)
+    if result["created"] or result["updated"]:
+        cache.bump(db, g.api_user)
+    commit_all()
+    return jsonify(result)
+
+@app.route("/api/v1/trades", methods=["POST"])
+@token_required
+def api_trades():
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify(error="expected a JSON object"), 400
+    pid = body.get("project_id")
+    db = get_db()
+    if not api.is_int(pid) or not db.execute("SELECT 1 FROM projects WHERE id=? AND user_id=?",
+                                                  (pid, g.api_user)).fetchone():
+        return jsonify(error="Project not found"), 404
+    records = body.get("trades")
+
+    def write(db):
+        api.validate(records, api.TRADE_FIELDS, api.TRADE_REQUIRED, app.config["API_MAX_BATCH"])
+        return api.upsert_trades(db, pid, records)
+    return api_batch(write)
+
+@app.route("/api/v1/setups", methods=["POST"])
+@token_required
+def api_setups():
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify(error="expected a JSON object"), 400
+    records = body.get("setups")
+
+    def write(db):
+        api.validate(records, api.SETUP_FIELDS, api.SETUP_REQUIRED, app.config["API_MAX_BATCH"])
+        return api.upsert_setups(db, g.api_user, records)
+    return api_batch(write)
+
+# ────────────── Export ──────────────
+@app.route("/export/<kind>.<fmt>")
+@login_required
+def export(kind, fmt):
+    if kind not in ("trades", "setups") or fmt not in exporter.FORMATS:
+        return "Unknown export", 404
+    if fmt == "parquet" and not exporter.parquet_available():
+        flash("Parquet export needs pyarrow installed on the server.")
+        return redirect(request.referrer or url_for("select_project"))
 
-    def add_col(table, col_def):
-        name = col_def.split()[0]
-        cols = [c[1] for c in cur.execute(f"PRAGMA table_info({table})")]
-        if name not in cols:
-            cur.execute(f"ALTER TABLE {table} ADD COLUMN {col_def}")
+    db = get_db()
+    if kind == "trades":
+        pid = request.args.get("project_id", type=int) or session.get("project_id")
+        if not db.execute("SELECT 1 FROM projects WHERE id=? AND user_id=?", (pid, session["user_id"])).fetchone():
+            flash("Project not found")
+            return redirect(url_for("select_project"))
+        query = exporter.trades_query(pid, request.args.get("screenshots") == "1")
+        filename = f"trades-{pid}.{fmt}"
+    else:
+        query = exporter.setups_query(session["user_id"])
+        filename = f"setups.{fmt}"
 
-    add_col("users", "role TEXT DEFAULT 'user'")
-    add_col("backtest_setups", "session_name TEXT")
-    add_col("backtest_setups", "timeframe TEXT")
-    add_col("backtest_setups", "market TEXT")
-    add_col("backtest_setups", "entry_criteria TEXT")
-    add_col("backtest_setups", "exit_criteria TEXT")
-    add_col("backtest_setups", "r_multiple REAL")
-    add_col("backtest_setups", "profit REAL")
+    return Response(stream_with_context(exporter.stream(db, query, fmt)), mimetype=exporter.FORMATS[fmt],
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'})
 
-    db.commit()
-    db.close()
+# ────────────── Init DB ──────────────
+def init_db(path=None):
+    """Bring `path` up to the latest schema revision (migrations/versions).
+
+    Without a path: DB_NAME and, in tenant mode, every tenant file.
+    """
+    if path is None:
+        for _, path in each_db(catalog=True):
+            init_db(path)
+        return
+    if schema_current(path):
+        return
+    from alembic import command
+    from alembic.config import Config
+
+    if not os.path.exists(path) or not os.path.getsize(path):
+        db = sqlite3.connect(path)      # only settable before the first table: lets vacuum return free pages
+        db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        db.execute("VACUUM")
+        db.close()
+    cfg = Config(os.path.join(app.root_path, "alembic.ini"))
+    cfg.set_main_option("sqlalchemy.url", f"sqlite:///{os.path.abspath(path)}")
+    cfg.attributes["configure_logger"] = False
+    command.upgrade(cfg, "head")
+
+def migration_heads():
+    """Revision ids no migration builds on, read from the scripts without importing alembic."""
+    revisions, parents = set(), set()
+    for script in glob.glob(os.path.join(app.root_path, "migrations", "versions", "*.py")):
+        with open(script) as f:
+            src = f.read()
+        revisions.update(re.findall(r"^revision: str = '(\w+)'", src, re.M))
+        for line in re.findall(r"^down_revision: .*$", src, re.M):
+            parents.update(re.findall(r"'(\w+)'", line.split("=", 1)[1]))
+    return revisions - parents
+
+def schema_current(path):
+    """True when `path` is already at the newest revision, so start-up needn't load alembic."""
+    if not os.path.exists(path):
+        return False
+    try:
+        db = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+        try:
+            return {r[0] for r in db.execute("SELECT version_num FROM alembic_version")} == migration_heads()
+        finally:
+            db.close()
+    except sqlite3.Error:
+        return False
+
+def each_db(catalog=False):
+    """(user id, path) of every file holding journal data: DB_NAME, or each tenant in tenant mode."""
+    if not tenancy.enabled(app.config):
+        return [(None, DB_NAME)]
+    return [(None, DB_NAME)] * catalog + [(uid, tenancy.path(app.config, uid)) for uid in tenancy.tenants(app.config)]
+
+def cli_db(user_id):
+    """A connection to user_id's data for commands that address one project or user."""
+    if user_id is None and tenancy.enabled(app.config):
+        raise click.UsageError("--user-id is required when TENANCY is 'user'.")
+    return sqlite3.connect(db_path(user_id))
+
+# Queries every page view depends on, checked by `flask check-indexes` and tests/test_indexes.py
+HOT_QUERIES = {
+    "login": "SELECT * FROM users WHERE username=?",
+    "select_project": "SELECT * FROM projects WHERE user_id=?",
+    "dashboard page": f"""SELECT {TRADE_LIST_COLS} FROM trades t WHERE t.project_id=?
+        AND ((t.date, t.id) < (?, ?) OR t.date IS NULL) ORDER BY t.date DESC, t.id DESC LIMIT 50""",
+    "best/worst refresh": "SELECT MAX(profit) FROM trades WHERE project_id=? AND typeof(profit) IN ('integer','real')",
+    "setups page": f"""SELECT {SETUP_LIST_COLS} FROM backtest_setups s WHERE s.user_id=?
+        ORDER BY s.date DESC, s.id DESC LIMIT 50""",
+    "setup screenshots": "SELECT id, image_hash FROM backtest_screenshots WHERE setup_id=?",
+    "user trades": f"""SELECT {TRADE_LIST_COLS}, p.name FROM trades t JOIN projects p ON p.id = t.project_id
+        WHERE p.user_id=?""",
+}
+
+def explain_hot_queries(db):
+    """Yield (name, plan detail, ok) for every step of every hot query plan."""
+    for name, sql in HOT_QUERIES.items():
+        for row in db.execute("EXPLAIN QUERY PLAN " + sql, (None,) * sql.count("?")):
+            detail = row[3]
+            full_scan = detail.startswith("SCAN") and "INDEX" not in detail
+            yield name, detail, not (full_scan or "TEMP B-TREE" in detail)
 
 # ────────────── Optional DB Tweaks ──────────────
 def add_email_column():
@@ -483,6 +940,227 @@ def enforce_unique_email():
 
         # Add other tables here if needed (projects, trades, etc.)
 
+@app.cli.command("init-db")
+def init_db_command():
+    """Create or upgrade the database schema."""
+    init_db()
+    print("✅ Database initialized.")
+
+@app.cli.command("compile-templates")
+def compile_templates_command():
+    """Compile every template into JINJA_CACHE_DIR, e.g. at build time, so new workers start warm."""
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    print(f"✅ Compiled {len(names)} template(s) into {app.config['JINJA_CACHE_DIR']}/.")
+
+@app.cli.command("check-indexes")
+def check_indexes_command():
+    """EXPLAIN QUERY PLAN each hot query and fail on full scans or temp sorts."""
+    db = sqlite3.connect(DB_NAME)
+    bad = 0
+    for name, detail, ok in explain_hot_queries(db):
+        print(f"{'✅' if ok else '❌'} {name}: {detail}")
+        bad += not ok
+    db.close()
+    if bad:
+        raise SystemExit(1)
+
+@app.cli.command("rebuild-stats")
+def rebuild_stats_command():
+    """Reconcile project_stats with the trades table."""
+    init_db()
+    n = 0
+    for _, path in each_db():
+        db = sqlite3.connect(path)
+        db.row_factory = sqlite3.Row
+        n += stats.rebuild(db)
+        db.commit()
+        db.close()
+    print(f"✅ Rebuilt stats for {n} project(s).")
+
+@app.cli.command("rebuild-rollups")
+def rebuild_rollups_command():
+    """Recompute the admin overview's per-day rollups from trades and setups."""
+    init_db()
+    for _, path in each_db():
+        db = sqlite3.connect(path)
+        rollups.rebuild(db)
+        db.commit()
+        db.close()
+    print("✅ Rebuilt admin rollups.")
+
+@app.cli.command("rebuild-search")
+def rebuild_search_command():
+    """Rebuild the full-text search indexes from trades and setups."""
+    init_db()
+    for _, path in each_db():
+        db = sqlite3.connect(path)
+        search.rebuild(db)
+        db.commit()
+        db.close()
+    print("✅ Rebuilt search indexes.")
+
+@app.cli.command("process-uploads")
+def process_uploads_command():
+    """Process every queued setup screenshot now, in this process."""
+    init_db()
+    n = 0
+    for uid, _ in each_db():
+        while uploads.run_one(app, uid):
+            n += 1
+    print(f"✅ Processed {n} upload(s).")
+
+@app.cli.command("create-token")
+@click.argument("user_id", type=int)
+@click.option("--name", help="What the token is for, e.g. the bot's name.")
+def create_token_command(user_id, name):
+    """Issue a JSON API token for a user."""
+    init_db()
+    db = sqlite3.connect(DB_NAME)
+    if not db.execute("SELECT 1 FROM users WHERE id=?", (user_id,)).fetchone():
+        raise click.BadParameter(f"no user {user_id}", param_hint="USER_ID")
+    token = api.create_token(db, user_id, name)
+    db.commit()
+    db.close()
+    print(f"🔑 {token}")
+    print("Store it now: only its hash is kept.")
+
+@app.cli.command("import-trades")
+@click.argument("project_id", type=int)
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--batch-size", default=importer.BATCH_SIZE, show_default=True)
+@click.option("--user-id", type=int, help="The project's owner (needed when TENANCY is 'user').")
+@click.option("--decimal", type=click.Choice([".", ","]), help="The file's decimal separator (detected by default).")
+def import_trades_command(project_id, path, batch_size, user_id, decimal):
+    """Import a CSV / MT4 / MT5 statement into a project."""
+    db = cli_db(user_id)
+    db.row_factory = sqlite3.Row
+    with open(path, "rb") as f:
+        for p in importer.import_trades(db, project_id, f, batch_size, decimal):
+            print(f"… {p['rows']} rows read, {p['imported']} imported, {p['skipped']} skipped")
+    owner = db.execute("SELECT user_id FROM projects WHERE id=?", (project_id,)).fetchone()
+    if owner:
+        cache.bump(db, owner[0])
+        db.commit()
+    db.close()
+    for e in p["errors"]:
+        print("⚠️", e)
+    print(f"✅ Imported {p['imported']} trade(s) into project {project_id}.")
+
+@app.cli.command("export")
+@click.argument("kind", type=click.Choice(["trades", "setups"]))
+@click.argument("owner_id", type=int)
+@click.option("--format", "fmt", type=click.Choice(list(exporter.FORMATS)), default="csv", show_default=True)
+@click.option("--screenshots", is_flag=True, help="Include screenshot hashes (trades only).")
+@click.option("-o", "--output", type=click.Path(dir_okay=False), required=True)
+@click.option("--user-id", type=int, help="The project's owner (trades only, needed when TENANCY is 'user').")
+def export_command(kind, owner_id, fmt, screenshots, output, user_id):
+    """Export a project's trades or a user's setups (OWNER_ID is the project / user id)."""
+    db = cli_db(owner_id if kind == "setups" else user_id)
+    query = exporter.trades_query(owner_id, screenshots) if kind == "trades" else exporter.setups_query(owner_id)
+    with open(output, "wb") as out:
+        for chunk in exporter.stream(db, query, fmt):
+            out.write(chunk.encode() if isinstance(chunk, str) else chunk)
+    db.close()
+    print(f"✅ Wrote {output}")
+
+@app.cli.command("replay")
+@click.argument("rules", type=click.Path(exists=True, dir_okay=False))
+@click.option("--user-id", type=int, required=True, help="Owner of the generated setups.")
+@click.option("--symbols", required=True, help="Comma-separated, e.g. EURUSD,GBPUSD.")
+@click.option("--from", "date_from", required=True, type=click.DateTime(["%Y-%m-%d"]), help="YYYY-MM-DD, inclusive.")
+@click.option("--to", "date_to", required=True, type=click.DateTime(["%Y-%m-%d"]), help="YYYY-MM-DD, exclusive.")
+@click.option("--workers", type=int, default=None, help="Processes (default: one per CPU).")
+@click.option("--dry-run", is_flag=True, help="Print the results without saving setups.")
+def replay_command(rules, user_id, symbols, date_from, date_to, workers, dry_run):
+    """Backtest RULES (JSON) over OHLC_DIR bars and save the trades as setups."""
+    import replay
+    try:
+        rules = replay.load_rules(rules)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="RULES")
+    if date_to <= date_from:
+        raise click.BadParameter("must be after --from", param_hint="--to")
+    start, end = (int(replay.np.datetime64(d, "s").astype("i8")) for d in (date_from, date_to))
+    db = sqlite3.connect(DB_NAME)
+    if not db.execute("SELECT 1 FROM users WHERE id=?", (user_id,)).fetchone():
+        raise click.BadParameter(f"no user {user_id}", param_hint="--user-id")
+    db.close()
+    db = cli_db(user_id)
+    for rule in rules:
+        trades = replay.run(app.config["OHLC_DIR"], rule, symbols.split(","), start, end, workers)
+        s = replay.summary(trades)
+        print(f"📈 {rule['name']}: {s['trades']} trade(s)" + (
+            f", {s['win_rate']}% wins, {s['total_r']:+}R total, {s['avg_r']:+}R avg, {s['max_dd_r']}R max drawdown"
+            if s["trades"] else ""))
+        if not dry_run:
+            replay.save(db, user_id, rule, trades)
+    if not dry_run:
+        cache.bump(db, user_id)
+        db.commit()
+        print(f"✅ Saved the trades as setups for user {user_id}.")
+    db.close()
+
+@app.cli.command("ohlc-convert")
+@click.argument("csv_files", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+def ohlc_convert_command(csv_files):
+    """Convert <SYMBOL>_<TF>.csv bar files to memory-mappable .npy next to them."""
+    import replay
+    for path in csv_files:
+        n = replay.convert(path, os.path.splitext(path)[0] + ".npy")
+        print(f"✅ {path}: {n} bars")
+
+@app.cli.command("migrate-images")
+def migrate_images_command():
+    """Move screenshot BLOBs out of the database into IMAGE_DIR."""
+    init_db()
+    n = 0
+    for uid, path in each_db():
+        g.tenant = uid          # image_store.root() follows the tenant
+        db = sqlite3.connect(path)
+        n += image_store.migrate_blobs(db)
+        cache.bump_all(db)      # cached pages still point at the BLOB routes' old URLs
+        db.commit()
+        db.close()
+    print(f"✅ Moved {n} screenshot(s) to {app.config['IMAGE_DIR']}/. Run VACUUM to reclaim the space.")
+
+@app.cli.command("maintenance")
+@click.argument("tasks", nargs=-1, type=click.Choice(maintenance.TASKS))
+def maintenance_command(tasks):
+    """Run maintenance tasks now (all by default), whatever their schedule."""
+    init_db()
+    for task in tasks or maintenance.TASKS:
+        detail = maintenance.run(app, task, force=True)
+        print(f"✅ {task}: {detail}" if detail is not None else f"⏳ {task} is running in another process.")
+
+@app.cli.command("vacuum-full")
+def vacuum_full_command():
+    """Switch every database to incremental auto-vacuum and compact it (locks each file while it runs)."""
+    for _, path in each_db(catalog=True):
+        before = os.path.getsize(path)
+        db = sqlite3.connect(path)
+        db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        db.execute("VACUUM")
+        db.close()
+        print(f"✅ {path}: {before / 1e6:.1f} MB -> {os.path.getsize(path) / 1e6:.1f} MB")
+
+@app.cli.command("split-tenants")
+@click.option("--replace", is_flag=True, help="Rebuild tenant files that already exist.")
+def split_tenants_command(replace):
+    """Copy each user's data from DB_NAME into a tenant file of their own (for TENANCY=user)."""
+    init_db(DB_NAME)
+    db = sqlite3.connect(DB_NAME)
+    users = db.execute("SELECT id, username FROM users ORDER BY id").fetchall()
+    db.close()
+    for uid, username in users:
+        if os.path.exists(tenancy.path(app.config, uid)) and not replace:
+            print(f"ℹ️ {username}: {tenancy.path(app.config, uid)} exists, skipped.")
+            continue
+        counts = tenancy.create(app.config, uid, DB_NAME, init_db, copy=True, replace=replace)
+        print(f"✅ {username}: " + ", ".join(f"{n} {table}" for table, n in counts.items() if n))
+    print(f"Set TENANCY='user' to serve from {app.config['TENANT_DIR']}/; {DB_NAME} is left as it was.")
+
 # ────────────── Run ──────────────
 if __name__ == "__main__":
     app.run(debug=True)
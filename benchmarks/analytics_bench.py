@@ -0,0 +1,83 @@
+# benchmarks/analytics_bench.py – NumPy analytics vs per-row Python loops
+#
+#   python benchmarks/analytics_bench.py --sizes 10000 100000 1000000
+#
+# Both sides start from the same list of fetched rows (what cursor.fetchall()
+# returns), so the NumPy timing includes building the arrays.
+
+import argparse, os, random, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np  # noqa: E402
+import analytics  # noqa: E402
+
+
+def make_rows(n, seed=1):
+    rnd = random.Random(seed)
+    symbols, sessions = ["EURUSD", "GBPUSD", "XAUUSD", "US30"], ["London", "New York", "Asian", None]
+    return [(f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}", rnd.choice(symbols), rnd.choice(sessions),
+             round(rnd.gauss(5, 40), 2) if rnd.random() > 0.02 else None, round(rnd.uniform(-1, 4), 2))
+            for i in range(n)]
+
+
+def loop_metrics(rows):
+    """The dashboard's original style: one Python pass per metric."""
+    profits = [r[3] or 0 for r in rows]
+    n = len(profits)
+    equity, peak, max_dd, total = [], 0.0, 0.0, 0.0
+    for p in profits:
+        total += p
+        equity.append(total)
+        peak = max(peak, total)
+        max_dd = max(max_dd, peak - total)
+    mean = total / n
+    std = (sum((p - mean) ** 2 for p in profits) / (n - 1)) ** 0.5
+    downside = (sum(min(p, 0) ** 2 for p in profits) / n) ** 0.5
+    wins = [p for p in profits if p > 0]
+    losses = [p for p in profits if p < 0]
+    best_w = best_l = cur_w = cur_l = 0
+    for p in profits:
+        cur_w = cur_w + 1 if p > 0 else 0
+        cur_l = cur_l + 1 if p < 0 else 0
+        best_w, best_l = max(best_w, cur_w), max(best_l, cur_l)
+    by_symbol = {}
+    for r, p in zip(rows, profits):
+        s = by_symbol.setdefault(r[1], [0, 0.0])
+        s[0] += 1
+        s[1] += p
+    return {"max_drawdown": max_dd, "sharpe": mean / std, "sortino": mean / downside,
+            "expectancy": mean, "wins": len(wins), "losses": len(losses),
+            "streaks": (best_w, best_l), "by_symbol": by_symbol}
+
+
+def numpy_metrics(rows):
+    return analytics.compute(analytics.to_arrays(rows))
+
+
+def best_of(fn, rows, repeat):
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn(rows)
+        times.append(time.perf_counter() - t)
+    return min(times), out
+
+
+def main():
+    p = argparse.ArgumentParser(description="NumPy analytics vs per-row Python loops")
+    p.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    p.add_argument("--repeat", type=int, default=3)
+    args = p.parse_args()
+
+    print(f"{'trades':>10} {'loops (ms)':>12} {'numpy (ms)':>12} {'speedup':>8}")
+    for n in args.sizes:
+        rows = make_rows(n)
+        t_loop, loop = best_of(loop_metrics, rows, args.repeat)
+        t_np, vec = best_of(numpy_metrics, rows, args.repeat)
+        assert round(loop["max_drawdown"], 2) == vec["max_drawdown"]
+        assert loop["streaks"] == (vec["longest_win_streak"], vec["longest_loss_streak"])
+        print(f"{n:>10} {t_loop * 1000:>12.1f} {t_np * 1000:>12.1f} {t_loop / t_np:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
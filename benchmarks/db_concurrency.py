@@ -0,0 +1,87 @@
+# benchmarks/db_concurrency.py – dashboard read throughput under concurrent writers
+#
+#   python benchmarks/db_concurrency.py --readers 8 --writers 2 --seconds 10
+#
+# Runs the same workload twice against a fresh temporary journal: once the
+# old way (a new rollback-journal connection per request) and once with the
+# pooled WAL connections from db_pool, and prints requests/sec for each.
+
+import argparse, os, sys, tempfile, threading, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app as journal  # noqa: E402
+
+LEGACY = {"SQLITE_POOL_SIZE": 0, "SQLITE_PRAGMAS": {"journal_mode": "DELETE"}}
+
+
+def client(username):
+    c = journal.app.test_client()
+    c.post("/login", data={"username": username, "password": "bench"})
+    c.get("/open_project/1")
+    return c
+
+
+def setup_db(path, trades):
+    journal.DB_NAME = path
+    journal.init_db()
+    c = journal.app.test_client()
+    c.post("/register", data={"email": "bench@x", "username": "bench",
+                              "password": "bench", "confirm_password": "bench"})
+    c = client("bench")
+    c.post("/add_project", data={"name": "bench", "category": "fx"})
+    for i in range(trades):
+        c.post("/trade/add", data=trade_form(i))
+
+
+def trade_form(i):
+    return {"date": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}", "symbol": "EURUSD", "direction": "Buy",
+            "entry": "1.1", "exit": "1.2", "lot_size": "1", "rr": "1.5", "session": "London",
+            "result": "Win" if i % 2 else "Loss", "profit": str(i % 50 - 20), "notes": "bench"}
+
+
+def run(label, overrides, args):
+    journal.app.config.update(overrides)
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_db(os.path.join(tmp, "bench.db"), args.trades)
+        stop, counts, lock = threading.Event(), {"read": 0, "write": 0}, threading.Lock()
+
+        def loop(kind):
+            c, n = client("bench"), 0
+            while not stop.is_set():
+                if kind == "read":
+                    c.get("/dashboard")
+                else:
+                    c.post("/trade/add", data=trade_form(n))
+                n += 1
+            with lock:
+                counts[kind] += n
+
+        threads = [threading.Thread(target=loop, args=("read",)) for _ in range(args.readers)]
+        threads += [threading.Thread(target=loop, args=("write",)) for _ in range(args.writers)]
+        for t in threads:
+            t.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+        journal.db_pool.get_pool(journal.DB_NAME, journal.app.config).close()
+
+    print(f"{label:>8}: {counts['read'] / args.seconds:8.1f} reads/s  "
+          f"{counts['write'] / args.seconds:8.1f} writes/s")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Dashboard read throughput under concurrent writers")
+    p.add_argument("--readers", type=int, default=8)
+    p.add_argument("--writers", type=int, default=2)
+    p.add_argument("--seconds", type=float, default=10)
+    p.add_argument("--trades", type=int, default=500, help="trades preloaded into the project")
+    args = p.parse_args()
+
+    defaults = {k: journal.app.config[k] for k in LEGACY}
+    run("legacy", LEGACY, args)
+    run("pooled", defaults, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# benchmarks/journal_gen.py – synthetic journals for benchmarking
+#
+#   python benchmarks/journal_gen.py /tmp/bench --users 5 --trades 20000 --setups 200 --shots 3
+#
+# Builds DIR/journal.db through the real migrations (init_db) and fills it
+# with seeded random users, projects, trades and backtest setups; screenshots
+# go through image_store like uploads do, into DIR/images. A share of the
+# trade screenshots can be left as legacy BLOBs to exercise that path too.
+# Every user's password is "bench"; user1 is the admin.
+
+import argparse, os, random, sqlite3, struct, sys, time, zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from werkzeug.security import generate_password_hash  # noqa: E402
+import app as journal  # noqa: E402
+import image_store, stats  # noqa: E402
+
+PASSWORD = "bench"
+SYMBOLS = ["EURUSD", "GBPUSD", "USDJPY", "XAUUSD", "US30", "NAS100", "BTCUSD"]
+SESSIONS = ["London", "New York", "Asian", None]
+TIMEFRAMES = ["M5", "M15", "H1", "H4", "D1"]
+WORDS = ("breakout retest liquidity sweep order block fair value gap trend pullback news spike "
+         "range reversal divergence support resistance momentum fakeout patience fomo overtraded "
+         "clean entry late exit moved stop partials target hit").split()
+TRADE_COLS = ("project_id", "date", "symbol", "direction", "entry", "exit", "lot_size", "rr",
+              "session_name", "result", "profit", "notes", "screenshot", "screenshot_hash")
+SETUP_COLS = ("user_id", "date", "title", "entry_notes", "result", "review_notes", "session_name",
+              "timeframe", "market", "entry_criteria", "exit_criteria", "r_multiple", "profit")
+
+
+def png(rnd, width, height):
+    """A small, distinct, valid PNG: horizontal bands in random colours."""
+    bands = [rnd.randbytes(3) for _ in range(8)]
+    raw = b"".join(b"\x00" + bands[y * 8 // height] * width for y in range(height))
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+
+def notes(rnd, n):
+    return " ".join(rnd.choice(WORDS) for _ in range(n))
+
+
+def day(rnd):
+    return f"{rnd.randint(2022, 2024)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}"
+
+
+def trade(rnd, pid):
+    result = rnd.choices(["Win", "Loss", "BE"], [45, 45, 10])[0]
+    risk = round(rnd.uniform(10, 100), 2)
+    rr = round(rnd.uniform(0.5, 4), 1)
+    profit = risk * rr if result == "Win" else -risk if result == "Loss" else 0.0
+    entry = round(rnd.uniform(1, 2000), 4)
+    return {"project_id": pid, "date": day(rnd), "symbol": rnd.choice(SYMBOLS),
+            "direction": rnd.choice(["Buy", "Sell"]), "entry": entry,
+            "exit": round(entry * rnd.uniform(0.98, 1.02), 4), "lot_size": rnd.choice([0.1, 0.5, 1, 2]),
+            "rr": str(rr), "session_name": rnd.choice(SESSIONS), "result": result,
+            "profit": round(profit, 2), "notes": notes(rnd, rnd.randint(3, 30)),
+            "screenshot": None, "screenshot_hash": None}
+
+
+def setup(rnd, uid):
+    result = rnd.choice(["Win", "Loss", "BE"])
+    r = round(rnd.uniform(0.5, 5), 1) if result == "Win" else -1.0 if result == "Loss" else 0.0
+    return (uid, day(rnd), f"{rnd.choice(WORDS).title()} {rnd.choice(WORDS)}", notes(rnd, 20), result,
+            notes(rnd, 15), rnd.choice(SESSIONS), rnd.choice(TIMEFRAMES), rnd.choice(SYMBOLS),
+            notes(rnd, 8), notes(rnd, 8), r, round(r * 50, 2))
+
+
+def generate(root, users=3, projects=2, trades=2000, setups=50, shots=2,
+             screenshot_ratio=0.1, legacy_ratio=0.05, image_size=(160, 90), seed=1):
+    """Build ROOT/journal.db and ROOT/images; returns the path of the database."""
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, "journal.db")
+    journal.DB_NAME = path
+    journal.app.config["IMAGE_DIR"] = os.path.join(root, "images")
+    journal.init_db()
+
+    rnd = random.Random(seed)
+    password_hash = generate_password_hash(PASSWORD)    # hashing is slow by design; share one
+    db = sqlite3.connect(path)
+    db.row_factory = sqlite3.Row
+    with journal.app.app_context():
+        for u in range(1, users + 1):
+            uid = db.execute("INSERT INTO users (username, email, password_hash, role) VALUES (?, ?, ?, ?)",
+                             (f"user{u}", f"user{u}@bench", password_hash, "admin" if u == 1 else "user")).lastrowid
+            for p in range(1, projects + 1):
+                pid = db.execute("INSERT INTO projects (user_id, name, category) VALUES (?, ?, ?)",
+                                 (uid, f"Project {p}", rnd.choice(["forex", "indices", "crypto"]))).lastrowid
+                rows = [trade(rnd, pid) for _ in range(trades)]
+                for t in rows:
+                    if rnd.random() < screenshot_ratio:
+                        image = png(rnd, *image_size)
+                        if rnd.random() < legacy_ratio:
+                            t["screenshot"] = image
+                        else:
+                            t["screenshot_hash"] = image_store.put(db, image, prefetch=False)
+                db.executemany(f"INSERT INTO trades ({', '.join(TRADE_COLS)}) VALUES ({', '.join('?' * len(TRADE_COLS))})",
+                               [tuple(t[c] for c in TRADE_COLS) for t in rows])
+            for _ in range(setups):
+                sid = db.execute(f"INSERT INTO backtest_setups ({', '.join(SETUP_COLS)}) "
+                                 f"VALUES ({', '.join('?' * len(SETUP_COLS))})", setup(rnd, uid)).lastrowid
+                for n in range(shots):
+                    db.execute("INSERT INTO backtest_screenshots (setup_id, image_hash, filename) VALUES (?, ?, ?)",
+                               (sid, image_store.put(db, png(rnd, *image_size), prefetch=False), f"shot{n}.png"))
+            db.commit()
+    stats.rebuild(db)
+    db.commit()
+    db.close()
+    return path
+
+
+def size_arg(s):
+    w, h = s.lower().split("x")
+    return int(w), int(h)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Generate a synthetic trading journal")
+    p.add_argument("root", help="directory for journal.db and images/ (created if missing)")
+    p.add_argument("--users", type=int, default=3)
+    p.add_argument("--projects", type=int, default=2, help="projects per user")
+    p.add_argument("--trades", type=int, default=2000, help="trades per project")
+    p.add_argument("--setups", type=int, default=50, help="backtest setups per user")
+    p.add_argument("--shots", type=int, default=2, help="screenshots per setup")
+    p.add_argument("--screenshot-ratio", type=float, default=0.1, help="share of trades with a screenshot")
+    p.add_argument("--legacy-ratio", type=float, default=0.05, help="share of those kept as BLOBs")
+    p.add_argument("--image-size", type=size_arg, default=(160, 90), metavar="WxH")
+    p.add_argument("--seed", type=int, default=1)
+    args = p.parse_args()
+
+    if os.path.exists(os.path.join(args.root, "journal.db")):
+        p.error(f"{args.root}/journal.db already exists")
+    t = time.perf_counter()
+    path = generate(args.root, args.users, args.projects, args.trades, args.setups, args.shots,
+                    args.screenshot_ratio, args.legacy_ratio, args.image_size, args.seed)
+    print(f"✅ Wrote {path} in {time.perf_counter() - t:.1f}s "
+          f"({os.path.getsize(path) / 1e6:.1f} MB database)")
+
+
+if __name__ == "__main__":
+    main()
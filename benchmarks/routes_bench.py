@@ -0,0 +1,269 @@
+# benchmarks/routes_bench.py – per-route latency, memory and query counts
+#
+#   python benchmarks/routes_bench.py --trades 5000 --requests 200
+#   python benchmarks/routes_bench.py --compare benchmarks/results/1a2b3c4.json
+#
+# Generates a journal (journal_gen.py) or reuses one given with --root, then
+# drives each route through Flask's test client as user1: latency
+# percentiles over --requests warm requests, Python memory allocated at
+# peak during one request (tracemalloc), and the SQL statements / rows /
+# bytes of one profiled request. The page cache is off unless --cache is
+# given, so the numbers are the routes' own work.
+#
+# It also checks what code review can't keep an eye on: the setups and
+# dashboard pages must cost the same number of queries however many rows
+# they show (tests/test_queries.py runs the same check on a small journal),
+# and no hot query plan (app.HOT_QUERIES) may scan or sort.
+# Failed checks exit non-zero. Results are saved as JSON named after the
+# current commit; --compare prints the change against an earlier run.
+
+import argparse, json, os, resource, sqlite3, statistics, subprocess, sys, tempfile, time, tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+import app as journal  # noqa: E402
+import profiling  # noqa: E402
+import journal_gen  # noqa: E402
+
+# name -> (method, url template, form); filled from sample() ids
+ROUTES = {
+    "login": ("POST", "/login", {"username": "user1", "password": journal_gen.PASSWORD}),
+    "select_project": ("GET", "/select_project", None),
+    "dashboard": ("GET", "/dashboard", None),
+    "dashboard_deep": ("GET", "/dashboard?before_date={deep_date}&before_id={deep_id}", None),
+    "setups": ("GET", "/setups", None),
+    "view_setup": ("GET", "/setup/{setup}", None),
+    "view_live_trade": ("GET", "/live_trade/{trade}", None),
+    "screenshot": ("GET", "/screenshot/{shot_trade}", None),
+    "screenshot_thumb": ("GET", "/screenshot/{shot_trade}?size=160", None),
+    "screenshot_blob": ("GET", "/screenshot/{blob_trade}", None),
+    "setup_screenshot": ("GET", "/setup_screenshot/{setup_shot}", None),
+    "reports": ("GET", "/reports", None),
+    "analytics": ("GET", "/project/{project}/analytics.json", None),
+    "search": ("GET", "/search?q=liquidity+sweep", None),
+    "admin_user": ("GET", "/admin/user/{user}", None),
+    "admin_overview": ("GET", "/admin/overview?days=365", None),
+}
+
+# routes whose query count must not grow with the rows on the page
+CONSTANT_QUERIES = ("setups", "dashboard")
+
+
+def sample(path):
+    """Ids for the URL templates: user1's first project and rows in it."""
+    db = sqlite3.connect(path)
+    one = lambda sql, *a: (db.execute(sql, a).fetchone() or (None,))[0]  # noqa: E731
+    ids = {"user": one("SELECT id FROM users WHERE username='user1'")}
+    ids["project"] = one("SELECT MIN(id) FROM projects WHERE user_id=?", ids["user"])
+    ids["trade"] = one("SELECT MAX(id) FROM trades WHERE project_id=?", ids["project"])
+    ids["shot_trade"] = one("SELECT id FROM trades WHERE project_id=? AND screenshot_hash IS NOT NULL", ids["project"])
+    ids["blob_trade"] = one("SELECT id FROM trades WHERE project_id=? AND screenshot IS NOT NULL", ids["project"])
+    ids["setup"] = one("SELECT MAX(setup_id) FROM backtest_screenshots JOIN backtest_setups s ON s.id = setup_id "
+                       "WHERE s.user_id=?", ids["user"])
+    ids["setup_shot"] = one("SELECT MIN(id) FROM backtest_screenshots WHERE setup_id=?", ids["setup"])
+    # a page near the end of the project, for keyset paging cost
+    deep = db.execute("SELECT date, id FROM trades WHERE project_id=? ORDER BY date, id LIMIT 1 OFFSET 10",
+                      (ids["project"],)).fetchone() or (None, None)
+    ids["deep_date"], ids["deep_id"] = deep
+    db.close()
+    return ids
+
+
+def routes(ids, names):
+    out = {}
+    for name in names:
+        method, url, form = ROUTES[name]
+        if any(ids.get(part.split("}")[0]) is None for part in url.split("{")[1:]):
+            print(f"⚠️ skipping {name}: nothing to point it at in this journal")
+            continue
+        out[name] = (method, url.format(**ids), form)
+    return out
+
+
+def client(ids):
+    c = journal.app.test_client()
+    c.post("/login", data=ROUTES["login"][2])
+    c.get(f"/open_project/{ids['project']}")
+    return c
+
+
+def hit(c, method, url, form):
+    resp = c.open(url, method=method, data=form)
+    resp.get_data()             # drain streamed / file bodies
+    resp.close()
+    if resp.status_code >= 400:
+        raise SystemExit(f"❌ {method} {url} returned {resp.status_code}")
+    return resp
+
+
+def latency(c, route, n, warmup):
+    for _ in range(warmup):
+        hit(c, *route)
+    times = []
+    for _ in range(n):
+        t = time.perf_counter()
+        hit(c, *route)
+        times.append((time.perf_counter() - t) * 1000)
+    times.sort()
+    pct = lambda q: times[min(len(times) - 1, int(q * len(times)))]  # noqa: E731
+    return {"n": n, "mean_ms": statistics.fmean(times), "p50_ms": pct(0.5), "p90_ms": pct(0.9),
+            "p99_ms": pct(0.99), "max_ms": times[-1]}
+
+
+def memory(c, route):
+    tracemalloc.start()
+    try:
+        hit(c, *route)                      # allocations that stick around after warm-up
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        hit(c, *route)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"peak_kb": (peak - base) / 1024, "retained_kb": (current - base) / 1024}
+
+
+def queries(c, route):
+    journal.app.config["PROFILING"] = True
+    try:
+        before = profiling.totals()
+        hit(c, *route)
+        after = profiling.totals()
+    finally:
+        journal.app.config["PROFILING"] = False
+    d = lambda k: after.get(k, 0) - before.get(k, 0)  # noqa: E731
+    return {"queries": int(d("db_queries_total")), "rows": int(d("db_rows_total")),
+            "bytes": int(d("db_bytes_total")), "blob_fetches": int(d("db_blob_fetches_total")),
+            "sql_ms": d("db_query_seconds_total") * 1000, "render_ms": d("template_render_seconds_total") * 1000}
+
+
+def check_constant_queries(c, table):
+    """Query counts of each paged route with a 5-row page and a full one."""
+    ok, size = True, journal.app.config["PAGE_SIZE"]
+    for name in CONSTANT_QUERIES:
+        if name not in table:
+            continue
+        counts = []
+        for page in (5, size):
+            journal.app.config["PAGE_SIZE"] = page
+            counts.append(queries(c, table[name])["queries"])
+        journal.app.config["PAGE_SIZE"] = size
+        good = counts[0] == counts[1]
+        ok &= good
+        print(f"{'✅' if good else '❌'} {name}: {counts[0]} queries for 5 rows, {counts[1]} for {size}")
+    return ok
+
+
+def check_plans(path):
+    db = sqlite3.connect(path)
+    bad = [(name, detail) for name, detail, ok in journal.explain_hot_queries(db) if not ok]
+    db.close()
+    for name, detail in bad:
+        print(f"❌ plan for {name}: {detail}")
+    if not bad:
+        print(f"✅ {len(journal.HOT_QUERIES)} hot query plans use indexes")
+    return not bad
+
+
+def commit():
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                             text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=HERE,
+                               capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return sha + ("-dirty" if dirty else "")
+
+
+def compare(results, path):
+    with open(path) as f:
+        base = json.load(f)
+    print(f"\nvs {base['commit']} ({os.path.basename(path)}):")
+    print(f"{'route':<18} {'p50 (ms)':>17} {'p99 (ms)':>17} {'queries':>9}")
+    for name, r in results["routes"].items():
+        old = base["routes"].get(name)
+        if not old:
+            continue
+        cell = lambda k: f"{old[k]:.2f}→{r[k]:.2f} {(r[k] / old[k] - 1) * 100 if old[k] else 0:+.0f}%"  # noqa: E731
+        print(f"{name:<18} {cell('p50_ms'):>17} {cell('p99_ms'):>17} {old['queries']:>4}→{r['queries']:<4}")
+
+
+def run(args, root):
+    path = os.path.join(root, "journal.db")
+    if os.path.exists(path):
+        journal.DB_NAME = path
+        journal.app.config["IMAGE_DIR"] = os.path.join(root, "images")
+        journal.init_db()
+    else:
+        t = time.perf_counter()
+        journal_gen.generate(root, args.users, args.projects, args.trades, args.setups, args.shots,
+                             args.screenshot_ratio, args.legacy_ratio, seed=args.seed)
+        print(f"… generated journal in {time.perf_counter() - t:.1f}s")
+    journal.app.config.update(CACHE_BACKEND=args.cache, PROFILING=False)
+
+    ids = sample(path)
+    table = routes(ids, args.routes or list(ROUTES))
+    c = client(ids)
+    results = {"commit": commit(), "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+               "python": sys.version.split()[0], "cache": args.cache, "journal": {
+                   "trades": args.trades, "projects": args.projects, "users": args.users,
+                   "setups": args.setups, "shots": args.shots, "seed": args.seed}, "routes": {}}
+
+    print(f"{'route':<18} {'p50':>8} {'p90':>8} {'p99':>8} {'peak KB':>9} {'queries':>8} {'rows':>7} {'KB read':>8}")
+    for name, route in table.items():
+        r = {**latency(c, route, args.requests, args.warmup), **memory(c, route), **queries(c, route)}
+        results["routes"][name] = r
+        print(f"{name:<18} {r['p50_ms']:>8.2f} {r['p90_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['peak_kb']:>9.0f} "
+              f"{r['queries']:>8} {r['rows']:>7} {r['bytes'] / 1024:>8.0f}"
+              f"{'  ⚠️ BLOB' if r['blob_fetches'] else ''}")
+    results["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    ok = True
+    if not args.no_checks:
+        print()
+        ok = check_constant_queries(c, table) & check_plans(path)
+        results["checks_passed"] = ok
+    journal.db_pool.get_pool(journal.DB_NAME, journal.app.config).close()
+    return results, ok
+
+
+def main():
+    p = argparse.ArgumentParser(description="Per-route latency, memory and query counts")
+    p.add_argument("--root", help="journal directory to reuse (generated there if empty)")
+    p.add_argument("--users", type=int, default=3)
+    p.add_argument("--projects", type=int, default=2)
+    p.add_argument("--trades", type=int, default=2000, help="trades per project")
+    p.add_argument("--setups", type=int, default=120, help="setups per user")
+    p.add_argument("--shots", type=int, default=2)
+    p.add_argument("--screenshot-ratio", type=float, default=0.1)
+    p.add_argument("--legacy-ratio", type=float, default=0.05)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--routes", nargs="+", choices=list(ROUTES), help="default: all")
+    p.add_argument("--requests", type=int, default=100, help="timed requests per route")
+    p.add_argument("--warmup", type=int, default=5)
+    p.add_argument("--cache", choices=["none", "memory"], default="none")
+    p.add_argument("--no-checks", action="store_true")
+    p.add_argument("--output", help="default: benchmarks/results/<commit>.json")
+    p.add_argument("--compare", metavar="JSON", help="earlier results to compare against")
+    args = p.parse_args()
+
+    if args.root:
+        results, ok = run(args, args.root)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            results, ok = run(args, tmp)
+
+    output = args.output or os.path.join(HERE, "results", f"{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n✅ Saved {output}")
+    if args.compare:
+        compare(results, args.compare)
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# benchmarks/startup_bench.py – cold start: import, schema check and first requests
+#
+#   python benchmarks/startup_bench.py --runs 5
+#   python benchmarks/startup_bench.py --compare benchmarks/results/startup-1a2b3c4.json
+#
+# Each run starts a fresh interpreter, the way a restarted gunicorn worker
+# does, and times `import app`, the start-up init_db() schema check, a
+# login and the first and second dashboard requests. Runs alternate
+# between an empty Jinja bytecode cache and one filled by an earlier run.
+# It also records which heavy modules (numpy, Pillow, matplotlib,
+# alembic, SQLAlchemy, pyarrow) each stage pulled in and the dashboard's
+# size with and without compression. A heavy module loaded at import
+# fails the run. Results are saved as JSON; --compare prints the change
+# against an earlier run.
+
+import argparse, json, os, sqlite3, statistics, subprocess, sys, tempfile, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+from routes_bench import commit  # noqa: E402
+
+HEAVY = ("numpy", "PIL", "matplotlib", "alembic", "sqlalchemy", "pyarrow")
+STAGES = ("import", "init_db", "login", "first_dashboard", "second_dashboard")
+
+# Runs in the child interpreter: argv = repo root, journal dir, jinja cache dir
+CHILD = r"""
+import json, os, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+out, heavy = {}, {}
+loaded = lambda: sorted(m for m in %(heavy)r if m in sys.modules)
+def mark(stage):
+    out[stage] = (time.perf_counter() - t0) * 1000
+    heavy[stage] = loaded()
+import app as journal
+mark("import")
+from jinja2 import FileSystemBytecodeCache
+journal.app.jinja_env.bytecode_cache = FileSystemBytecodeCache(sys.argv[3])
+journal.DB_NAME = os.path.join(sys.argv[2], "journal.db")
+journal.app.config.update(IMAGE_DIR=os.path.join(sys.argv[2], "images"), MAINTENANCE_ENABLED=False)
+journal.init_db()
+mark("init_db")
+c = journal.app.test_client()
+c.post("/login", data={"username": "user1", "password": %(password)r})
+mark("login")
+c.get("/open_project/" + %(project)r)
+raw = c.get("/dashboard", headers={"Accept-Encoding": "identity"}).data
+mark("first_dashboard")
+gz = c.get("/dashboard", headers={"Accept-Encoding": "gzip"}).data
+mark("second_dashboard")
+print(json.dumps({"ms": out, "heavy": heavy, "dashboard_bytes": len(raw), "dashboard_gzip_bytes": len(gz)}))
+"""
+
+
+def child(journal_dir, cache_dir, project):
+    import journal_gen
+    code = CHILD % {"heavy": HEAVY, "password": journal_gen.PASSWORD, "project": str(project)}
+    t = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", code, ROOT, journal_dir, cache_dir], cwd=journal_dir,
+                          capture_output=True, text=True)
+    wall = (time.perf_counter() - t) * 1000
+    if proc.returncode:
+        raise SystemExit(proc.stderr)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["wall_ms"] = wall            # interpreter start-up and exit included
+    return result
+
+
+def summarize(runs):
+    out = {"wall_ms": statistics.median(r["wall_ms"] for r in runs)}
+    prev = [0] * len(runs)
+    for stage in STAGES:               # per-stage time, not the running total
+        out[stage + "_ms"] = statistics.median(r["ms"][stage] - p for r, p in zip(runs, prev))
+        prev = [r["ms"][stage] for r in runs]
+    out["heavy"] = runs[-1]["heavy"]
+    return out
+
+
+def compare(results, path):
+    with open(path) as f:
+        base = json.load(f)
+    print(f"\nvs {base['commit']} ({os.path.basename(path)}):")
+    for variant, r in results["variants"].items():
+        old = base["variants"].get(variant)
+        if not old:
+            continue
+        print(f"{variant}:")
+        for k in ("wall_ms", *(s + "_ms" for s in STAGES)):
+            print(f"  {k:<22} {old[k]:>8.1f} → {r[k]:>8.1f} {(r[k] / old[k] - 1) * 100 if old[k] else 0:+.0f}%")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Cold-start timings of a fresh worker")
+    p.add_argument("--runs", type=int, default=5, help="fresh interpreters per variant")
+    p.add_argument("--trades", type=int, default=500, help="trades per project in the generated journal")
+    p.add_argument("--output", help="default: benchmarks/results/startup-<commit>.json")
+    p.add_argument("--compare", metavar="JSON", help="earlier results to compare against")
+    args = p.parse_args()
+
+    import journal_gen
+    with tempfile.TemporaryDirectory() as tmp:
+        journal_dir, warm = os.path.join(tmp, "journal"), os.path.join(tmp, "jinja-warm")
+        journal_gen.generate(journal_dir, users=1, projects=1, trades=args.trades, setups=20, seed=1)
+        project = sqlite3.connect(os.path.join(journal_dir, "journal.db")).execute("SELECT MIN(id) FROM projects").fetchone()[0]
+        os.makedirs(warm)
+        child(journal_dir, warm, project)                   # fills the warm cache (and .pyc files)
+        variants = {"cold_templates": [], "warm_templates": []}
+        for i in range(args.runs):
+            cold = tempfile.mkdtemp(dir=tmp)
+            variants["cold_templates"].append(child(journal_dir, cold, project))
+            variants["warm_templates"].append(child(journal_dir, warm, project))
+
+    results = {"commit": commit(), "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+               "python": sys.version.split()[0], "runs": args.runs, "trades": args.trades,
+               "dashboard_bytes": variants["warm_templates"][-1]["dashboard_bytes"],
+               "dashboard_gzip_bytes": variants["warm_templates"][-1]["dashboard_gzip_bytes"],
+               "variants": {k: summarize(v) for k, v in variants.items()}}
+
+    print(f"{'variant':<16} {'wall':>8}" + "".join(f" {s:>17}" for s in STAGES))
+    for name, r in results["variants"].items():
+        print(f"{name:<16} {r['wall_ms']:>8.1f}" + "".join(f" {r[s + '_ms']:>17.1f}" for s in STAGES))
+    print(f"\ndashboard: {results['dashboard_bytes'] / 1024:.0f} KB, "
+          f"{results['dashboard_gzip_bytes'] / 1024:.0f} KB compressed")
+    heavy = results["variants"]["warm_templates"]["heavy"]
+    for stage in STAGES:
+        print(f"{'❌' if stage == 'import' and heavy[stage] else '✅'} after {stage}: "
+              f"{', '.join(heavy[stage]) or 'no heavy modules'}")
+
+    output = args.output or os.path.join(HERE, "results", f"startup-{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n✅ Saved {output}")
+    if args.compare:
+        compare(results, args.compare)
+    if heavy["import"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
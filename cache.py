@@ -0,0 +1,156 @@
+# cache.py – per-user cache for read-heavy pages
+#
+# Entries are keyed by (user, that user's cache version, page, arguments).
+# The version lives in SQLite (cache_versions) and every mutating route
+# bumps it inside its own transaction, so a write invalidates the user's
+# cached pages in every worker the moment it commits; superseded entries
+# are never read again and simply age out. The store itself is pluggable:
+# an in-process LRU with a TTL (default) or a Redis-compatible server
+# shared by all workers (CACHE_BACKEND="redis", needs the redis package).
+
+import pickle, threading, time
+from collections import Counter, OrderedDict
+from flask import current_app
+
+MISS = object()
+
+_backends = {}
+_lock = threading.Lock()
+hits, misses = Counter(), Counter()
+
+
+def configure(app):
+    app.config.setdefault("CACHE_BACKEND", "memory")    # memory | redis | none
+    app.config.setdefault("CACHE_URL", "redis://localhost:6379/0")
+    app.config.setdefault("CACHE_MAX_ENTRIES", 2048)
+    app.config.setdefault("CACHE_TTL", 300)
+
+
+class MemoryBackend:
+    """Thread-safe LRU of at most `max_entries` values, each living `ttl` seconds."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries, self.ttl = max_entries, ttl
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return MISS
+            expires, value = item
+            if expires < time.monotonic():
+                del self.data[key]
+                return MISS
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = (time.monotonic() + self.ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.max_entries:
+                self.data.popitem(last=False)
+
+    def __len__(self):
+        return len(self.data)
+
+
+class RedisBackend:
+    """Values pickled into a Redis-compatible server; its own TTLs and maxmemory policy evict."""
+
+    def __init__(self, url, ttl):
+        import redis
+        self.client, self.ttl = redis.Redis.from_url(url), ttl
+        self.errors = (redis.RedisError,)
+
+    def get(self, key):
+        try:
+            raw = self.client.get("tj:" + key)
+        except self.errors:
+            return MISS             # a cache outage degrades to plain queries
+        return MISS if raw is None else pickle.loads(raw)
+
+    def set(self, key, value):
+        try:
+            self.client.setex("tj:" + key, self.ttl, pickle.dumps(value))
+        except self.errors:
+            pass
+
+    def __len__(self):
+        return self.client.dbsize()
+
+
+def backend(config):
+    kind = config["CACHE_BACKEND"]
+    if kind == "none":
+        return None
+    with _lock:
+        if kind not in _backends:
+            if kind == "redis":
+                _backends[kind] = RedisBackend(config["CACHE_URL"], config["CACHE_TTL"])
+            else:
+                _backends[kind] = MemoryBackend(config["CACHE_MAX_ENTRIES"], config["CACHE_TTL"])
+        return _backends[kind]
+
+
+def version(db, user_id):
+    row = db.execute("SELECT version FROM cache_versions WHERE user_id=?", (user_id,)).fetchone()
+    return row[0] if row else 0
+
+
+def bump(db, user_id):
+    """Invalidate everything cached for `user_id`; commits with the caller's write."""
+    db.execute("""INSERT INTO cache_versions (user_id, version) VALUES (?, 1)
+        ON CONFLICT(user_id) DO UPDATE SET version = version + 1""", (user_id,))
+
+
+def carry(db, user_id, version):
+    """Keep user_id's versions above `version`, the last one of a tenant file about to be retired.
+
+    The catalog keeps this row after the user goes and tenancy.create seeds
+    a new tenant file from it, so an id used again never meets a version
+    (and cache key) of the account that had it before.
+    """
+    db.execute("""INSERT INTO cache_versions (user_id, version) VALUES (?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET version = MAX(version, excluded.version)""", (user_id, version + 1))
+
+
+def bump_all(db):
+    db.execute("INSERT OR IGNORE INTO cache_versions (user_id) SELECT id FROM users")
+    db.execute("UPDATE cache_versions SET version = version + 1")
+
+
+def plain(rows):
+    """sqlite3.Row objects as dicts, so they pickle (templates read both alike)."""
+    return [dict(r) for r in rows]
+
+
+def cached(db, user_id, page, args, compute):
+    """compute() for this user/page/args, or its cached value while the user's data is unchanged."""
+    store = backend(current_app.config)
+    if store is None:
+        return compute()
+    key = f"{user_id}:{version(db, user_id)}:{page}:{args!r}"
+    value = store.get(key)
+    if value is MISS:
+        misses[page] += 1
+        value = compute()
+        store.set(key, value)
+    else:
+        hits[page] += 1
+    return value
+
+
+def metrics():
+    """Hit/miss counts of this worker, overall and per page."""
+    pages = sorted(hits.keys() | misses.keys())
+    total_hits, total_misses = sum(hits.values()), sum(misses.values())
+    store = backend(current_app.config)
+    return {
+        "backend": current_app.config["CACHE_BACKEND"], "entries": len(store) if store else 0,
+        "hits": total_hits, "misses": total_misses,
+        "hit_rate": round(total_hits / (total_hits + total_misses), 3) if total_hits + total_misses else None,
+        "pages": {p: {"hits": hits[p], "misses": misses[p]} for p in pages},
+    }
@@ -0,0 +1,211 @@
+# charts.py – server-side PNG / SVG charts for a project
+#
+# The plotted series are computed in the request (NumPy, from the same
+# arrays as the analytics endpoint) and handed to a process pool that
+# draws them with matplotlib's Agg/SVG backends, so a slow render never
+# holds the GIL of a request worker. Output is kept under
+# <IMAGE_DIR>/charts, named by (project, data version, chart, size): a
+# file never goes stale, a new version simply gets new files, and the
+# directory is an LRU cache trimmed to CHART_CACHE_BYTES like thumbnails.
+# SVGs are written gzipped as well (<name>.svg.gz) and served that way to
+# browsers that take gzip: send_file responses skip compression.py.
+
+import glob, gzip, io, multiprocessing, os, tempfile, threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from flask import current_app, request, send_file
+import image_store, stats, thumbnails
+
+CHARTS = ("equity", "drawdown", "pnl", "sessions")
+SIZES = {"sm": (480, 270), "md": (800, 450), "lg": (1200, 675)}   # px at DPI
+FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+DPI = 100
+PNL_BINS = 40
+
+_pools = {}
+_pending = {}
+_lock = threading.Lock()
+
+
+def configure(app):
+    app.config.setdefault("CHART_WORKERS", 2)
+    app.config.setdefault("CHART_CACHE_BYTES", 64 * 1024 * 1024)
+    app.config.setdefault("CHART_WAIT", 0.5)       # seconds a request waits before answering 503 + Retry-After
+
+
+def _pool(workers):
+    # One pool per process: gunicorn forks workers after import, and a
+    # forked executor would share the parent's pipes. Children are spawned
+    # so they never inherit a request worker's threads or sockets.
+    pid = os.getpid()
+    with _lock:
+        if pid not in _pools:
+            _pools[pid] = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pools[pid]
+
+
+def chart_dir(root):
+    return os.path.join(root, "charts")
+
+
+def chart_path(root, project_id, version, chart, size, fmt):
+    return os.path.join(chart_dir(root), f"{project_id}-{version}-{chart}-{size}.{fmt}")
+
+
+def series(db, project_id, chart, width):
+    """The (small) data a chart plots, computed here so workers never touch the DB."""
+    import analytics
+    data = analytics.load(db, project_id)
+    if chart == "pnl":
+        import numpy as np
+        p = data["profit"][np.isfinite(data["profit"])]
+        if not len(p):
+            return None
+        counts, edges = np.histogram(p, bins=PNL_BINS)
+        return {"edges": edges.tolist(), "counts": counts.tolist()}
+    a = analytics.compute(data, points=width)
+    if not a["trades"]:
+        return None
+    if chart == "sessions":
+        return {"labels": list(a["by_session"]),
+                "win_rate": [s["win_rate"] for s in a["by_session"].values()],
+                "trades": [s["trades"] for s in a["by_session"].values()]}
+    return {"date": a["equity_curve"]["date"], "values": a["equity_curve"][chart]}
+
+
+def _date_ticks(ax, dates):
+    n = len(dates)
+    ticks = sorted({round((n - 1) * k / 5) for k in range(6)})
+    ax.set_xticks(ticks)
+    ax.set_xticklabels([dates[i] or "" for i in ticks], rotation=20, fontsize=8)
+
+
+def _render(dest, chart, size, fmt, data):
+    # Figure + canvas rather than pyplot: no global state, no GUI backend
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    w, h = SIZES[size]
+    fig = Figure(figsize=(w / DPI, h / DPI), dpi=DPI)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    if data is None:
+        ax.text(0.5, 0.5, "No trades yet", ha="center", va="center", transform=ax.transAxes)
+        ax.set_axis_off()
+    elif chart in ("equity", "drawdown"):
+        x, y = range(len(data["values"])), data["values"]
+        color = "#16a34a" if chart == "equity" else "#dc2626"
+        ax.plot(x, y, color=color, linewidth=1.2)
+        ax.fill_between(x, y, 0, color=color, alpha=0.15)
+        ax.set_title("Equity curve" if chart == "equity" else "Drawdown")
+        _date_ticks(ax, data["date"])
+    elif chart == "pnl":
+        edges = data["edges"]
+        ax.bar(edges[:-1], data["counts"], width=[b - a for a, b in zip(edges, edges[1:])], align="edge",
+               color=["#16a34a" if e >= 0 else "#dc2626" for e in edges[:-1]], edgecolor="white")
+        ax.set_title("P/L distribution")
+        ax.set_ylabel("Trades")
+    else:
+        ax.bar(data["labels"], data["win_rate"], color="#2563eb")
+        for i, n in enumerate(data["trades"]):
+            ax.annotate(f"{n} trades", (i, data["win_rate"][i]), ha="center", va="bottom", fontsize=8)
+        ax.set_ylim(0, 105)
+        ax.set_title("Win rate by session (%)")
+    ax.grid(alpha=0.3)
+    fig.tight_layout()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format=fmt)
+    if fmt == "svg":                    # before dest, which is what get() looks for
+        _write(dest + ".gz", gzip.compress(buf.getvalue(), compresslevel=9, mtime=0))
+    _write(dest, buf.getvalue())
+    return dest
+
+
+def _write(dest, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), prefix=".chart-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            out.write(data)
+        os.replace(tmp, dest)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _submit(dest, chart, size, fmt, data, workers, budget):
+    pool = _pool(workers)
+    with _lock:
+        fut = _pending.get(dest)
+        if fut is None:
+            fut = pool.submit(_render, dest, chart, size, fmt, data)
+            _pending[dest] = fut
+
+            def done(_):
+                _pending.pop(dest, None)
+                thumbnails.evict(os.path.dirname(dest), budget)
+            fut.add_done_callback(done)
+    return fut
+
+
+def get(root, db, project_id, version, chart, size, fmt, config):
+    """Path of the rendered chart, or None while it renders in the background.
+
+    A cold render takes seconds (spawning the pool, importing matplotlib),
+    so the request waits at most CHART_WAIT for it and the page retries.
+    """
+    dest = os.path.abspath(chart_path(root, project_id, version, chart, size, fmt))   # workers have their own cwd
+    if os.path.exists(dest):
+        os.utime(dest)
+        return dest
+    os.makedirs(chart_dir(root), exist_ok=True)
+    fut = _pending.get(dest)
+    if fut is None:
+        data = series(db, project_id, chart, SIZES[size][0])
+        fut = _submit(dest, chart, size, fmt, data, config["CHART_WORKERS"], config["CHART_CACHE_BYTES"])
+    try:
+        return fut.result(timeout=config["CHART_WAIT"])
+    except FutureTimeout:
+        return None
+
+
+def send(db, project_id, chart, fmt, size, version=None):
+    """Serve a chart with (project, data version, chart, size) as its ETag.
+
+    Like image_store.send: a URL carrying ?v=<current data version> can
+    never show other data, so it is cached as immutable; otherwise the
+    browser revalidates and gets a 304 while the data is unchanged.
+    """
+    current = stats.data_version(db, project_id)
+    gz = fmt == "svg" and request.accept_encodings.quality("gzip") > 0
+    etag = os.path.basename(chart_path("", project_id, current, chart, size, fmt)) + ".gz" * gz
+    if request.if_none_match.contains(etag):
+        resp = current_app.response_class(status=304)
+    else:
+        path = get(image_store.root(), db, project_id, current, chart, size, fmt, current_app.config)
+        if path is None:
+            return "Chart is still rendering", 503, {"Retry-After": "1", "Cache-Control": "no-store"}
+        if gz and not os.path.exists(path + ".gz"):     # evicted on its own: serve it plain
+            gz, etag = False, etag[:-3]
+        resp = send_file(os.path.abspath(path + ".gz" * gz), mimetype=FORMATS[fmt], etag=etag, conditional=True)
+        if gz:
+            resp.headers["Content-Encoding"] = "gzip"
+
+    resp.set_etag(etag)
+    if fmt == "svg":
+        resp.vary.add("Accept-Encoding")
+    resp.cache_control.private = True
+    if version == str(current):
+        resp.cache_control.no_cache = None
+        resp.cache_control.max_age = image_store.IMMUTABLE_MAX_AGE
+        resp.cache_control.immutable = True
+    else:
+        resp.cache_control.no_cache = True
+    return resp
+
+
+def forget(root, project_id):
+    for path in glob.glob(os.path.join(chart_dir(root), f"{project_id}-*")):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
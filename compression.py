@@ -0,0 +1,89 @@
+# compression.py – gzip / brotli for text responses
+#
+# The dashboard and setups tables, JSON and CSV exports shrink five to ten
+# times compressed, which is most of their transfer time on a slow link.
+# Responses are compressed after the view runs when the client accepts
+# it: brotli if the optional brotli package is installed, gzip otherwise.
+# Streamed responses (exports, the import progress page) are compressed
+# chunk by chunk with a flush per chunk, so they still arrive as they are
+# produced. send_file responses pass through untouched: screenshots and
+# PNG charts are compressed formats already, and SVG charts are served
+# from gzipped copies written when they render (see charts.py).
+
+import zlib
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIMETYPES = {"text/html", "text/css", "text/csv", "text/plain", "text/javascript",
+             "application/json", "application/javascript", "image/svg+xml"}
+SKIP_STATUS = {204, 206, 304}
+
+
+def configure(app):
+    app.config.setdefault("COMPRESS_ENABLED", True)
+    app.config.setdefault("COMPRESS_MIN_SIZE", 500)         # bytes; smaller bodies aren't worth it
+    app.config.setdefault("COMPRESS_GZIP_LEVEL", 6)
+    app.config.setdefault("COMPRESS_BROTLI_QUALITY", 4)     # about gzip -6's speed, a better ratio
+    app.after_request(compress)
+
+
+def choose(accept):
+    """'br', 'gzip' or None for an Accept-Encoding header (a werkzeug Accept)."""
+    br, gz = (accept.quality("br") if brotli else 0), accept.quality("gzip")
+    if br and br >= gz:
+        return "br"
+    return "gzip" if gz else None
+
+
+class _Compressor:
+    def __init__(self, coding, config):
+        if coding == "br":
+            self._c = brotli.Compressor(quality=config["COMPRESS_BROTLI_QUALITY"])
+            self.step = lambda b: self._c.process(b) + self._c.flush()
+            self.finish = self._c.finish
+        else:
+            self._c = zlib.compressobj(config["COMPRESS_GZIP_LEVEL"], zlib.DEFLATED, 31)   # 31: gzip container
+            self.step = lambda b: self._c.compress(b) + self._c.flush(zlib.Z_SYNC_FLUSH)
+            self.finish = self._c.flush
+
+
+def _stream(chunks, compressor, charset):
+    try:
+        for chunk in chunks:
+            data = compressor.step(chunk.encode(charset) if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+def compress(response):
+    config = current_app.config
+    if (not config["COMPRESS_ENABLED"] or response.direct_passthrough or response.status_code in SKIP_STATUS
+            or response.status_code < 200 or "Content-Encoding" in response.headers
+            or response.mimetype not in MIMETYPES):
+        return response
+    response.vary.add("Accept-Encoding")
+    coding = choose(request.accept_encodings)
+    if coding is None:
+        return response
+    if response.is_streamed:
+        response.response = _stream(response.response, _Compressor(coding, config), "utf-8")
+        response.headers.pop("Content-Length", None)
+    else:
+        body = response.get_data()
+        if len(body) < config["COMPRESS_MIN_SIZE"]:
+            return response
+        c = _Compressor(coding, config)
+        response.set_data(c.step(body) + c.finish())
+    response.headers["Content-Encoding"] = coding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)      # the bytes differ from the uncompressed ETag's
+    return response
@@ -0,0 +1,133 @@
+# db_pool.py – reusable SQLite connections for request handlers
+#
+# Each worker process keeps a small stack of open connections per database
+# file instead of connecting (and re-reading the schema) on every request.
+# Connections are opened in WAL mode so readers never wait on a writer,
+# and carry the PRAGMAs from app.config["SQLITE_PRAGMAS"].
+#
+# A connection stays bound to the file it opened even after that file is
+# renamed, so each one remembers the (device, inode) it was opened on and
+# is dropped instead of reused once the path names a different file.
+# A `<path>.retiring` marker (tenancy.retire) takes a file out of service:
+# no connection to it is handed out again and idle ones are closed, on
+# release or by sweep(), until no process has it open and it can move.
+
+import os, queue, sqlite3, threading
+
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",      # fsync on checkpoint only; safe with WAL
+    "busy_timeout": 5000,         # ms to wait for the write lock
+    "cache_size": -16000,         # negative = KiB, so ~16 MB page cache
+    "mmap_size": 128 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
+RETIRING = ".retiring"
+
+_pools = {}
+_lock = threading.Lock()
+
+
+def configure(app):
+    app.config.setdefault("SQLITE_POOL_SIZE", 8)
+    app.config.setdefault("SQLITE_STATEMENT_CACHE", 256)
+    app.config.setdefault("SQLITE_PRAGMAS", dict(DEFAULT_PRAGMAS))
+
+
+class Retiring(sqlite3.OperationalError):
+    pass
+
+
+def retiring(path):
+    return os.path.exists(path + RETIRING)
+
+
+class Connection(sqlite3.Connection):
+    file_id = None
+
+
+def file_id(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_dev, st.st_ino
+
+
+class Pool:
+    def __init__(self, path, size, pragmas, statement_cache):
+        self.path = path
+        self.pragmas = pragmas
+        self.statement_cache = statement_cache
+        self.pid = os.getpid()
+        self._idle = queue.LifoQueue(maxsize=max(size, 1))
+        self.size = size
+
+    def connect(self):
+        db = sqlite3.connect(self.path, check_same_thread=False,
+                             cached_statements=self.statement_cache, factory=Connection)
+        db.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            db.execute(f"PRAGMA {name}={value}")
+        db.file_id = file_id(self.path)
+        return db
+
+    def acquire(self):
+        if retiring(self.path):
+            self.close()
+            raise Retiring(f"{self.path} is being retired")
+        current = file_id(self.path)
+        while True:
+            try:
+                db = self._idle.get_nowait()
+            except queue.Empty:
+                return self.connect()
+            if db.file_id == current:
+                return db
+            db.close()              # the path was replaced under it
+
+    def release(self, db):
+        if db.in_transaction:
+            db.rollback()
+        if self.size <= 0 or db.file_id != file_id(self.path) or retiring(self.path):
+            db.close()
+            return
+        try:
+            self._idle.put_nowait(db)
+        except queue.Full:
+            db.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def get_pool(path, config, size=None):
+    """The calling process's pool for `path`, created on first use.
+
+    `size` overrides SQLITE_POOL_SIZE, e.g. for the many small per-user
+    files of tenancy.py.
+
+    Pools are keyed by pid so a forked worker never inherits its parent's
+    open connections.
+    """
+    key = os.path.abspath(path)
+    pool = _pools.get(key)
+    if pool is None or pool.pid != os.getpid():
+        with _lock:
+            pool = _pools.get(key)
+            if pool is None or pool.pid != os.getpid():
+                size = config["SQLITE_POOL_SIZE"] if size is None else size
+                pool = _pools[key] = Pool(key, size, config["SQLITE_PRAGMAS"], config["SQLITE_STATEMENT_CACHE"])
+    return pool
+
+
+def sweep():
+    """Close this process's idle connections to files being retired."""
+    for pool in list(_pools.values()):
+        if pool.pid == os.getpid() and retiring(pool.path):
+            pool.close()
@@ -0,0 +1,103 @@
+# exporter.py – streaming CSV / Parquet export of trades and setups
+#
+# Rows are pulled from SQLite with fetchmany() and encoded one batch at a
+# time, so an export's memory use depends on BATCH_SIZE, not on the size of
+# the journal. Parquet needs pyarrow, which is optional: without it only
+# CSV is offered.
+
+import csv, io
+import stats
+
+BATCH_SIZE = 5000
+
+TRADE_COLS = ("id", "date", "symbol", "direction", "entry", "exit", "lot_size", "rr",
+              "session_name", "result", "profit", "notes")
+SETUP_COLS = ("id", "date", "title", "session_name", "timeframe", "market", "result",
+              "r_multiple", "profit", "entry_notes", "review_notes", "entry_criteria", "exit_criteria")
+
+# Parquet column types; everything else is a string
+NUMERIC = {"entry", "exit", "lot_size", "rr", "profit", "r_multiple"}
+
+FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+
+def trades_query(project_id, screenshots=False):
+    cols = TRADE_COLS + (("screenshot_hash",) if screenshots else ())
+    return cols, f"SELECT {', '.join(cols)} FROM trades WHERE project_id=? ORDER BY date, id", (project_id,)
+
+
+def setups_query(user_id):
+    return SETUP_COLS, f"SELECT {', '.join(SETUP_COLS)} FROM backtest_setups WHERE user_id=? ORDER BY date, id", (user_id,)
+
+
+def batches(db, sql, params, size=BATCH_SIZE):
+    cur = db.execute(sql, params)
+    while True:
+        rows = cur.fetchmany(size)
+        if not rows:
+            return
+        yield rows
+
+
+def iter_csv(db, query):
+    cols, sql, params = query
+    buf = io.StringIO()
+    out = csv.writer(buf)
+    out.writerow(cols)
+    for rows in batches(db, sql, params):
+        out.writerows(tuple(r) for r in rows)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _Chunks(io.RawIOBase):
+    """Write-only file that hands back whatever was written since last drain()."""
+
+    def __init__(self):
+        self.parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.parts.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def iter_parquet(db, query):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    cols, sql, params = query
+    schema = pa.schema([(c, pa.int64() if c == "id" else pa.float64() if c in NUMERIC else pa.string())
+                        for c in cols])
+    sink = _Chunks()
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for rows in batches(db, sql, params):
+            data = {c: [r[i] for r in rows] for i, c in enumerate(cols)}
+            for c in NUMERIC & data.keys():
+                data[c] = [stats.to_float(v) for v in data[c]]
+            for c in data.keys() - NUMERIC - {"id"}:
+                data[c] = [None if v is None else str(v) for v in data[c]]
+            writer.write_table(pa.Table.from_pydict(data, schema=schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def stream(db, query, fmt):
+    return iter_parquet(db, query) if fmt == "parquet" else iter_csv(db, query)
@@ -0,0 +1,197 @@
+# image_store.py – content-addressed screenshot storage
+#
+# Uploaded images live on disk under IMAGE_DIR, named by the SHA-256 of
+# their bytes (images/ab/abcdef…). The `images` table keeps one row per
+# file with a reference count, so identical uploads share a single file.
+#
+# Files only change under the database's write lock and never on the
+# request path: put() increments the row before it moves its file into
+# place, and a row whose count drops to zero stays until the maintenance
+# gc (collect()) deletes it and its file in one write transaction. A
+# rolled-back put can leave a file without a row; gc sweeps those too.
+
+import hashlib, os, re, tempfile, time
+from flask import current_app, request, send_file
+import thumbnails, tenancy
+
+CHUNK = 64 * 1024
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+SHARD = re.compile(r"^[0-9a-f]{2}$")
+HASH = re.compile(r"^[0-9a-f]{64}$")
+
+SIGNATURES = [
+    (b"\x89PNG", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+]
+
+
+def sniff_mime(head):
+    for magic, mime in SIGNATURES:
+        if head.startswith(magic):
+            return mime
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def root():
+    """IMAGE_DIR, or the current user's own directory under it in tenant mode (see tenancy.py)."""
+    return tenancy.image_root(current_app.config, tenancy.current())
+
+
+def path_for(h):
+    return os.path.join(root(), h[:2], h)
+
+
+def put(db, src, prefetch=True):
+    """Store `src` (bytes or a file object) and take a reference to it.
+
+    Returns the content hash. The upload is streamed to a temp file while
+    it is hashed, so large files never sit in memory in one piece. With
+    `prefetch`, the common thumbnail sizes are queued for rendering.
+    """
+    os.makedirs(root(), exist_ok=True)
+    digest, size, head = hashlib.sha256(), 0, b""
+    fd, tmp = tempfile.mkstemp(dir=root(), prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            if isinstance(src, (bytes, bytearray, memoryview)):
+                chunks = [bytes(src)]
+            else:
+                chunks = iter(lambda: src.read(CHUNK), b"")
+            for chunk in chunks:
+                if len(head) < 16:
+                    head += chunk[:16]
+                digest.update(chunk)
+                size += len(chunk)
+                out.write(chunk)
+
+        h = digest.hexdigest()
+        db.execute("INSERT OR IGNORE INTO images (hash, size, mime) VALUES (?, ?, ?)",
+                   (h, size, sniff_mime(head)))
+        db.execute("UPDATE images SET refs = refs + 1 WHERE hash=?", (h,))
+        # Checked only now, holding the write lock: collect() can't be
+        # halfway through unlinking this hash's file any more.
+        dest = path_for(h)
+        if os.path.exists(dest):
+            os.unlink(tmp)
+        else:
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            os.replace(tmp, dest)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+    if prefetch:
+        thumbnails.prefetch(root(), dest, h, current_app.config["THUMB_CACHE_BYTES"])
+    return h
+
+
+def release(db, h):
+    """Drop one reference to `h`; the maintenance gc deletes the file once nothing uses it."""
+    if h:
+        db.execute("UPDATE images SET refs = refs - 1 WHERE hash=?", (h,))
+
+
+def collect(db, limit):
+    """Delete up to `limit` unreferenced images, rows and files; the caller commits.
+
+    The DELETE takes the write lock first, so no put() of the same bytes
+    can take a new reference until this transaction ends, and one that
+    follows finds the file gone and writes it again. If the commit fails
+    the rows survive with no references and the next gc retries them.
+    """
+    hashes = [r[0] for r in db.execute("""DELETE FROM images WHERE hash IN
+        (SELECT hash FROM images WHERE refs <= 0 LIMIT ?) RETURNING hash""", (limit,)).fetchall()]
+    for h in hashes:
+        try:
+            os.unlink(path_for(h))
+        except FileNotFoundError:
+            pass
+        thumbnails.discard(root(), h)
+    return len(hashes)
+
+
+def strays(db, max_age):
+    """Image files with no row (left by a rolled-back put), untouched for `max_age` seconds."""
+    known, cutoff, out = {r[0] for r in db.execute("SELECT hash FROM images")}, time.time() - max_age, []
+    base = root()
+    try:
+        shards = [d for d in os.listdir(base) if SHARD.match(d)]
+    except FileNotFoundError:
+        return out
+    for shard in shards:
+        for name in os.listdir(os.path.join(base, shard)):
+            path = os.path.join(base, shard, name)
+            if name not in known and HASH.match(name) and os.path.getmtime(path) < cutoff:
+                out.append(path)
+    return out
+
+
+def send(db, h, version=None, size=None):
+    """Serve image `h` with the content hash as a strong ETag.
+
+    A matching If-None-Match is answered with 304 before the file is even
+    opened. When the URL carries ?v=<hash prefix> it can never point at
+    different bytes, so it is cached as immutable; otherwise the browser
+    revalidates. Range requests are handled by send_file. `size` asks for
+    a thumbnail of at least that height (WebP when the browser takes it).
+    """
+    etag = h
+    if size:
+        size = thumbnails.pick_size(size)
+        fmt = thumbnails.pick_format(request.headers.get("Accept"))
+        etag = f"{h}-{size}.{fmt}"
+
+    if request.if_none_match.contains(etag):
+        resp = current_app.response_class(status=304)
+    else:
+        row = db.execute("SELECT mime FROM images WHERE hash=?", (h,)).fetchone()
+        path, mime = path_for(h), row[0] if row else None
+        if not row or not os.path.exists(path):
+            return "Image not found", 404
+        if size:
+            cfg = current_app.config
+            thumb = thumbnails.get(root(), path, h, size, fmt, cfg["THUMB_CACHE_BYTES"], cfg["THUMB_WAIT"])
+            if thumb:
+                path, mime = thumb, thumbnails.FORMATS[fmt]
+            else:
+                etag = h
+        # Serving by path lets the WSGI server use sendfile() instead of
+        # copying the bytes through Python.
+        resp = send_file(os.path.abspath(path), mimetype=mime, etag=etag, conditional=True)
+
+    resp.set_etag(etag)
+    if size:
+        resp.vary.add("Accept")
+    resp.cache_control.private = True
+    if version and len(version) >= 8 and h.startswith(version):
+        resp.cache_control.no_cache = None
+        resp.cache_control.max_age = IMMUTABLE_MAX_AGE
+        resp.cache_control.immutable = True
+    else:
+        resp.cache_control.no_cache = True
+    return resp
+
+
+def migrate_blobs(db, batch=200):
+    """Move screenshots still stored as BLOBs into the image store."""
+    moved = 0
+    for table, blob, col in (("trades", "screenshot", "screenshot_hash"),
+                             ("backtest_screenshots", "image", "image_hash")):
+        last = 0
+        while True:
+            rows = db.execute(f"""SELECT id, {blob} FROM {table}
+                WHERE id > ? AND {blob} IS NOT NULL AND {col} IS NULL
+                ORDER BY id LIMIT ?""", (last, batch)).fetchall()
+            if not rows:
+                break
+            for rid, data in rows:
+                db.execute(f"UPDATE {table} SET {col}=?, {blob}=NULL WHERE id=?",
+                           (put(db, data, prefetch=False), rid))
+            db.commit()
+            last = rows[-1][0]
+            moved += len(rows)
+    return moved
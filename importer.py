@@ -0,0 +1,223 @@
+# importer.py – bulk trade import from CSV / MT4 / MT5 statements
+#
+# The file is decoded and parsed one row at a time straight off the upload
+# stream, normalised into the trades schema and written with executemany()
+# in batches, each batch in its own transaction together with its
+# project_stats delta. Only one batch is ever held in memory.
+
+import codecs, csv, io, itertools, re
+from datetime import datetime
+import stats
+
+BATCH_SIZE = 1000
+MAX_ERRORS = 50
+
+# Header spellings seen in broker exports, after lower-casing and dropping
+# everything but letters/digits. MT4 statements have two "Price" columns
+# (open, close): the first one fills entry, the second exit.
+ALIASES = {
+    "date": ("date", "opentime", "opendate", "time", "datetime"),
+    "symbol": ("symbol", "item", "instrument", "pair", "market"),
+    "direction": ("direction", "type", "side", "action"),
+    "entry": ("entry", "entryprice", "openprice", "price"),
+    "exit": ("exit", "exitprice", "closeprice", "price"),
+    "lot_size": ("lotsize", "lots", "size", "volume"),
+    "rr": ("rr", "riskreward", "rmultiple"),
+    "session_name": ("session", "sessionname"),
+    "result": ("result", "outcome"),
+    "profit": ("profit", "pl", "pnl", "netprofit", "profitloss"),
+    "notes": ("notes", "comment", "comments"),
+}
+REQUIRED = ("date", "symbol", "direction")
+COLUMNS = ("date", "symbol", "direction", "entry", "exit", "lot_size", "rr",
+           "session_name", "result", "profit", "notes")
+NUMBERS = ("entry", "exit", "lot_size", "profit")
+
+DATE_FORMATS = ("%Y-%m-%d", "%Y.%m.%d", "%Y/%m/%d", "%m/%d/%Y", "%d.%m.%Y")
+RESULTS = {"win": "Win", "loss": "Loss", "be": "BE", "break-even": "BE", "breakeven": "BE"}
+NOT_TRADES = ("balance", "credit", "deposit", "withdrawal")
+
+
+class StatementError(ValueError):
+    """The file as a whole can't be imported (bad header, not CSV...)."""
+
+
+def _key(header):
+    return re.sub(r"[^a-z0-9]", "", header.lower())
+
+
+def map_header(header):
+    """Column index for each trades field found in `header`."""
+    cols = {}
+    for i, h in enumerate(header):
+        k = _key(h)
+        for field, names in ALIASES.items():
+            if field not in cols and k in names:
+                cols[field] = i
+                break
+    missing = [f for f in REQUIRED if f not in cols]
+    if missing:
+        raise StatementError(f"Missing column(s): {', '.join(missing)}")
+    return cols
+
+
+def text_stream(binary):
+    """Decode a binary stream lazily, honouring UTF-8/UTF-16 BOMs (MT5 writes UTF-16)."""
+    buffered = binary if hasattr(binary, "peek") else io.BufferedReader(binary)
+    head = buffered.peek(4)[:4]
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        encoding = "utf-16"
+    else:
+        encoding = "utf-8-sig"
+    return io.TextIOWrapper(buffered, encoding=encoding, errors="replace", newline="")
+
+
+def read_rows(binary):
+    """Yield (line number, {field: raw value}) for each data row."""
+    text = text_stream(binary)
+    sample = text.readline()
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel
+    header = next(csv.reader([sample], dialect), None)
+    if not header:
+        raise StatementError("The file is empty.")
+    cols = map_header(header)
+
+    for line_no, row in enumerate(csv.reader(text, dialect), start=2):
+        if not any(cell.strip() for cell in row):
+            continue
+        yield line_no, {f: row[i].strip() if i < len(row) else "" for f, i in cols.items()}
+
+
+def _num(value, decimal="."):
+    value = (value or "").replace(" ", "").replace("\xa0", "")
+    if not value:
+        return None
+    thousands = "," if decimal == "." else "."
+    if value.count(decimal) > 1 or thousands in value.partition(decimal)[2]:
+        raise ValueError(f"bad number {value!r}")
+    return float(value.replace(thousands, "").replace(decimal, "."))
+
+
+def detect_decimal(values):
+    """The decimal separator the numbers in `values` agree on, or None.
+
+    A value only tells when both separators appear (the last one is the
+    decimal point), when one repeats (it groups thousands) or when one is
+    not followed by exactly three digits. "1,234" alone could be either.
+    """
+    for value in values:
+        value = (value or "").replace(" ", "").replace("\xa0", "")
+        if "," in value and "." in value:
+            return "," if value.rfind(",") > value.rfind(".") else "."
+        for sep, other in ((",", "."), (".", ",")):
+            if sep in value:
+                if value.count(sep) > 1:
+                    return other
+                if len(value.rpartition(sep)[2]) != 3:
+                    return sep
+    return None
+
+
+def _date(value):
+    day = re.split(r"[ T]", value.strip(), maxsplit=1)[0]
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(day, fmt).date().isoformat()
+        except ValueError:
+            pass
+    raise ValueError(f"unrecognised date {value!r}")
+
+
+def normalise(raw, decimal="."):
+    """Map one raw row onto the trades columns; None for non-trade rows."""
+    side = raw["direction"].lower()
+    if any(w in side for w in NOT_TRADES) or "limit" in side or "stop" in side:
+        return None
+    if side.startswith(("buy", "long")):
+        direction = "Buy"
+    elif side.startswith(("sell", "short")):
+        direction = "Sell"
+    else:
+        raise ValueError(f"unknown direction {raw['direction']!r}")
+    if not raw["symbol"]:
+        raise ValueError("missing symbol")
+
+    try:
+        profit = _num(raw.get("profit"), decimal)
+        trade = {
+            "date": _date(raw["date"]),
+            "symbol": raw["symbol"].upper(),
+            "direction": direction,
+            "entry": _num(raw.get("entry"), decimal),
+            "exit": _num(raw.get("exit"), decimal),
+            "lot_size": _num(raw.get("lot_size"), decimal),
+            "rr": raw.get("rr") or None,
+            "session_name": raw.get("session_name") or None,
+            "profit": profit,
+            "notes": raw.get("notes") or None,
+        }
+    except ValueError as e:
+        raise ValueError(str(e).replace("could not convert string to float: ", "bad number ")) from None
+
+    result = RESULTS.get((raw.get("result") or "").lower())
+    if result is None and profit is not None:
+        result = "Win" if profit > 0 else "Loss" if profit < 0 else "BE"
+    trade["result"] = result
+    return trade
+
+
+def _flush(db, project_id, batch):
+    db.executemany(f"INSERT INTO trades (project_id, {', '.join(COLUMNS)}) "
+                   f"VALUES (?{', ?' * len(COLUMNS)})",
+                   [(project_id, *(t[c] for c in COLUMNS)) for t in batch])
+    stats.apply_batch(db, project_id, batch)
+    db.commit()
+
+
+def import_trades(db, project_id, binary, batch_size=BATCH_SIZE, decimal=None):
+    """Import a statement into `project_id`, yielding progress after each batch.
+
+    The same dict is yielded every time, updated in place: rows read,
+    trades imported, rows skipped and the first MAX_ERRORS problems.
+    `decimal` is the file's decimal separator; by default it is detected
+    from the first batch of rows (a period when nothing there tells).
+    """
+    progress = {"rows": 0, "imported": 0, "skipped": 0, "errors": [], "done": False}
+    batch = []
+    rows = read_rows(binary)
+    try:
+        first = list(itertools.islice(rows, batch_size))
+    except StatementError as e:
+        progress["errors"].append(str(e))
+        progress["done"] = True
+        yield progress
+        return
+    if decimal is None:
+        decimal = detect_decimal(raw.get(f) for _, raw in first for f in NUMBERS) or "."
+
+    for line_no, raw in itertools.chain(first, rows):
+        progress["rows"] += 1
+        try:
+            trade = normalise(raw, decimal)
+        except ValueError as e:
+            trade = None
+            if len(progress["errors"]) < MAX_ERRORS:
+                progress["errors"].append(f"line {line_no}: {e}")
+        if trade is None:
+            progress["skipped"] += 1
+            continue
+        batch.append(trade)
+        if len(batch) >= batch_size:
+            _flush(db, project_id, batch)
+            progress["imported"] += len(batch)
+            batch = []
+            yield progress
+
+    if batch:
+        _flush(db, project_id, batch)
+        progress["imported"] += len(batch)
+    progress["done"] = True
+    yield progress
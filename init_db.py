@@ -1,63 +1,9 @@
-# init_db.py
-import sqlite3
+# init_db.py – create or upgrade journal.db to the app's current schema
+#
+# Same as `flask --app app init-db` / `alembic upgrade head`; the schema
+# itself lives in migrations/versions.
+from app import init_db
 
-conn = sqlite3.connect('journal.db')
-cursor = conn.cursor()
-
-# Users table
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS users (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    email TEXT UNIQUE NOT NULL,
-    password TEXT NOT NULL
-)
-''')
-
-# Projects table
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS projects (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER NOT NULL,
-    name TEXT NOT NULL,
-    FOREIGN KEY (user_id) REFERENCES users(id)
-)
-''')
-
-# Trades table
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS trades (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER NOT NULL,
-    project_id INTEGER NOT NULL,
-    date TEXT,
-    symbol TEXT,
-    direction TEXT,
-    entry_price REAL,
-    exit_price REAL,
-    profit_loss REAL,
-    strategy TEXT,
-    notes TEXT,
-    screenshot BLOB,
-    FOREIGN KEY (user_id) REFERENCES users(id),
-    FOREIGN KEY (project_id) REFERENCES projects(id)
-)
-''')
-
-# Setups table
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS setups (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER NOT NULL,
-    date TEXT,
-    entry_reason TEXT,
-    result TEXT,
-    notes TEXT,
-    screenshot BLOB,
-    FOREIGN KEY (user_id) REFERENCES users(id)
-)
-''')
-
-conn.commit()
-conn.close()
+init_db()
 
 print("✅ Database initialized.")
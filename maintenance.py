@@ -0,0 +1,365 @@
+# maintenance.py – background housekeeping: orphan GC, vacuum, ANALYZE, backups
+#
+# Each worker process runs one scheduler thread, started by its first
+# request. Tasks are claimed through maintenance_runs in the catalog with
+# a lease, like upload jobs, so with several gunicorn workers each task
+# still runs once per MAINTENANCE_EVERY interval. GC and vacuum work in
+# small batches, committing and pausing between them so request writers
+# get the lock back, and stop after MAINTENANCE_BUDGET seconds; whatever
+# is left is requested again for the next poll. Backups copy each file
+# through SQLite's online backup API, BACKUP_PAGES pages per step, into
+# BACKUP_DIR/<timestamp>/, which readers and writers carry on through.
+#
+# `flask maintenance` runs tasks by hand; /admin/maintenance shows them.
+
+import logging, os, re, shutil, sqlite3, threading, time
+from collections import Counter
+from contextlib import contextmanager
+from flask import g
+import db_pool, image_store, tenancy, uploads, charts, reports, stats
+
+TASKS = ("gc", "vacuum", "analyze", "backup")
+LEASE = "+30 minutes"       # a crashed run holds its task this long
+STAMP = re.compile(r"^\d{8}-\d{6}$")
+RETIRED = re.compile(r"-(\d{14})(?:\.db)?(?:-wal|-shm)?$")
+
+# Rows whose owner is gone, e.g. everything of a deleted user. Earlier
+# entries orphan later ones (projects -> trades), so a pass walks them in
+# order: (table, owner column, parent table, column to clean up after).
+# cache_versions rows outlive their user on purpose (see cache.carry), and
+# project_stats rows their project (see stats.forget_project).
+ORPHANS = [
+    ("projects", "user_id", "users", None),
+    ("trades", "project_id", "projects", "screenshot_hash"),
+    ("backtest_setups", "user_id", "users", None),
+    ("backtest_screenshots", "setup_id", "backtest_setups", "image_hash"),
+    ("upload_jobs", "setup_id", "backtest_setups", "spool_path"),
+    ("api_tokens", "user_id", "users", None),
+]
+
+log = logging.getLogger("trading_journal.maintenance")
+
+_lock = threading.Lock()
+_scheduler = {"pid": None, "wake": None}
+
+
+def configure(app, databases):
+    """`databases()` lists the (user id, path) of every file to look after, the catalog first."""
+    app.config.setdefault("MAINTENANCE_ENABLED", True)
+    app.config.setdefault("MAINTENANCE_POLL", 60)           # s between schedule checks
+    app.config.setdefault("MAINTENANCE_EVERY", {"gc": 3600, "vacuum": 3600, "analyze": 86400, "backup": 86400})
+    app.config.setdefault("MAINTENANCE_BUDGET", 2.0)        # s of gc / vacuum / analyze per run
+    app.config.setdefault("MAINTENANCE_PAUSE", 0.05)        # s between batches, for request writers
+    app.config.setdefault("MAINTENANCE_BATCH", 500)         # rows per gc transaction
+    app.config.setdefault("VACUUM_PAGES", 256)              # free pages returned per vacuum step
+    app.config.setdefault("ANALYZE_LIMIT", 400)             # rows sampled per index (PRAGMA analysis_limit)
+    app.config.setdefault("UPLOAD_JOBS_KEEP_DAYS", 7)
+    app.config.setdefault("RETIRED_KEEP_DAYS", 30)          # deleted users' tenant files (tenancy.retire)
+    app.config.setdefault("BACKUP_DIR", "backups")
+    app.config.setdefault("BACKUP_KEEP", 7)
+    app.config.setdefault("BACKUP_PAGES", 512)
+    app.config.setdefault("BACKUP_SLEEP", 0.01)             # s between backup steps
+    app.extensions["maintenance"] = databases
+    app.before_request(lambda: start(app))
+
+
+# ── scheduling ──
+
+def start(app):
+    """Start this process's scheduler thread unless it is running (or disabled)."""
+    if _scheduler["pid"] == os.getpid() or not app.config["MAINTENANCE_ENABLED"] or app.testing:
+        return
+    with _lock:
+        if _scheduler["pid"] != os.getpid():        # none yet, or inherited across a fork
+            _scheduler.update(pid=os.getpid(), wake=threading.Event())
+            threading.Thread(target=_loop, args=(app, _scheduler["wake"]), name="maintenance", daemon=True).start()
+
+
+def wake():
+    if _scheduler["wake"] is not None and _scheduler["pid"] == os.getpid():
+        _scheduler["wake"].set()
+
+
+def _loop(app, wake):
+    while True:
+        db_pool.sweep()                 # let go of retiring tenant files, so gc can move them
+        for task in TASKS:
+            try:
+                run(app, task)
+            except Exception:
+                log.exception("maintenance task %s failed", task)
+        wake.wait(app.config["MAINTENANCE_POLL"])
+        wake.clear()
+
+
+@contextmanager
+def _connection(config, path, user_id=None):
+    pool = db_pool.get_pool(path, config, None if user_id is None else config["TENANT_POOL_SIZE"])
+    db = pool.acquire()
+    try:
+        yield db
+    finally:
+        pool.release(db)
+
+
+def claim(db, task, every, force=False):
+    db.execute("INSERT OR IGNORE INTO maintenance_runs (task) VALUES (?)", (task,))
+    row = db.execute("""UPDATE maintenance_runs SET status='running', started_at=CURRENT_TIMESTAMP,
+            requested=0, runs=runs+1, lease_until=datetime('now', ?)
+        WHERE task=? AND (lease_until IS NULL OR lease_until < CURRENT_TIMESTAMP)
+          AND (? OR requested OR started_at IS NULL OR started_at <= datetime('now', ?))
+        RETURNING task""", (LEASE, task, force, f"-{every} seconds")).fetchone()
+    db.commit()
+    return row is not None
+
+
+def finish(db, task, status, started, detail, more=False):
+    db.execute("""UPDATE maintenance_runs SET status=?, finished_at=CURRENT_TIMESTAMP, duration_ms=?, detail=?,
+            requested = requested OR ?, lease_until=NULL WHERE task=?""",
+               (status, round((time.perf_counter() - started) * 1000, 1), detail, more, task))
+    db.commit()
+
+
+def request(db, task):
+    """Have `task` run on the next poll of any scheduler."""
+    db.execute("INSERT OR IGNORE INTO maintenance_runs (task) VALUES (?)", (task,))
+    db.execute("UPDATE maintenance_runs SET requested=1 WHERE task=?", (task,))
+
+
+def run(app, task, force=False):
+    """Run `task` if it is due (or `force`) and no other worker holds it; its summary, or None."""
+    with app.app_context():
+        dbs = app.extensions["maintenance"]()
+        with _connection(app.config, dbs[0][1]) as catalog:
+            if not claim(catalog, task, app.config["MAINTENANCE_EVERY"][task], force):
+                return None
+            started = time.perf_counter()
+            try:
+                detail, more = RUNNERS[task](app.config, dbs)
+            except Exception as e:
+                finish(catalog, task, "failed", started, f"{type(e).__name__}: {e}")
+                raise
+            finish(catalog, task, "idle", started, detail, more)
+            return detail
+
+
+def _files(n):
+    return f"{n} file{'s' * (n != 1)}"
+
+
+# ── tasks ──
+
+def gc(config, dbs):
+    deadline, counts, more = time.monotonic() + config["MAINTENANCE_BUDGET"], Counter(), False
+    for uid, path in dbs:
+        g.tenant = uid                  # image_store.root() follows the tenant
+        with _connection(config, path, uid) as db:
+            while _gc_step(db, config, counts):
+                if time.monotonic() > deadline:
+                    more = True
+                    break
+                time.sleep(config["MAINTENANCE_PAUSE"])
+            if more:
+                break
+            counts["stray files"] += _sweep_files(db)
+    g.pop("tenant", None)
+    if tenancy.enabled(config):
+        counts["retired tenants"] += sum(tenancy.finish_retire(config, uid) for uid in tenancy.retiring(config))
+        counts["purged tenants"] += _purge_retired(config)
+    return ", ".join(f"{n} {what}" for what, n in counts.items() if n) or "nothing to collect", more
+
+
+def _gc_step(db, config, counts):
+    """Delete one batch of orphans (or expired jobs, or unused images); how many rows went."""
+    batch = config["MAINTENANCE_BATCH"]
+    for table, col, parent, cleanup in ORPHANS:
+        owners = [r[0] for r in db.execute(f"""SELECT DISTINCT t.{col} FROM {table} t WHERE t.{col} IS NOT NULL
+            AND NOT EXISTS (SELECT 1 FROM {parent} p WHERE p.id = t.{col}) LIMIT 100""")]
+        if not owners:
+            continue
+        rows = db.execute(f"""SELECT rowid, {cleanup or 'NULL'} FROM {table}
+            WHERE {col} IN ({', '.join('?' * len(owners))}) LIMIT ?""", (*owners, batch)).fetchall()
+        for rowid, value in rows:
+            if cleanup == "spool_path":
+                _unlink(value)
+            elif cleanup:
+                image_store.release(db, value)
+            if table == "projects":
+                stats.forget_project(db, rowid)
+                reports.forget(rowid)
+                charts.forget(image_store.root(), rowid)
+        db.executemany(f"DELETE FROM {table} WHERE rowid=?", [(r[0],) for r in rows])
+        db.commit()
+        counts[table] += len(rows)
+        return len(rows)
+
+    jobs = db.execute("""DELETE FROM upload_jobs WHERE rowid IN (SELECT rowid FROM upload_jobs
+        WHERE status IN ('done', 'failed') AND updated_at < datetime('now', ?) LIMIT ?)""",
+                      (f"-{config['UPLOAD_JOBS_KEEP_DAYS']} days", batch)).rowcount
+    unused = image_store.collect(db, batch)
+    db.commit()
+    counts["old upload jobs"] += jobs
+    counts["unused images"] += unused
+    return jobs + unused
+
+
+def _sweep_files(db, max_age=86400):
+    """Unlink spool files no queued job points at, abandoned image temp files and images with no row, a day old or more."""
+    queued = {r[0] for r in db.execute("SELECT spool_path FROM upload_jobs WHERE status IN ('pending', 'processing')")}
+    cutoff, n = time.time() - max_age, 0
+    for d, prefix in ((uploads.spool_dir(), ""), (image_store.root(), ".upload-")):
+        try:
+            names = os.listdir(d)
+        except FileNotFoundError:
+            continue
+        for name in names:
+            path = os.path.join(d, name)
+            if name.startswith(prefix) and path not in queued and os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                n += _unlink(path)
+    for path in image_store.strays(db, max_age):
+        n += _unlink(path)
+    return n
+
+
+def _purge_retired(config):
+    retired, cutoff, n = os.path.join(config["TENANT_DIR"], "retired"), time.time() - config["RETIRED_KEEP_DAYS"] * 86400, 0
+    try:
+        names = os.listdir(retired)
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        m = RETIRED.search(name)
+        if m and time.mktime(time.strptime(m.group(1), "%Y%m%d%H%M%S")) < cutoff:
+            path = os.path.join(retired, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.unlink(path)
+            n += 1
+    return n
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+        return 1
+    except FileNotFoundError:
+        return 0
+
+
+def vacuum(config, dbs):
+    """Hand free pages back to the filesystem, VACUUM_PAGES at a time (needs auto_vacuum=INCREMENTAL)."""
+    deadline, freed, full, more = time.monotonic() + config["MAINTENANCE_BUDGET"], 0, 0, False
+    for uid, path in dbs:
+        with _connection(config, path, uid) as db:
+            if db.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                full += 1
+                continue
+            free = start = db.execute("PRAGMA freelist_count").fetchone()[0]
+            while free:
+                if time.monotonic() > deadline:
+                    more = True
+                    break
+                db.execute(f"PRAGMA incremental_vacuum({config['VACUUM_PAGES']})").fetchall()   # one page per step
+                free = db.execute("PRAGMA freelist_count").fetchone()[0]
+                time.sleep(config["MAINTENANCE_PAUSE"])
+            freed += start - free
+        if more:
+            break
+    detail = f"freed {freed} page(s)"
+    if full:
+        detail += f"; {_files(full)} need `flask vacuum-full` first"
+    return detail, more
+
+
+def analyze(config, dbs):
+    """Refresh the planner's statistics, sampling at most ANALYZE_LIMIT rows per index."""
+    deadline, done = time.monotonic() + config["MAINTENANCE_BUDGET"], 0
+    for uid, path in dbs:
+        if time.monotonic() > deadline:
+            return f"analyzed {_files(done)}, {len(dbs) - done} left", True
+        with _connection(config, path, uid) as db:
+            db.execute(f"PRAGMA analysis_limit={int(config['ANALYZE_LIMIT'])}")
+            db.execute("ANALYZE")
+            db.commit()
+        done += 1
+        time.sleep(config["MAINTENANCE_PAUSE"])
+    return f"analyzed {_files(done)}", False
+
+
+def backup(config, dbs):
+    """Copy every file into BACKUP_DIR/<timestamp>/ (tenants under tenants/), keeping BACKUP_KEEP sets."""
+    root = config["BACKUP_DIR"]
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    tmp = os.path.join(root, f".{stamp}.tmp")
+    size = 0
+    os.makedirs(tmp, exist_ok=True)
+    try:
+        for uid, path in dbs:
+            dest = os.path.join(tmp, os.path.basename(path) if uid is None else os.path.join("tenants", os.path.basename(path)))
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            with _connection(config, path, uid) as db:
+                out = sqlite3.connect(dest)
+                try:
+                    db.backup(out, pages=config["BACKUP_PAGES"], sleep=config["BACKUP_SLEEP"])
+                finally:
+                    out.close()
+            size += os.path.getsize(dest)
+        os.replace(tmp, os.path.join(root, stamp))
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    for old in [b["name"] for b in backups(config)][config["BACKUP_KEEP"]:]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return f"{_files(len(dbs))}, {size / 1e6:.1f} MB -> {os.path.join(root, stamp)}", False
+
+
+RUNNERS = {"gc": gc, "vacuum": vacuum, "analyze": analyze, "backup": backup}
+
+
+# ── status ──
+
+def status(db, config):
+    """Every task's last run and when it is next due, in TASKS order."""
+    rows = {r["task"]: dict(r) for r in db.execute("SELECT * FROM maintenance_runs")}
+    out = []
+    for task in TASKS:
+        row = rows.get(task) or {"task": task, "status": "never run", "runs": 0, "requested": 0, "started_at": None,
+                                 "finished_at": None, "duration_ms": None, "detail": None, "lease_until": None}
+        every = config["MAINTENANCE_EVERY"][task]
+        row["every"] = every
+        row["next_due"] = "next poll" if row.get("requested") or not row.get("started_at") else db.execute(
+            "SELECT datetime(?, ?)", (row["started_at"], f"+{every} seconds")).fetchone()[0]
+        out.append(row)
+    return out
+
+
+def file_stats(dbs):
+    """Size, free pages and vacuum mode of each database file, largest first."""
+    out = []
+    for uid, path in dbs:
+        if not os.path.exists(path):
+            continue
+        db = sqlite3.connect(path)
+        page_size, free, mode = (db.execute(f"PRAGMA {p}").fetchone()[0]
+                                 for p in ("page_size", "freelist_count", "auto_vacuum"))
+        db.close()
+        wal = path + "-wal"
+        out.append({"path": path, "user_id": uid, "size": os.path.getsize(path),
+                    "wal": os.path.getsize(wal) if os.path.exists(wal) else 0, "free": free * page_size,
+                    "auto_vacuum": {0: "none", 1: "full", 2: "incremental"}.get(mode, mode)})
+    return sorted(out, key=lambda f: -f["size"])
+
+
+def backups(config):
+    """Finished backup sets, newest first."""
+    root = config["BACKUP_DIR"]
+    try:
+        names = sorted((n for n in os.listdir(root) if STAMP.match(n)), reverse=True)
+    except FileNotFoundError:
+        return []
+    out = []
+    for name in names:
+        files = [os.path.join(d, f) for d, _, fs in os.walk(os.path.join(root, name)) for f in fs]
+        out.append({"name": name, "files": len(files), "size": sum(os.path.getsize(f) for f in files)})
+    return out
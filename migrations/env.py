@@ -1,22 +1,19 @@
-import sys
-import os
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config, pool
 from alembic import context
 
-# Import your models' MetaData object
-sys.path.append(os.getcwd())
-from app import metadata  # make sure 'metadata' is exposed in app.py
-
 # this is the Alembic Config object
 config = context.config
 
-# Interpret the config file for Python logging
-fileConfig(config.config_file_name)
+# Interpret the config file for Python logging (skipped when app.init_db()
+# runs the upgrade, so it doesn't clobber the app's own logging)
+if config.config_file_name and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
 
-# Set your metadata here (this must match your models' metadata)
-target_metadata = metadata
+# The app talks to SQLite directly (no ORM models), so revisions are
+# written by hand with op.execute() and there is nothing to autogenerate.
+target_metadata = None
 
 def run_migrations_offline():
     context.configure(
@@ -0,0 +1,108 @@
+"""baseline schema
+
+Captures the schema app.init_db() used to build by hand, and upgrades in
+place both databases created that way and ones created by the old
+standalone init_db.py (email/password users, entry_price/exit_price
+trades), so every journal.db converges on one layout.
+
+Revision ID: 3f1c2a9d0b11
+Revises: 
+Create Date: 2026-10-17 09:12:40.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+TABLES = [
+    """CREATE TABLE IF NOT EXISTS users(
+        id INTEGER PRIMARY KEY, username TEXT UNIQUE, password_hash TEXT,
+        role TEXT DEFAULT 'user', email TEXT)""",
+    """CREATE TABLE IF NOT EXISTS projects(
+        id INTEGER PRIMARY KEY, user_id INT, name TEXT, category TEXT)""",
+    """CREATE TABLE IF NOT EXISTS trades(
+        id INTEGER PRIMARY KEY, project_id INT, date TEXT, symbol TEXT, direction TEXT,
+        entry REAL, exit REAL, lot_size REAL, rr TEXT, session_name TEXT,
+        result TEXT, profit REAL, notes TEXT, screenshot BLOB, screenshot_hash TEXT)""",
+    """CREATE TABLE IF NOT EXISTS backtest_setups(
+        id INTEGER PRIMARY KEY, user_id INT, date TEXT, title TEXT,
+        entry_notes TEXT, result TEXT, review_notes TEXT, session_name TEXT,
+        timeframe TEXT, market TEXT, entry_criteria TEXT, exit_criteria TEXT,
+        r_multiple REAL, profit REAL)""",
+    """CREATE TABLE IF NOT EXISTS backtest_screenshots(
+        id INTEGER PRIMARY KEY, setup_id INT, image BLOB, filename TEXT, image_hash TEXT)""",
+    """CREATE TABLE IF NOT EXISTS project_stats(
+        project_id INTEGER PRIMARY KEY,
+        trade_count INT DEFAULT 0, win_count INT DEFAULT 0,
+        loss_count INT DEFAULT 0, be_count INT DEFAULT 0,
+        total_profit REAL DEFAULT 0, win_sum REAL DEFAULT 0, loss_sum REAL DEFAULT 0,
+        rr_sum REAL DEFAULT 0, best_trade REAL, worst_trade REAL)""",
+    """CREATE TABLE IF NOT EXISTS images(
+        hash TEXT PRIMARY KEY, size INT, mime TEXT, refs INT DEFAULT 0)""",
+]
+
+# Columns added over time with ALTER TABLE by the old init_db()
+COLUMNS = {
+    "users": ["role TEXT DEFAULT 'user'", "email TEXT"],
+    "projects": ["category TEXT"],
+    "trades": ["lot_size REAL", "rr TEXT", "session_name TEXT", "result TEXT",
+               "profit REAL", "screenshot_hash TEXT"],
+    "backtest_setups": ["session_name TEXT", "timeframe TEXT", "market TEXT",
+                        "entry_criteria TEXT", "exit_criteria TEXT",
+                        "r_multiple REAL", "profit REAL"],
+    "backtest_screenshots": ["image_hash TEXT"],
+}
+
+# Tables from the old init_db.py whose NOT NULL columns the app never
+# fills: (marker column, new column <- old expression). They are rebuilt.
+LEGACY = {
+    "users": ("password", {
+        "id": "id", "email": "email", "username": "email", "password_hash": "password"}),
+    "trades": ("entry_price", {
+        "id": "id", "project_id": "project_id", "date": "date", "symbol": "symbol",
+        "direction": "direction", "entry": "entry_price", "exit": "exit_price",
+        "profit": "profit_loss", "notes": "COALESCE(notes, strategy)",
+        "screenshot": "screenshot"}),
+}
+
+
+def _columns(table):
+    return {r[1] for r in op.get_bind().exec_driver_sql(f"PRAGMA table_info({table})")}
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a9d0b11'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    legacy = [t for t, (marker, _) in LEGACY.items() if marker in _columns(t)]
+    for table in legacy:
+        op.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+
+    for ddl in TABLES:
+        op.execute(ddl)
+
+    for table, cols in COLUMNS.items():
+        have = _columns(table)
+        for col_def in cols:
+            if col_def.split()[0] not in have:
+                op.execute(f"ALTER TABLE {table} ADD COLUMN {col_def}")
+
+    for table in legacy:
+        mapping = LEGACY[table][1]
+        op.execute(f"INSERT INTO {table} ({', '.join(mapping)}) "
+                   f"SELECT {', '.join(mapping.values())} FROM {table}_legacy")
+        op.execute(f"DROP TABLE {table}_legacy")
+
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_unique_email ON users(email)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # The baseline holds user data; there is nothing earlier to go back to.
+    pass
@@ -0,0 +1,61 @@
+"""full text search
+
+FTS5 indexes over trade notes/symbols and backtest setup text. Both are
+external-content tables (the text is stored once, in the source table)
+kept in sync by triggers, so every route and the bulk importer update
+the index without knowing it exists. Prefix indexes on 2 and 3 characters
+make "lond*" style queries index lookups.
+
+Revision ID: 5e2b7f9a1c38
+Revises: c4d9a1e6f702
+Create Date: 2026-10-17 16:20:41.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# fts table: (source table, indexed columns)
+FTS = {
+    "trades_fts": ("trades", ("symbol", "notes")),
+    "setups_fts": ("backtest_setups", ("title", "entry_notes", "review_notes",
+                                       "entry_criteria", "exit_criteria")),
+}
+
+# revision identifiers, used by Alembic.
+revision: str = '5e2b7f9a1c38'
+down_revision: Union[str, Sequence[str], None] = 'c4d9a1e6f702'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for fts, (table, cols) in FTS.items():
+        names = ", ".join(cols)
+        new = ", ".join(f"new.{c}" for c in cols)
+        old = ", ".join(f"old.{c}" for c in cols)
+        op.execute(f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {names}, content='{table}', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3')""")
+        op.execute(f"""CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new});
+        END""")
+        op.execute(f"""CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old});
+        END""")
+        # Only text edits touch the index, not e.g. a new screenshot hash
+        op.execute(f"""CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {names} ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old});
+            INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new});
+        END""")
+        op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for fts in FTS:
+        for suffix in ("ai", "ad", "au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+        op.execute(f"DROP TABLE IF EXISTS {fts}")
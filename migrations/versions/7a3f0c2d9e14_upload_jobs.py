@@ -0,0 +1,40 @@
+"""upload jobs
+
+Queue of setup screenshots waiting to be validated and stored. The
+upload request only spools the files to disk and adds one row each;
+background workers claim pending rows, and a row left 'processing' by a
+worker that died is picked up again once it goes stale.
+
+Revision ID: 7a3f0c2d9e14
+Revises: 9d41c6e8b2f5
+Create Date: 2026-10-17 19:11:05.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a3f0c2d9e14'
+down_revision: Union[str, Sequence[str], None] = '9d41c6e8b2f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""CREATE TABLE IF NOT EXISTS upload_jobs(
+        id INTEGER PRIMARY KEY, setup_id INT NOT NULL, user_id INT NOT NULL,
+        spool_path TEXT NOT NULL, filename TEXT,
+        status TEXT NOT NULL DEFAULT 'pending',     -- pending | processing | done | failed
+        attempts INT NOT NULL DEFAULT 0, error TEXT, screenshot_id INT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP, updated_at TEXT DEFAULT CURRENT_TIMESTAMP)""")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_upload_jobs_status ON upload_jobs(status, id)")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_upload_jobs_setup ON upload_jobs(setup_id)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE IF EXISTS upload_jobs")
@@ -0,0 +1,44 @@
+"""hot lookup indexes
+
+Secondary indexes for the per-request access paths: trades by project in
+date order (dashboard keyset pages, best/worst refresh), projects and
+setups by owner, and screenshots by setup. Login already goes through
+the UNIQUE index on users.username. `flask check-indexes` verifies each
+hot query's plan.
+
+Revision ID: 8b7e5d40c2a3
+Revises: 3f1c2a9d0b11
+Create Date: 2026-10-17 09:31:05.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+INDEXES = {
+    "idx_trades_project_date": "trades(project_id, date, id)",
+    "idx_trades_project_profit": "trades(project_id, profit)",
+    "idx_projects_user": "projects(user_id, id, name)",
+    "idx_setups_user_date": "backtest_setups(user_id, date, id)",
+    "idx_screenshots_setup": "backtest_screenshots(setup_id, id, image_hash)",
+}
+
+# revision identifiers, used by Alembic.
+revision: str = '8b7e5d40c2a3'
+down_revision: Union[str, Sequence[str], None] = '3f1c2a9d0b11'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, target in INDEXES.items():
+        op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+    op.execute("ANALYZE")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
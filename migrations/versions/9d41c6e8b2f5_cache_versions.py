@@ -0,0 +1,32 @@
+"""cache versions
+
+One counter per user, bumped by every write that changes what the user's
+cached pages show; cache keys embed it, so bumping invalidates.
+
+Revision ID: 9d41c6e8b2f5
+Revises: 5e2b7f9a1c38
+Create Date: 2026-10-17 18:02:37.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d41c6e8b2f5'
+down_revision: Union[str, Sequence[str], None] = '5e2b7f9a1c38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""CREATE TABLE IF NOT EXISTS cache_versions(
+        user_id INTEGER PRIMARY KEY, version INT NOT NULL DEFAULT 0)""")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE IF EXISTS cache_versions")
@@ -0,0 +1,69 @@
+"""rollup null results
+
+The trade rollup triggers added in e1c7a2b94f06 compared `result` to
+'win'/'loss' as is, so a trade inserted without a result (the API and
+importer allow one) put NULL into the NOT NULL wins/losses columns and
+the whole write failed. The triggers are recreated with a NULL result
+counted as neither; databases created since that revision was fixed get
+the same definitions already.
+
+Revision ID: a9e3d5b17c42
+Revises: f3a8c1d27b90
+Create Date: 2026-10-18 14:05:12.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9e3d5b17c42'
+down_revision: Union[str, Sequence[str], None] = 'f3a8c1d27b90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DAY = "COALESCE(substr({r}date, 1, 10), '')"
+PROFIT = "(CASE WHEN typeof({r}profit) IN ('integer', 'real') THEN {r}profit ELSE 0 END)"
+
+
+def _trade_add(r, sign, outcome):
+    won = outcome.format(r=r, value="win")
+    lost = outcome.format(r=r, value="loss")
+    sql = f"""INSERT INTO rollup_project_day (project_id, day, trades, wins, losses, profit)
+        SELECT {r}project_id, {DAY.format(r=r)}, {sign}, {sign} * {won},
+               {sign} * {lost}, {sign} * {PROFIT.format(r=r)}
+        WHERE {r}project_id IS NOT NULL
+        ON CONFLICT(project_id, day) DO UPDATE SET trades = trades + excluded.trades,
+            wins = wins + excluded.wins, losses = losses + excluded.losses,
+            profit = profit + excluded.profit;"""
+    if sign < 0:
+        sql += f"""DELETE FROM rollup_project_day
+            WHERE project_id = {r}project_id AND day = {DAY.format(r=r)} AND trades = 0;"""
+    return sql
+
+
+def _triggers(outcome):
+    return {
+        "rollup_trades_ai": f"AFTER INSERT ON trades BEGIN {_trade_add('new.', 1, outcome)} END",
+        "rollup_trades_ad": f"AFTER DELETE ON trades BEGIN {_trade_add('old.', -1, outcome)} END",
+        "rollup_trades_au": f"""AFTER UPDATE OF project_id, date, result, profit ON trades BEGIN
+            {_trade_add('old.', -1, outcome)} {_trade_add('new.', 1, outcome)} END""",
+    }
+
+
+def _replace(triggers):
+    for name, body in triggers.items():
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+        op.execute(f"CREATE TRIGGER {name} {body}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _replace(_triggers("COALESCE(lower(trim({r}result)) = '{value}', 0)"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _replace(_triggers("(lower(trim({r}result)) = '{value}')"))
@@ -0,0 +1,52 @@
+"""users autoincrement
+
+users.id was a plain INTEGER PRIMARY KEY, so deleting the newest user
+let the next registration take the same id. With one file per user
+(tenancy.py) an id names a file, and a deleted user's file is retired
+only once every worker has let go of it, so ids must never come back:
+the table is rebuilt with AUTOINCREMENT and its sequence starts past
+every id the data still mentions.
+
+Revision ID: b4f1e8c2d5a7
+Revises: a9e3d5b17c42
+Create Date: 2026-10-18 16:40:27.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4f1e8c2d5a7'
+down_revision: Union[str, Sequence[str], None] = 'a9e3d5b17c42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = "id, username, password_hash, role, email"
+# Tables that may still name a user who is gone
+USER_REFS = ("projects", "backtest_setups", "cache_versions", "api_tokens", "upload_jobs")
+
+
+def _rebuild(autoincrement):
+    op.execute(f"""CREATE TABLE users_new(
+        id INTEGER PRIMARY KEY{' AUTOINCREMENT' * autoincrement}, username TEXT UNIQUE, password_hash TEXT,
+        role TEXT DEFAULT 'user', email TEXT)""")
+    op.execute(f"INSERT INTO users_new ({COLUMNS}) SELECT {COLUMNS} FROM users")
+    op.execute("DROP TABLE users")
+    op.execute("ALTER TABLE users_new RENAME TO users")
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_unique_email ON users(email)")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _rebuild(True)
+    highest = " UNION ALL ".join(["SELECT MAX(id) AS m FROM users"] + [f"SELECT MAX(user_id) FROM {t}" for t in USER_REFS])
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'users'")
+    op.execute(f"INSERT INTO sqlite_sequence (name, seq) SELECT 'users', COALESCE(MAX(m), 0) FROM ({highest})")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _rebuild(False)
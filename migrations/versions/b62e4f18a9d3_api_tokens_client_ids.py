@@ -0,0 +1,45 @@
+"""api tokens and client ids
+
+Bearer tokens for the JSON API (only their SHA-256 is stored) and a
+client-supplied id on trades and setups. The id is unique per project /
+per user, which is what makes a re-sent batch update rows instead of
+duplicating them.
+
+Revision ID: b62e4f18a9d3
+Revises: 7a3f0c2d9e14
+Create Date: 2026-10-17 20:34:52.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b62e4f18a9d3'
+down_revision: Union[str, Sequence[str], None] = '7a3f0c2d9e14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""CREATE TABLE IF NOT EXISTS api_tokens(
+        id INTEGER PRIMARY KEY, user_id INT NOT NULL, token_hash TEXT NOT NULL UNIQUE, name TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP, last_used_at TEXT)""")
+    op.execute("ALTER TABLE trades ADD COLUMN client_id TEXT")
+    op.execute("ALTER TABLE backtest_setups ADD COLUMN client_id TEXT")
+    op.execute("""CREATE UNIQUE INDEX IF NOT EXISTS idx_trades_client
+        ON trades(project_id, client_id) WHERE client_id IS NOT NULL""")
+    op.execute("""CREATE UNIQUE INDEX IF NOT EXISTS idx_setups_client
+        ON backtest_setups(user_id, client_id) WHERE client_id IS NOT NULL""")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS idx_setups_client")
+    op.execute("DROP INDEX IF EXISTS idx_trades_client")
+    op.execute("ALTER TABLE backtest_setups DROP COLUMN client_id")
+    op.execute("ALTER TABLE trades DROP COLUMN client_id")
+    op.execute("DROP TABLE IF EXISTS api_tokens")
@@ -0,0 +1,36 @@
+"""project data version and report index
+
+project_stats.data_version is bumped by every write to a project's trades,
+so cached reports can be keyed on (project, version). idx_trades_report
+covers every column the grouped reports read, so a report is one scan of
+the project's slice of the index with no table lookups.
+
+Revision ID: c4d9a1e6f702
+Revises: 8b7e5d40c2a3
+Create Date: 2026-10-17 14:05:12.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d9a1e6f702'
+down_revision: Union[str, Sequence[str], None] = '8b7e5d40c2a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("ALTER TABLE project_stats ADD COLUMN data_version INT DEFAULT 0")
+    op.execute("""CREATE INDEX IF NOT EXISTS idx_trades_report ON trades(
+        project_id, symbol, session_name, direction, date, result, profit, rr)""")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS idx_trades_report")
+    op.execute("ALTER TABLE project_stats DROP COLUMN data_version")
@@ -0,0 +1,99 @@
+"""admin rollups
+
+Per (project, day) trade counts and P/L and per (user, day) setup counts,
+maintained by triggers on trades and backtest_setups so every writer
+(routes, importer, API, replay) keeps them current. Together with
+project_stats they let the admin overview avoid scanning trades.
+
+Revision ID: e1c7a2b94f06
+Revises: b62e4f18a9d3
+Create Date: 2026-10-17 21:48:13.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1c7a2b94f06'
+down_revision: Union[str, Sequence[str], None] = 'b62e4f18a9d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Expressions over a trade row (prefix "new." / "old." / "")
+DAY = "COALESCE(substr({r}date, 1, 10), '')"
+WIN = "COALESCE(lower(trim({r}result)) = 'win', 0)"        # a trade without a result counts as neither
+LOSS = "COALESCE(lower(trim({r}result)) = 'loss', 0)"
+PROFIT = "(CASE WHEN typeof({r}profit) IN ('integer', 'real') THEN {r}profit ELSE 0 END)"
+R = "(CASE WHEN typeof({r}r_multiple) IN ('integer', 'real') THEN {r}r_multiple ELSE 0 END)"
+
+
+def _trade_add(r, sign):
+    sql = f"""INSERT INTO rollup_project_day (project_id, day, trades, wins, losses, profit)
+        SELECT {r}project_id, {DAY.format(r=r)}, {sign}, {sign} * {WIN.format(r=r)},
+               {sign} * {LOSS.format(r=r)}, {sign} * {PROFIT.format(r=r)}
+        WHERE {r}project_id IS NOT NULL
+        ON CONFLICT(project_id, day) DO UPDATE SET trades = trades + excluded.trades,
+            wins = wins + excluded.wins, losses = losses + excluded.losses,
+            profit = profit + excluded.profit;"""
+    if sign < 0:
+        sql += f"""DELETE FROM rollup_project_day
+            WHERE project_id = {r}project_id AND day = {DAY.format(r=r)} AND trades = 0;"""
+    return sql
+
+
+def _setup_add(r, sign):
+    sql = f"""INSERT INTO rollup_setup_day (user_id, day, setups, r_sum)
+        SELECT {r}user_id, {DAY.format(r=r)}, {sign}, {sign} * {R.format(r=r)}
+        WHERE {r}user_id IS NOT NULL
+        ON CONFLICT(user_id, day) DO UPDATE SET setups = setups + excluded.setups,
+            r_sum = r_sum + excluded.r_sum;"""
+    if sign < 0:
+        sql += f"""DELETE FROM rollup_setup_day
+            WHERE user_id = {r}user_id AND day = {DAY.format(r=r)} AND setups = 0;"""
+    return sql
+
+
+TRIGGERS = {
+    "rollup_trades_ai": f"AFTER INSERT ON trades BEGIN {_trade_add('new.', 1)} END",
+    "rollup_trades_ad": f"AFTER DELETE ON trades BEGIN {_trade_add('old.', -1)} END",
+    "rollup_trades_au": f"""AFTER UPDATE OF project_id, date, result, profit ON trades BEGIN
+        {_trade_add('old.', -1)} {_trade_add('new.', 1)} END""",
+    "rollup_setups_ai": f"AFTER INSERT ON backtest_setups BEGIN {_setup_add('new.', 1)} END",
+    "rollup_setups_ad": f"AFTER DELETE ON backtest_setups BEGIN {_setup_add('old.', -1)} END",
+    "rollup_setups_au": f"""AFTER UPDATE OF user_id, date, r_multiple ON backtest_setups BEGIN
+        {_setup_add('old.', -1)} {_setup_add('new.', 1)} END""",
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""CREATE TABLE IF NOT EXISTS rollup_project_day(
+        project_id INT NOT NULL, day TEXT NOT NULL,
+        trades INT NOT NULL DEFAULT 0, wins INT NOT NULL DEFAULT 0, losses INT NOT NULL DEFAULT 0,
+        profit REAL NOT NULL DEFAULT 0, PRIMARY KEY (project_id, day)) WITHOUT ROWID""")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_rollup_project_day_day ON rollup_project_day(day)")
+    op.execute("""CREATE TABLE IF NOT EXISTS rollup_setup_day(
+        user_id INT NOT NULL, day TEXT NOT NULL,
+        setups INT NOT NULL DEFAULT 0, r_sum REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, day)) WITHOUT ROWID""")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_rollup_setup_day_day ON rollup_setup_day(day)")
+    for name, body in TRIGGERS.items():
+        op.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+    op.execute(f"""INSERT INTO rollup_project_day (project_id, day, trades, wins, losses, profit)
+        SELECT project_id, {DAY.format(r='')}, COUNT(*), SUM({WIN.format(r='')}),
+               SUM({LOSS.format(r='')}), TOTAL({PROFIT.format(r='')})
+        FROM trades WHERE project_id IS NOT NULL GROUP BY 1, 2""")
+    op.execute(f"""INSERT INTO rollup_setup_day (user_id, day, setups, r_sum)
+        SELECT user_id, {DAY.format(r='')}, COUNT(*), TOTAL({R.format(r='')})
+        FROM backtest_setups WHERE user_id IS NOT NULL GROUP BY 1, 2""")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.execute("DROP TABLE IF EXISTS rollup_setup_day")
+    op.execute("DROP TABLE IF EXISTS rollup_project_day")
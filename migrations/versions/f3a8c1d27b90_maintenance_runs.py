@@ -0,0 +1,39 @@
+"""maintenance runs
+
+One row per background maintenance task (see maintenance.py): when it
+last ran, how long it took and what it did. Workers in every process
+share the schedule through it, claiming a task with a short lease so
+only one of them runs it at a time.
+
+Revision ID: f3a8c1d27b90
+Revises: e1c7a2b94f06
+Create Date: 2026-10-18 09:26:41.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a8c1d27b90'
+down_revision: Union[str, Sequence[str], None] = 'e1c7a2b94f06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""CREATE TABLE IF NOT EXISTS maintenance_runs(
+        task TEXT PRIMARY KEY,
+        status TEXT NOT NULL DEFAULT 'idle',        -- idle | running | failed
+        started_at TEXT, finished_at TEXT, duration_ms REAL, detail TEXT,
+        runs INT NOT NULL DEFAULT 0,
+        requested INT NOT NULL DEFAULT 0,           -- run on the next poll, whatever the schedule says
+        lease_until TEXT)""")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE IF EXISTS maintenance_runs")
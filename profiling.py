@@ -0,0 +1,275 @@
+# profiling.py – opt-in request profiling and query instrumentation
+#
+# With PROFILING on (or JOURNAL_PROFILING=1 in the environment), get_db()
+# hands out the pooled connection wrapped in InstrumentedConnection, which
+# times every statement (execute + fetch) and counts the rows and bytes it
+# returned, noting BLOB columns: outside the legacy screenshot routes no
+# page should be pulling image bytes out of SQLite. Template render time comes
+# from Flask's template signals. Each request's totals feed per-endpoint
+# Prometheus counters/histograms served at /metrics (to a scraper sending
+# METRICS_TOKEN as a bearer token, or a signed-in admin), and requests
+# slower than SLOW_REQUEST_MS are logged with their most expensive statements.
+#
+# Metrics are per worker process; scrape each gunicorn worker or run one.
+
+import hmac, logging, os, threading, time
+from collections import defaultdict
+from flask import g, request, session, Response, template_rendered, before_render_template
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_TOP = 5            # statements shown per slow request
+BLOB_ENDPOINTS = {"screenshot", "setup_screenshot"}    # serve legacy BLOBs on purpose
+
+log = logging.getLogger("trading_journal.slow")
+
+_lock = threading.Lock()
+_counters = defaultdict(float)          # (metric, labels) -> value
+_histograms = {}                        # endpoint -> [bucket counts..., sum, count]
+
+
+def configure(app):
+    app.config.setdefault("PROFILING", os.environ.get("JOURNAL_PROFILING") == "1")
+    app.config.setdefault("SLOW_REQUEST_MS", 500)
+    app.config.setdefault("METRICS_TOKEN", os.environ.get("JOURNAL_METRICS_TOKEN"))
+    app.before_request(lambda: _start() if app.config["PROFILING"] else None)
+    app.after_request(_status)
+    app.teardown_request(lambda exc: _finish(app, exc))
+    before_render_template.connect(_render_start, app)
+    template_rendered.connect(_render_end, app)
+    app.add_url_rule("/metrics", "metrics", lambda: metrics_view(app))
+
+
+# ── connection wrapper ──
+
+class Statement:
+    __slots__ = ("sql", "seconds", "rows", "bytes", "blobs")
+
+    def __init__(self, sql):
+        self.sql, self.seconds, self.rows, self.bytes, self.blobs = sql, 0.0, 0, 0, set()
+
+
+def _measure(stmt, description, rows):
+    for row in rows:
+        for i, v in enumerate(row):
+            if isinstance(v, str):
+                stmt.bytes += len(v)
+            elif isinstance(v, (bytes, memoryview)):
+                stmt.bytes += len(v)
+                stmt.blobs.add(description[i][0])
+            elif v is not None:
+                stmt.bytes += 8
+    stmt.rows += len(rows)
+
+
+class InstrumentedCursor:
+    def __init__(self, cursor, queries):
+        object.__setattr__(self, "_cur", cursor)
+        object.__setattr__(self, "_queries", queries)
+        object.__setattr__(self, "_stmt", None)
+
+    def _run(self, method, sql, *args):
+        stmt = Statement(sql)
+        t = time.perf_counter()
+        try:
+            getattr(self._cur, method)(sql, *args)
+        finally:
+            stmt.seconds += time.perf_counter() - t
+            self._queries.append(stmt)
+        object.__setattr__(self, "_stmt", stmt)
+        return self
+
+    def execute(self, sql, params=()):
+        return self._run("execute", sql, params)
+
+    def executemany(self, sql, seq):
+        return self._run("executemany", sql, seq)
+
+    def executescript(self, script):
+        return self._run("executescript", script)
+
+    def _fetch(self, method, *args):
+        t = time.perf_counter()
+        rows = getattr(self._cur, method)(*args)
+        if self._stmt is not None:
+            self._stmt.seconds += time.perf_counter() - t
+            batch = [rows] if method == "fetchone" and rows is not None else rows or []
+            _measure(self._stmt, self._cur.description, batch)
+        return rows
+
+    def fetchone(self):
+        return self._fetch("fetchone")
+
+    def fetchmany(self, size=None):
+        return self._fetch("fetchmany", size if size is not None else self._cur.arraysize)
+
+    def fetchall(self):
+        return self._fetch("fetchall")
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cur, name, value)      # e.g. cursor.row_factory = None
+
+
+class InstrumentedConnection:
+    def __init__(self, conn, queries):
+        object.__setattr__(self, "raw", conn)
+        object.__setattr__(self, "_queries", queries)
+
+    def cursor(self):
+        return InstrumentedCursor(self.raw.cursor(), self._queries)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq):
+        return self.cursor().executemany(sql, seq)
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.raw, name, value)
+
+
+def wrap(conn):
+    """`conn` instrumented for this request, or as-is outside a profiled request."""
+    prof = g.get("_prof")
+    return conn if prof is None else InstrumentedConnection(conn, prof["queries"])
+
+
+def unwrap(conn):
+    return getattr(conn, "raw", conn)
+
+
+# ── request hooks ──
+
+def _start():
+    g._prof = {"start": time.perf_counter(), "queries": [], "render": 0.0, "render_start": [], "status": 500}
+
+
+def _status(resp):
+    if "_prof" in g:
+        g._prof["status"] = resp.status_code
+    return resp
+
+
+def _render_start(app, template, context, **extra):
+    if "_prof" in g:
+        g._prof["render_start"].append(time.perf_counter())
+
+
+def _render_end(app, template, context, **extra):
+    prof = g.get("_prof")
+    if prof and prof["render_start"]:
+        prof["render"] += time.perf_counter() - prof["render_start"].pop()
+
+
+def _finish(app, exc):
+    prof = g.pop("_prof", None)
+    if prof is None or request.endpoint == "metrics":
+        return
+    total = time.perf_counter() - prof["start"]
+    queries = prof["queries"]
+    endpoint = request.endpoint or "unknown"
+    status = 500 if exc else prof["status"]
+    blob_fetches = 0 if endpoint in BLOB_ENDPOINTS else sum(1 for q in queries if q.blobs)
+    with _lock:
+        _counters["requests_total", (endpoint, request.method, status)] += 1
+        for name, value in (("db_queries_total", len(queries)),
+                            ("db_query_seconds_total", sum(q.seconds for q in queries)),
+                            ("db_rows_total", sum(q.rows for q in queries)),
+                            ("db_bytes_total", sum(q.bytes for q in queries)),
+                            ("db_blob_fetches_total", blob_fetches),
+                            ("template_render_seconds_total", prof["render"])):
+            _counters[name, (endpoint,)] += value
+        h = _histograms.setdefault(endpoint, [0] * (len(BUCKETS) + 2))
+        for i, bound in enumerate(BUCKETS):
+            if total <= bound:
+                h[i] += 1
+        h[-2] += total
+        h[-1] += 1
+
+    if total * 1000 >= app.config["SLOW_REQUEST_MS"]:
+        with _lock:
+            _counters["slow_requests_total", (endpoint,)] += 1
+        worst = sorted(queries, key=lambda q: q.seconds, reverse=True)[:SLOW_TOP]
+        log.warning("🐢 %s %s took %.0f ms (%d queries, %.0f ms SQL, %.0f ms templates)\n%s",
+                    request.method, request.full_path.rstrip("?"), total * 1000, len(queries),
+                    sum(q.seconds for q in queries) * 1000, prof["render"] * 1000,
+                    "\n".join(f"  {q.seconds * 1000:7.1f} ms {q.rows:6d} rows {q.bytes:9d} B"
+                              f"{' BLOB ' + ','.join(sorted(q.blobs)) if q.blobs else ''}  {' '.join(q.sql.split())}"
+                              for q in worst))
+    elif blob_fetches:
+        log.info("🧱 %s fetched BLOB column(s): %s", endpoint,
+                 "; ".join(f"{','.join(sorted(q.blobs))} <- {' '.join(q.sql.split())[:120]}" for q in queries if q.blobs))
+
+
+# ── exposition ──
+
+HELP = {
+    "requests_total": ("counter", "Requests handled, by endpoint, method and status."),
+    "db_queries_total": ("counter", "SQL statements executed."),
+    "db_query_seconds_total": ("counter", "Time spent executing and fetching SQL."),
+    "db_rows_total": ("counter", "Rows fetched from SQLite."),
+    "db_bytes_total": ("counter", "Approximate bytes fetched from SQLite."),
+    "db_blob_fetches_total": ("counter", "Statements that returned BLOB values outside the screenshot routes."),
+    "template_render_seconds_total": ("counter", "Time spent rendering templates."),
+    "slow_requests_total": ("counter", "Requests slower than SLOW_REQUEST_MS."),
+}
+LABELS = {"requests_total": ("endpoint", "method", "status")}
+
+
+def _labels(names, values):
+    return ",".join(f'{n}="{v}"' for n, v in zip(names, values))
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    out = []
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: list(v) for k, v in _histograms.items()}
+    for name, (kind, text) in HELP.items():
+        out += [f"# HELP journal_{name} {text}", f"# TYPE journal_{name} {kind}"]
+        names = LABELS.get(name, ("endpoint",))
+        for (metric, values), v in sorted(counters.items(), key=lambda kv: str(kv[0])):
+            if metric == name:
+                out.append(f"journal_{name}{{{_labels(names, values)}}} {v:g}")
+    out += ["# HELP journal_request_duration_seconds Request latency, including streamed bodies.",
+            "# TYPE journal_request_duration_seconds histogram"]
+    for endpoint, h in sorted(histograms.items()):
+        for i, bound in enumerate(BUCKETS):
+            out.append(f'journal_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {h[i]}')
+        out.append(f'journal_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {h[-1]}')
+        out.append(f'journal_request_duration_seconds_sum{{endpoint="{endpoint}"}} {h[-2]:g}')
+        out.append(f'journal_request_duration_seconds_count{{endpoint="{endpoint}"}} {h[-1]}')
+    return "\n".join(out) + "\n"
+
+
+def totals():
+    """This worker's counters summed over their labels; diff two calls to profile a stretch of requests."""
+    out = defaultdict(float)
+    with _lock:
+        for (name, _), v in _counters.items():
+            out[name] += v
+    return dict(out)
+
+
+def metrics_view(app):
+    if not app.config["PROFILING"]:
+        return "Not found", 404
+    # Scrapers send METRICS_TOKEN; otherwise only a signed-in admin may look
+    token = app.config["METRICS_TOKEN"]
+    scraper = token and hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+    if not scraper and session.get("role") != "admin":
+        return "Forbidden", 403
+    return Response(render(), mimetype="text/plain; version=0.0.4")
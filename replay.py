@@ -0,0 +1,277 @@
+# replay.py – rule-based backtest replay over local OHLC data
+#
+# A rule (JSON, see RULE_DEFAULTS) describes an entry signal, an ATR stop,
+# an R-multiple target and a time stop. `flask replay` runs it over bar
+# files under OHLC_DIR for any number of symbols and a date range, split
+# into (symbol, year) chunks that a process pool simulates in parallel,
+# and writes every simulated trade back as a backtest setup titled with
+# the rule's name, so it shows up in the setups page, reports and search.
+#
+# Bars are read from <SYMBOL>_<TF>.npy (memory-mapped; `flask ohlc-convert`
+# writes them) or <SYMBOL>_<TF>.csv (time,open,high,low,close[,...] with an
+# ISO or epoch-second time). A missing timeframe is resampled from M1.
+# Indicators and signals are whole-array NumPy operations; only the
+# (sparse) trades are walked one by one. Entries fill at the next bar's
+# open, and a bar that touches both stop and target counts as a stop.
+
+import json, multiprocessing, os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+BAR = np.dtype([("time", "i8"), ("open", "f8"), ("high", "f8"), ("low", "f8"), ("close", "f8")])
+TIMEFRAMES = {"M1": 60, "M5": 300, "M15": 900, "M30": 1800, "H1": 3600, "H4": 14400, "D1": 86400}
+ENTRIES = ("breakout", "sma_cross")
+
+RULE_DEFAULTS = {
+    "name": None,               # setup title; required
+    "timeframe": "M15",
+    "entry": {"type": "breakout", "lookback": 20},      # or {"type": "sma_cross", "fast": 10, "slow": 30}
+    "direction": "both",        # long | short | both
+    "session": None,            # ["07:00", "11:00"] UTC window for signals, end exclusive
+    "atr": 14,                  # bars in the (simple) ATR
+    "stop_atr": 1.5,            # stop distance in ATRs
+    "target_r": 2.0,            # target distance in stop distances
+    "max_bars": 96,             # time stop
+    "cost_r": 0.0,              # spread + commission per trade, in R
+    "risk": 100.0,              # account currency per 1R, for the setup's profit
+}
+
+
+def load_rule(spec):
+    """`spec` merged over RULE_DEFAULTS and checked; ValueError explains what's wrong."""
+    rule = {**RULE_DEFAULTS, **spec, "entry": {**RULE_DEFAULTS["entry"], **spec.get("entry", {})}}
+    if not rule["name"]:
+        raise ValueError("rule needs a name")
+    if rule["timeframe"] not in TIMEFRAMES:
+        raise ValueError(f"unknown timeframe {rule['timeframe']!r} (one of {', '.join(TIMEFRAMES)})")
+    if rule["entry"]["type"] not in ENTRIES:
+        raise ValueError(f"unknown entry type {rule['entry']['type']!r} (one of {', '.join(ENTRIES)})")
+    if rule["direction"] not in ("long", "short", "both"):
+        raise ValueError("direction must be long, short or both")
+    if rule["session"]:
+        rule["session"] = [int(t[:2]) * 60 + int(t[3:5]) for t in rule["session"]]
+    return rule
+
+
+def load_rules(path):
+    with open(path) as f:
+        spec = json.load(f)
+    return [load_rule(s) for s in (spec if isinstance(spec, list) else [spec])]
+
+
+# ── bars ──
+
+def read_csv(path):
+    """Bars from a CSV with a header row; times are ISO strings or epoch seconds."""
+    with open(path) as f:
+        f.readline()
+        cols = np.loadtxt(f, delimiter=",", dtype=str, usecols=range(5), ndmin=2)
+    bars = np.empty(len(cols), dtype=BAR)
+    t = cols[:, 0]
+    bars["time"] = t.astype("i8") if len(t) and t[0].isdigit() else t.astype("datetime64[s]").astype("i8")
+    for i, name in enumerate(("open", "high", "low", "close"), 1):
+        bars[name] = cols[:, i].astype("f8")
+    return bars
+
+
+def resample(bars, seconds):
+    """OHLC bars rolled up to `seconds`-long buckets."""
+    if not len(bars):
+        return bars
+    bucket = bars["time"] // seconds
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(bars)] - 1
+    out = np.empty(len(starts), dtype=BAR)
+    out["time"] = bucket[starts] * seconds
+    out["open"] = bars["open"][starts]
+    out["high"] = np.maximum.reduceat(bars["high"], starts)
+    out["low"] = np.minimum.reduceat(bars["low"], starts)
+    out["close"] = bars["close"][ends]
+    return out
+
+
+def _file(directory, symbol, tf):
+    for ext in ("npy", "csv"):
+        path = os.path.join(directory, f"{symbol}_{tf}.{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def open_bars(directory, symbol, tf):
+    """(bars, their timeframe) for `symbol`: the `tf` file, else the M1 one to resample."""
+    path, source_tf = _file(directory, symbol, tf), tf
+    if path is None and tf != "M1":
+        path, source_tf = _file(directory, symbol, "M1"), "M1"
+    if path is None:
+        raise FileNotFoundError(f"no {tf} or M1 bars for {symbol} in {directory}")
+    return (np.load(path, mmap_mode="r") if path.endswith(".npy") else read_csv(path)), source_tf
+
+
+def convert(csv_path, npy_path):
+    bars = read_csv(csv_path)
+    bars.sort(order="time")
+    np.save(npy_path, bars)
+    return len(bars)
+
+
+# ── simulation ──
+
+def _sma(x, n):
+    c = np.cumsum(np.r_[0.0, x])
+    out = np.full(len(x), np.nan)
+    out[n - 1:] = (c[n:] - c[:-n]) / n
+    return out
+
+
+def _prior_extreme(x, n, fn):
+    """fn over the n values before each index (nan until there are n)."""
+    out = np.full(len(x), np.nan)
+    if len(x) > n:
+        out[n:] = fn(np.lib.stride_tricks.sliding_window_view(x, n)[:-1], axis=1)
+    return out
+
+
+def signals(bars, rule):
+    """(+1 long / -1 short / 0) per bar, decided on that bar's close."""
+    high, low, close = bars["high"], bars["low"], bars["close"]
+    entry = rule["entry"]
+    if entry["type"] == "breakout":
+        n = entry.get("lookback", 20)
+        up = close > _prior_extreme(high, n, np.max)
+        down = close < _prior_extreme(low, n, np.min)
+    else:
+        fast, slow = _sma(close, entry.get("fast", 10)), _sma(close, entry.get("slow", 30))
+        up, down = fast > slow, fast < slow
+    # fire on the bar the condition turns true, not on every bar it holds
+    up &= ~np.r_[False, up[:-1]]
+    down &= ~np.r_[False, down[:-1]]
+    sig = np.where(up, 1, np.where(down, -1, 0))
+    if rule["direction"] == "long":
+        sig[sig < 0] = 0
+    elif rule["direction"] == "short":
+        sig[sig > 0] = 0
+    if rule["session"]:
+        start, end = rule["session"]
+        minute = (bars["time"] // 60) % 1440
+        sig[~((minute >= start) & (minute < end) if start < end else (minute >= start) | (minute < end))] = 0
+    return sig
+
+
+def atr(bars, n):
+    prev = np.r_[np.nan, bars["close"][:-1]]
+    tr = np.fmax(bars["high"] - bars["low"],
+                 np.fmax(np.abs(bars["high"] - prev), np.abs(bars["low"] - prev)))
+    return _sma(np.nan_to_num(tr), n)
+
+
+def simulate(bars, rule, start, end):
+    """Trades whose signal bar falls in [start, end): one open position at a time."""
+    sig, risk_atr = signals(bars, rule), atr(bars, rule["atr"]) * rule["stop_atr"]
+    o, h, l, c, t = bars["open"], bars["high"], bars["low"], bars["close"], bars["time"]
+    trades, free_from = [], 0
+    for i in np.flatnonzero(sig):
+        e = i + 1
+        if t[i] < start or t[i] >= end or i < free_from or e >= len(bars) or not risk_atr[i] > 0:
+            continue
+        side, entry, risk = int(sig[i]), o[e], risk_atr[i]
+        stop, target = entry - side * risk, entry + side * risk * rule["target_r"]
+        last = min(e + rule["max_bars"], len(bars)) - 1
+        hl, lh = (l, h) if side > 0 else (h, l)
+        stopped = np.flatnonzero(side * (hl[e:last + 1] - stop) <= 0)
+        reached = np.flatnonzero(side * (lh[e:last + 1] - target) >= 0)
+        j_stop = stopped[0] if len(stopped) else np.inf
+        j_target = reached[0] if len(reached) else np.inf
+        if j_stop <= j_target and j_stop != np.inf:
+            x = e + int(j_stop)
+            price, reason = (min if side > 0 else max)(o[x], stop) if x > e else stop, "stop"
+        elif j_target != np.inf:
+            x = e + int(j_target)
+            price, reason = (max if side > 0 else min)(o[x], target) if x > e else target, "target"
+        else:
+            x, price, reason = last, c[last], "time"
+        r = side * (price - entry) / risk - rule["cost_r"]
+        trades.append((int(t[e]), side, float(entry), float(stop), float(target), int(t[x]),
+                       float(price), reason, round(float(r), 3)))
+        free_from = x + 1
+    return trades
+
+
+def _chunk(directory, symbol, rule, start, end):
+    bars, source_tf = open_bars(directory, symbol, rule["timeframe"])
+    # Only this chunk's bars (plus indicator warm-up and room for the last
+    # trades to run out) leave the memory map or get resampled; padding is
+    # in time, generously, as weekends leave gaps in the bar count.
+    tf = TIMEFRAMES[rule["timeframe"]]
+    warmup = max(rule["atr"], rule["entry"].get("lookback", 0), rule["entry"].get("slow", 0)) + 2
+    times = bars["time"]
+    lo = int(np.searchsorted(times, start - 2 * warmup * tf - 4 * 86400))
+    hi = int(np.searchsorted(times, end + 2 * rule["max_bars"] * tf + 4 * 86400))
+    bars = np.asarray(bars[lo:hi])
+    if source_tf != rule["timeframe"]:
+        bars = resample(bars, tf)
+    return [(symbol, *tr) for tr in simulate(bars, rule, start, end)]
+
+
+def chunks(start, end):
+    """[start, end) in epoch seconds, split at calendar years."""
+    edges = [start]
+    year = np.datetime64(start, "s").astype("datetime64[Y]")
+    while True:
+        year += 1
+        edge = int(year.astype("datetime64[s]").astype("i8"))
+        if edge >= end:
+            break
+        edges.append(edge)
+    return list(zip(edges, edges[1:] + [end]))
+
+
+def run(directory, rule, symbols, start, end, workers=None):
+    """Simulated trades for every symbol, oldest first; chunks run in a spawned process pool."""
+    jobs = [(directory, s, rule, a, b) for s in symbols for a, b in chunks(start, end)]
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        results = pool.map(_chunk, *zip(*jobs)) if jobs else []
+        trades = [tr for part in results for tr in part]
+    return sorted(trades, key=lambda tr: (tr[1], tr[0]))
+
+
+# ── write-back ──
+
+def _stamp(ts):
+    return str(np.datetime64(ts, "s")).replace("T", " ")[:16]
+
+
+def _session(ts):
+    hour = (ts // 3600) % 24
+    return "London" if 7 <= hour < 12 else "New York" if 12 <= hour < 21 else "Asian"
+
+
+def setup_rows(user_id, rule, trades):
+    criteria = json.dumps(rule["entry"], sort_keys=True)
+    exits = f"stop {rule['stop_atr']} ATR({rule['atr']}), target {rule['target_r']}R, {rule['max_bars']} bars max"
+    for symbol, t_in, side, entry, stop, target, t_out, price, reason, r in trades:
+        yield (user_id, _stamp(t_in)[:10], rule["name"],
+               f"{'Long' if side > 0 else 'Short'} {symbol} @ {entry:g} at {_stamp(t_in)} "
+               f"(stop {stop:g}, target {target:g})",
+               "Win" if r > 0 else "Loss" if r < 0 else "Break-even",
+               f"Exit by {reason} @ {price:g} at {_stamp(t_out)}",
+               _session(t_in), rule["timeframe"], symbol, criteria, exits, r, round(r * rule["risk"], 2))
+
+
+def save(db, user_id, rule, trades):
+    """Insert the trades as backtest setups in one transaction; returns how many."""
+    rows = list(setup_rows(user_id, rule, trades))
+    db.executemany("""INSERT INTO backtest_setups
+        (user_id, date, title, entry_notes, result, review_notes, session_name,
+         timeframe, market, entry_criteria, exit_criteria, r_multiple, profit)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", rows)
+    return len(rows)
+
+
+def summary(trades):
+    r = np.array([tr[-1] for tr in trades], dtype=float)
+    if not len(r):
+        return {"trades": 0}
+    return {"trades": len(r), "win_rate": round(float((r > 0).mean()) * 100, 1),
+            "total_r": round(float(r.sum()), 2), "avg_r": round(float(r.mean()), 3),
+            "max_dd_r": round(float((np.maximum.accumulate(np.cumsum(r)) - np.cumsum(r)).max()), 2)}
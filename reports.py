@@ -0,0 +1,128 @@
+# reports.py – grouped performance breakdowns computed by SQLite
+#
+# Each report is one GROUP BY over the project's trades, read through a
+# covering index with profit and rr typed in SQL, so only a row per group
+# reaches Python. Results are cached per worker, keyed by the project's
+# data_version (bumped by every trade write), so a report is only
+# recomputed after the project's trades change. Keys carry the tenant
+# too, as project ids repeat across per-user databases.
+
+from collections import OrderedDict
+import threading
+import stats, tenancy
+
+WEEKDAYS = ["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"]
+
+DIMENSIONS = {
+    "symbol": "COALESCE(symbol, '-')",
+    "session": "COALESCE(NULLIF(session_name, ''), '-')",
+    "direction": "COALESCE(direction, '-')",
+    "weekday": "CAST(strftime('%w', date) AS INT)",
+    "month": "substr(date, 1, 7)",
+    "result": "COALESCE(NULLIF(result, ''), '-')",
+}
+MEASURES = ("net", "trades", "win_rate", "avg_rr", "profit_factor")
+
+# Non-numeric profit counts as a flat trade, like the analytics endpoint.
+# rr is free text: a non-zero CAST is taken as is ("2R" -> 2), and only
+# zeros pay for the GLOB that tells "0" from garbage.
+GROUPED_SQL = """SELECT {keys},
+        COUNT(*), COUNT(CASE WHEN p > 0 THEN 1 END), COUNT(CASE WHEN p < 0 THEN 1 END), TOTAL(p), TOTAL(MAX(p, 0)), TOTAL(r), COUNT(r)
+    FROM (SELECT symbol, session_name, direction, date, result, profit + 0 AS p,
+                 COALESCE(NULLIF(CAST(rr AS REAL), 0),
+                          CASE WHEN trim(rr) GLOB '*[0-9]*' AND NOT trim(rr) GLOB '*[^0-9.+-]*'
+                               THEN 0.0 END) AS r
+          FROM trades WHERE project_id = ?)
+    GROUP BY {groups}"""
+
+CACHE_SIZE = 256
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def _cached(db, project_id, key, compute):
+    full_key = (tenancy.current(), project_id, stats.data_version(db, project_id)) + key
+    with _lock:
+        if full_key in _cache:
+            _cache.move_to_end(full_key)
+            return _cache[full_key]
+    value = compute()
+    with _lock:
+        _cache[full_key] = value
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return value
+
+
+def forget(project_id):
+    with _lock:
+        for k in [k for k in _cache if k[:2] == (tenancy.current(), project_id)]:
+            del _cache[k]
+
+
+def _grouped(db, project_id, *dims):
+    """{key or key tuple: [trades, wins, losses, net, gross_win, rr_sum, rr_count]}"""
+    sql = GROUPED_SQL.format(keys=", ".join(DIMENSIONS[d] for d in dims),
+                             groups=", ".join(str(i + 1) for i in range(len(dims))))
+    n = len(dims)
+    return {(r[0] if n == 1 else tuple(r[:n])): r[n:] for r in db.execute(sql, (project_id,))}
+
+
+def _row(acc):
+    trades, wins, losses, net, gross_win, rr_sum, rr_n = acc
+    gross_loss = round(gross_win - net, 6)
+    return {
+        "trades": trades, "wins": wins, "losses": losses, "net": round(net, 2),
+        "avg_profit": round(net / trades, 2),
+        "win_rate": round(100 * wins / trades, 1),
+        "avg_rr": round(rr_sum / rr_n, 2) if rr_n else None,
+        "profit_factor": round(gross_win / gross_loss, 2) if gross_loss > 0 else None,
+    }
+
+
+def _label(dim, key):
+    if dim == "weekday" and key is not None:
+        return WEEKDAYS[key]
+    return "-" if key is None else key
+
+
+def _order(keys):
+    return sorted(keys, key=lambda k: (k is None, k))
+
+
+def breakdown(db, project_id, dim):
+    """One row per value of `dim`: trades, wins, losses, net, averages, profit factor."""
+    def compute():
+        groups = _grouped(db, project_id, dim)
+        return [{"k": _label(dim, k), **_row(groups[k])} for k in _order(groups)]
+    return _cached(db, project_id, ("breakdown", dim), compute)
+
+
+def pivot(db, project_id, rows_dim, cols_dim, measure="net"):
+    """{"columns": [...], "rows": [(label, [cell per column]), ...]} for rows_dim × cols_dim."""
+    def compute():
+        groups = _grouped(db, project_id, rows_dim, cols_dim)
+        cols = _order({ck for _, ck in groups})
+        return {
+            "columns": [_label(cols_dim, ck) for ck in cols],
+            "rows": [(_label(rows_dim, rk),
+                      [_row(groups[rk, ck])[measure] if (rk, ck) in groups else None for ck in cols])
+                     for rk in _order({rk for rk, _ in groups})],
+        }
+    return _cached(db, project_id, ("pivot", rows_dim, cols_dim, measure), compute)
+
+
+def project_analytics(db, project_id, points):
+    """analytics.project_analytics, cached like the reports above."""
+    import analytics
+    return _cached(db, project_id, ("analytics", points),
+                   lambda: analytics.project_analytics(db, project_id, points))
+
+
+def setups_breakdown(db, user_id):
+    """Backtest setups grouped by title (the setup), with R-multiple stats."""
+    return db.execute("""SELECT COALESCE(NULLIF(title, ''), '-') AS k, COUNT(*) AS trades,
+            SUM(lower(result) = 'win') AS wins, SUM(lower(result) = 'loss') AS losses,
+            ROUND(SUM(profit), 2) AS net, ROUND(AVG(r_multiple), 2) AS avg_r,
+            ROUND(SUM(r_multiple), 2) AS total_r
+        FROM backtest_setups WHERE user_id = ? GROUP BY k ORDER BY total_r DESC""", (user_id,)).fetchall()
@@ -0,0 +1,126 @@
+# rollups.py – firm-wide figures for the admin overview
+#
+# Everything here reads the rollup tables (see the admin rollups
+# migration) and project_stats, never trades or backtest_setups, so the
+# overview costs the same with ten users or hundreds. Triggers keep
+# rollup_project_day / rollup_setup_day current; `flask rebuild-rollups`
+# recomputes them should they ever drift. In tenant mode (tenancy.py)
+# each user's file is summarised on its own and `merge` adds them up.
+
+PERIODS = (7, 30, 90, 365)          # days the activity columns cover
+USER_SORTS = {"net": "net DESC", "trades": "trades DESC", "recent": "recent_trades DESC",
+              "name": "u.username COLLATE NOCASE"}
+MERGED_SORTS = {"net": lambda u: -u["net"], "trades": lambda u: -u["trades"],
+                "recent": lambda u: -u["recent_trades"], "name": lambda u: (u["username"] or "").lower()}
+PROJECT_LIMIT = 50
+
+DAY = "COALESCE(substr(date, 1, 10), '')"
+
+
+def totals(db):
+    row = db.execute("""SELECT COUNT(*) AS projects, TOTAL(s.trade_count) AS trades,
+            TOTAL(s.total_profit) AS net, TOTAL(s.win_count) AS wins, TOTAL(s.loss_count) AS losses
+        FROM project_stats s JOIN projects p ON p.id = s.project_id JOIN users u ON u.id = p.user_id""").fetchone()
+    out = dict(row)
+    out["users"] = db.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    out["setups"] = db.execute("SELECT TOTAL(setups) FROM rollup_setup_day").fetchone()[0]
+    out["win_rate"] = _rate(out["wins"], out["losses"])
+    return out
+
+
+def _rate(wins, losses):
+    return round(wins / (wins + losses) * 100, 1) if wins + losses else None
+
+
+def by_user(db, since, sort="net"):
+    rows = db.execute(f"""
+        WITH owned AS (
+            SELECT p.user_id, COUNT(*) AS projects, TOTAL(s.trade_count) AS trades,
+                   TOTAL(s.total_profit) AS net, TOTAL(s.win_count) AS wins, TOTAL(s.loss_count) AS losses
+            FROM projects p LEFT JOIN project_stats s ON s.project_id = p.id GROUP BY p.user_id),
+        activity AS (
+            SELECT p.user_id, MAX(d.last_day) AS last_day, TOTAL(d.recent) AS recent_trades,
+                   TOTAL(d.recent_profit) AS recent_net
+            FROM (SELECT project_id, MAX(day) AS last_day,
+                         TOTAL(CASE WHEN day >= :since THEN trades END) AS recent,
+                         TOTAL(CASE WHEN day >= :since THEN profit END) AS recent_profit
+                  FROM rollup_project_day GROUP BY project_id) d
+            JOIN projects p ON p.id = d.project_id GROUP BY p.user_id),
+        setups AS (
+            SELECT user_id, TOTAL(setups) AS setups, TOTAL(CASE WHEN day >= :since THEN setups END) AS recent_setups
+            FROM rollup_setup_day GROUP BY user_id)
+        SELECT u.id, u.username, u.role, COALESCE(o.projects, 0) AS projects, COALESCE(o.trades, 0) AS trades,
+               COALESCE(o.net, 0) AS net, COALESCE(o.wins, 0) AS wins, COALESCE(o.losses, 0) AS losses,
+               a.last_day, COALESCE(a.recent_trades, 0) AS recent_trades, COALESCE(a.recent_net, 0) AS recent_net,
+               COALESCE(st.setups, 0) AS setups, COALESCE(st.recent_setups, 0) AS recent_setups
+        FROM users u LEFT JOIN owned o ON o.user_id = u.id LEFT JOIN activity a ON a.user_id = u.id
+        LEFT JOIN setups st ON st.user_id = u.id
+        ORDER BY {USER_SORTS.get(sort, USER_SORTS['net'])}, u.id""", {"since": since}).fetchall()
+    return [{**dict(r), "win_rate": _rate(r["wins"], r["losses"])} for r in rows]
+
+
+def by_project(db, limit=PROJECT_LIMIT):
+    """The most active projects (by trade count) with their owners."""
+    rows = db.execute("""SELECT p.id, p.name, u.username, s.trade_count AS trades, s.total_profit AS net,
+            s.win_count AS wins, s.loss_count AS losses,
+            (SELECT MAX(day) FROM rollup_project_day d WHERE d.project_id = p.id) AS last_day
+        FROM project_stats s JOIN projects p ON p.id = s.project_id JOIN users u ON u.id = p.user_id
+        ORDER BY s.trade_count DESC, p.id LIMIT ?""", (limit,)).fetchall()
+    return [{**dict(r), "win_rate": _rate(r["wins"], r["losses"])} for r in rows]
+
+
+def daily(db, since):
+    """Firm-wide trades, P/L and setups per day since `since`, oldest first."""
+    days = {r["day"]: dict(r, setups=0) for r in db.execute("""
+        SELECT day, TOTAL(trades) AS trades, TOTAL(profit) AS net, TOTAL(wins) AS wins, TOTAL(losses) AS losses
+        FROM rollup_project_day d JOIN projects p ON p.id = d.project_id JOIN users u ON u.id = p.user_id
+        WHERE day >= ? GROUP BY day""", (since,))}
+    for r in db.execute("""SELECT day, TOTAL(setups) FROM rollup_setup_day d JOIN users u ON u.id = d.user_id
+            WHERE day >= ? GROUP BY day""", (since,)):
+        days.setdefault(r[0], {"day": r[0], "trades": 0, "net": 0, "wins": 0, "losses": 0})["setups"] = r[1]
+    return [days[d] for d in sorted(days)]
+
+
+def overview(db, since, sort="net"):
+    return {"totals": totals(db), "users": by_user(db, since, sort), "projects": by_project(db),
+            "daily": daily(db, since)}
+
+
+def merge(parts, users, sort="net"):
+    """Add up the overview() of every tenant file; `users` are the catalog's (id, username, role) rows."""
+    known = {u["id"]: u for u in users}
+    out = {"totals": {k: sum(p["totals"][k] for p in parts) for k in ("projects", "trades", "net", "wins",
+                                                                      "losses", "setups")}}
+    out["totals"].update(users=len(known), win_rate=_rate(out["totals"]["wins"], out["totals"]["losses"]))
+
+    rows = {u["id"]: {"id": u["id"], "projects": 0, "trades": 0, "net": 0, "wins": 0, "losses": 0, "last_day": None,
+                      "recent_trades": 0, "recent_net": 0, "setups": 0, "recent_setups": 0, "win_rate": None}
+            for u in users}
+    for p in parts:
+        rows.update((r["id"], r) for r in p["users"] if r["id"] in known)
+    for r in rows.values():
+        r.update(username=known[r["id"]]["username"], role=known[r["id"]]["role"])   # the catalog's are current
+    out["users"] = sorted(rows.values(), key=lambda u: (MERGED_SORTS.get(sort, MERGED_SORTS["net"])(u), u["id"]))
+
+    out["projects"] = sorted((r for p in parts for r in p["projects"]),
+                             key=lambda r: -(r["trades"] or 0))[:PROJECT_LIMIT]
+    days = {}
+    for d in (d for p in parts for d in p["daily"]):
+        into = days.setdefault(d["day"], dict.fromkeys(("trades", "net", "wins", "losses", "setups"), 0))
+        for k in into:
+            into[k] += d[k]
+    out["daily"] = [{"day": d, **days[d]} for d in sorted(days)]
+    return out
+
+
+def rebuild(db):
+    db.execute("DELETE FROM rollup_project_day")
+    db.execute("DELETE FROM rollup_setup_day")
+    db.execute(f"""INSERT INTO rollup_project_day (project_id, day, trades, wins, losses, profit)
+        SELECT project_id, {DAY}, COUNT(*), SUM(COALESCE(lower(trim(result)) = 'win', 0)),
+               SUM(COALESCE(lower(trim(result)) = 'loss', 0)),
+               TOTAL(CASE WHEN typeof(profit) IN ('integer', 'real') THEN profit END)
+        FROM trades WHERE project_id IS NOT NULL GROUP BY 1, 2""")
+    db.execute(f"""INSERT INTO rollup_setup_day (user_id, day, setups, r_sum)
+        SELECT user_id, {DAY}, COUNT(*), TOTAL(CASE WHEN typeof(r_multiple) IN ('integer', 'real') THEN r_multiple END)
+        FROM backtest_setups WHERE user_id IS NOT NULL GROUP BY 1, 2""")
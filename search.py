@@ -0,0 +1,108 @@
+# search.py – full-text search over trades and backtest setups
+#
+# Backed by the trades_fts / setups_fts FTS5 tables (see the full text
+# search migration), which triggers keep in step with their source tables.
+# User input is never passed to MATCH as-is: it is rebuilt from plain
+# terms, "quoted phrases" and term* prefixes, so stray FTS syntax can't
+# raise errors. Hits are ranked by bm25 with titles/symbols weighted up,
+# unless the query matches more than RANK_MAX rows (bm25 must score every
+# hit), in which case the newest matches are listed instead. Both count
+# only the searching user's rows, so neither reveals what others wrote.
+
+import re
+from markupsafe import Markup, escape
+
+LIMIT = 50
+RANK_MAX = 20000        # broader queries list the newest hits instead of ranking
+KINDS = ("all", "trades", "setups")
+RESULTS = ("Win", "Loss", "BE")
+
+# bm25 column weights, in the fts column order
+TRADE_WEIGHTS = (4.0, 1.0)                      # symbol, notes
+SETUP_WEIGHTS = (4.0, 1.0, 1.0, 2.0, 2.0)       # title, entry/review notes, criteria
+
+# snippet() markers, escaped along with the text before becoming <mark>
+HL_START, HL_END = "\x02", "\x03"
+
+TOKEN = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def parse_query(q):
+    """FTS5 MATCH expression for user input; None if nothing searchable is left."""
+    parts = []
+    for phrase, word in TOKEN.findall(q or ""):
+        if phrase:
+            words = re.findall(r"\w+", phrase)
+            if words:
+                parts.append('"' + " ".join(words) + '"')
+            continue
+        words = [f'"{w}"' for w in re.findall(r"\w+", word)]
+        if words and word.endswith("*"):
+            words[-1] += "*"
+        parts += words
+    return " ".join(parts) or None
+
+
+def highlight(snippet):
+    return Markup(str(escape(snippet or "")).replace(HL_START, "<mark>").replace(HL_END, "</mark>"))
+
+
+def _filters(alias, date_from, date_to, result):
+    sql, params = "", []
+    if date_from:
+        sql += f" AND {alias}.date >= ?"
+        params.append(date_from)
+    if date_to:
+        sql += f" AND {alias}.date <= ?"
+        params.append(date_to)
+    if result:
+        sql += f" AND {alias}.result = ?"
+        params.append(result)
+    return sql, params
+
+
+def ranked(db, fts, join, match, where, params):
+    """Whether `match` is selective enough to rank: bm25 has to score every hit the user can see."""
+    return db.execute(f"SELECT 1 FROM {fts} {join} WHERE {fts} MATCH ?{where} LIMIT 1 OFFSET ?",
+                      (match, *params, RANK_MAX)).fetchone() is None
+
+
+def _search(db, fts, weights, cols, join, match, where, params, limit):
+    # Pick the page first (ids + order only), then build snippets for just
+    # those rows: snippet() is far dearer than bm25 and SQLite would
+    # otherwise evaluate it for every hit before sorting.
+    is_ranked = ranked(db, fts, join, match, where, params)
+    # FTS5 walks its doclists in rowid order, so "newest first" needs no sort
+    order = f"bm25({fts}, {', '.join(map(str, weights))})" if is_ranked else f"{fts}.rowid DESC"
+    rows = db.execute(f"""WITH page AS (
+            SELECT {fts}.rowid AS id, row_number() OVER (ORDER BY {order}) AS pos FROM {fts} {join}
+            WHERE {fts} MATCH ?{where} ORDER BY {order} LIMIT ?)
+        SELECT {cols}, snippet({fts}, -1, '{HL_START}', '{HL_END}', '…', 16) AS snippet
+        FROM page JOIN {fts} ON {fts}.rowid = page.id {join}
+        WHERE {fts} MATCH ? ORDER BY page.pos""", (match, *params, limit, match)).fetchall()
+    return rows, is_ranked
+
+
+def search_trades(db, user_id, match, project_id=None, date_from=None, date_to=None, result=None, limit=LIMIT):
+    """(rows, ranked): best matches by bm25, or the newest ones when the query is too broad to rank."""
+    where, params = _filters("t", date_from, date_to, result)
+    if project_id:
+        where += " AND t.project_id = ?"
+        params.append(project_id)
+    return _search(db, "trades_fts", TRADE_WEIGHTS,
+                   "t.id, t.date, t.symbol, t.direction, t.result, t.profit, p.name AS project_name",
+                   "JOIN trades t ON t.id = trades_fts.rowid JOIN projects p ON p.id = t.project_id",
+                   match, " AND p.user_id = ?" + where, (user_id, *params), limit)
+
+
+def search_setups(db, user_id, match, date_from=None, date_to=None, result=None, limit=LIMIT):
+    where, params = _filters("s", date_from, date_to, result)
+    return _search(db, "setups_fts", SETUP_WEIGHTS,
+                   "s.id, s.date, s.title, s.timeframe, s.result, s.profit",
+                   "JOIN backtest_setups s ON s.id = setups_fts.rowid",
+                   match, " AND s.user_id = ?" + where, (user_id, *params), limit)
+
+
+def rebuild(db):
+    for fts in ("trades_fts", "setups_fts"):
+        db.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
@@ -0,0 +1,157 @@
+# stats.py – per-project aggregates kept in step with the trades table
+#
+# Every route that writes to `trades` calls apply_trade() inside the same
+# transaction, so the dashboard summary is a single primary-key lookup
+# instead of a scan over the whole project.
+
+RESULT_COLS = {"win": "win_count", "loss": "loss_count", "break-even": "be_count", "be": "be_count"}
+
+EMPTY_SUMMARY = {
+    "total_trades": 0, "win_count": 0, "loss_count": 0, "be_count": 0,
+    "total_profit": 0, "avg_profit": 0, "avg_rr": 0, "win_rate": 0,
+    "best_trade": 0, "worst_trade": 0, "profit_factor": "N/A",
+}
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def result_col(result):
+    return RESULT_COLS.get((result or "").strip().lower())
+
+
+def apply_trade(db, project_id, trade, sign=1):
+    """Add (sign=1) or remove (sign=-1) one trade's contribution."""
+    profit = to_float(trade["profit"])
+    rr = to_float(trade["rr"]) or 0
+    col = result_col(trade["result"])
+    p = profit or 0
+
+    db.execute("INSERT OR IGNORE INTO project_stats (project_id) VALUES (?)", (project_id,))
+    db.execute(f"""UPDATE project_stats SET
+        trade_count = trade_count + ?, total_profit = total_profit + ?, rr_sum = rr_sum + ?,
+        win_sum = win_sum + ?, loss_sum = loss_sum + ?, data_version = data_version + 1
+        {f", {col} = {col} + ?" if col else ""}
+        WHERE project_id=?""",
+        (sign, sign * p, sign * rr,
+         sign * p if col == "win_count" else 0,
+         sign * p if col == "loss_count" else 0,
+         *((sign,) if col else ()), project_id))
+
+    if profit is None:
+        return
+    if sign > 0:
+        db.execute("""UPDATE project_stats SET
+            best_trade = MAX(COALESCE(best_trade, ?), ?),
+            worst_trade = MIN(COALESCE(worst_trade, ?), ?)
+            WHERE project_id=?""", (profit, profit, profit, profit, project_id))
+    else:
+        row = db.execute("SELECT best_trade, worst_trade FROM project_stats WHERE project_id=?",
+                         (project_id,)).fetchone()
+        if profit in (row[0], row[1]):
+            _refresh_extremes(db, project_id)
+
+
+def _refresh_extremes(db, project_id):
+    db.execute("""UPDATE project_stats SET
+        best_trade = (SELECT MAX(profit) FROM trades WHERE project_id=:p AND typeof(profit) IN ('integer','real')),
+        worst_trade = (SELECT MIN(profit) FROM trades WHERE project_id=:p AND typeof(profit) IN ('integer','real'))
+        WHERE project_id=:p""", {"p": project_id})
+
+
+def forget_project(db, project_id):
+    """Zero a deleted project's row but keep it, so its data_version never
+    restarts: a project that reuses the id carries on counting from here and
+    nothing cached against the old project's versions can match it."""
+    agg = aggregate(())
+    db.execute("INSERT OR IGNORE INTO project_stats (project_id) VALUES (?)", (project_id,))
+    db.execute(f"""UPDATE project_stats SET {", ".join(f"{c} = :{c}" for c in agg)},
+        data_version = data_version + 1 WHERE project_id = :pid""", {**agg, "pid": project_id})
+
+
+def aggregate(trades):
+    """Fold trades (mappings with result/profit/rr) into project_stats columns."""
+    agg = {"trade_count": 0, "win_count": 0, "loss_count": 0, "be_count": 0,
+           "total_profit": 0.0, "win_sum": 0.0, "loss_sum": 0.0, "rr_sum": 0.0,
+           "best_trade": None, "worst_trade": None}
+    for t in trades:
+        profit, col = to_float(t["profit"]), result_col(t["result"])
+        agg["trade_count"] += 1
+        agg["rr_sum"] += to_float(t["rr"]) or 0
+        if col:
+            agg[col] += 1
+        if profit is not None:
+            agg["total_profit"] += profit
+            if col in ("win_count", "loss_count"):
+                agg[col.replace("count", "sum")] += profit
+            agg["best_trade"] = profit if agg["best_trade"] is None else max(agg["best_trade"], profit)
+            agg["worst_trade"] = profit if agg["worst_trade"] is None else min(agg["worst_trade"], profit)
+    return agg
+
+
+def apply_batch(db, project_id, trades):
+    """Add many new trades' contribution with a single UPDATE."""
+    agg = aggregate(trades)
+    best, worst = agg.pop("best_trade"), agg.pop("worst_trade")
+    db.execute("INSERT OR IGNORE INTO project_stats (project_id) VALUES (?)", (project_id,))
+    db.execute(f"""UPDATE project_stats SET {", ".join(f"{c} = {c} + :{c}" for c in agg)},
+        best_trade = MAX(COALESCE(best_trade, :best), COALESCE(:best, best_trade)),
+        worst_trade = MIN(COALESCE(worst_trade, :worst), COALESCE(:worst, worst_trade)),
+        data_version = data_version + 1
+        WHERE project_id = :pid""", {**agg, "best": best, "worst": worst, "pid": project_id})
+
+
+def rebuild(db, project_id=None):
+    """Recompute project_stats from scratch (all projects, or one)."""
+    versions = dict(db.execute("SELECT project_id, data_version FROM project_stats"
+                               + ("" if project_id is None else " WHERE project_id=?"),
+                               () if project_id is None else (project_id,)).fetchall())
+    if project_id is None:
+        # Rows left by deleted projects stay behind as version tombstones
+        db.execute("DELETE FROM project_stats WHERE project_id IN (SELECT id FROM projects)")
+        pids = [r[0] for r in db.execute("SELECT id FROM projects")]
+    else:
+        db.execute("DELETE FROM project_stats WHERE project_id=?", (project_id,))
+        pids = [project_id]
+
+    for pid in pids:
+        agg = aggregate(db.execute("SELECT result, profit, rr FROM trades WHERE project_id=?", (pid,)))
+        # Keep counting up so nothing cached against an older version survives
+        agg["data_version"] = (versions.get(pid) or 0) + 1
+        db.execute(f"INSERT INTO project_stats (project_id, {', '.join(agg)}) "
+                   f"VALUES (?{', ?' * len(agg)})", (pid, *agg.values()))
+    return len(pids)
+
+
+def data_version(db, project_id):
+    row = db.execute("SELECT data_version FROM project_stats WHERE project_id=?", (project_id,)).fetchone()
+    return row[0] if row else 0
+
+
+def summary(db, project_id):
+    if project_id is None:
+        return EMPTY_SUMMARY
+    row = db.execute("SELECT * FROM project_stats WHERE project_id=?", (project_id,)).fetchone()
+    if row is None:
+        rebuild(db, project_id)
+        db.commit()
+        row = db.execute("SELECT * FROM project_stats WHERE project_id=?", (project_id,)).fetchone()
+
+    n = row["trade_count"]
+    return {
+        "total_trades": n,
+        "win_count": row["win_count"],
+        "loss_count": row["loss_count"],
+        "be_count": row["be_count"],
+        "total_profit": round(row["total_profit"], 2),
+        "avg_profit": round(row["total_profit"] / n, 2) if n else 0,
+        "avg_rr": round(row["rr_sum"] / n, 2) if n else 0,
+        "win_rate": round(row["win_count"] / n * 100, 2) if n else 0,
+        "best_trade": row["best_trade"] if row["best_trade"] is not None else 0,
+        "worst_trade": row["worst_trade"] if row["worst_trade"] is not None else 0,
+        "profit_factor": round(row["win_sum"] / abs(row["loss_sum"]), 2) if row["loss_sum"] else "N/A",
+    }
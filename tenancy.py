@@ -0,0 +1,234 @@
+# tenancy.py – optional one-database-per-user storage
+#
+# With TENANCY="user" each user's projects, trades, setups, jobs and
+# screenshots live in a file of their own, TENANT_DIR/user-<id>.db, and
+# DB_NAME shrinks to a catalog of what is shared: users and api_tokens.
+# One user's import then never waits on another's write lock, and an
+# account can be backed up, moved or dropped as a single file. Tenant
+# files are built from the same migrations as the catalog, so every
+# query in app.py runs unchanged against whichever file get_db() picks.
+# Image reference counts are per file, so screenshots move with their
+# tenant too (IMAGE_DIR/tenants/<id>/).
+#
+# The default, TENANCY="single", keeps everything in DB_NAME.
+# `flask split-tenants` copies a single-file journal into tenant files;
+# admin pages that cover everyone fan out over the files in parallel.
+
+import os, re, shutil, sqlite3, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, g, has_request_context, session
+import db_pool
+
+MODES = ("single", "user")
+TENANT_FILE = re.compile(r"^user-(\d+)\.db$")
+RETIRING_FILE = re.compile(r"^user-(\d+)\.db" + re.escape(db_pool.RETIRING) + "$")
+
+# What `split` copies into a user's file, in foreign-key order. Rollups
+# and search indexes aren't listed: their triggers fill them as rows land.
+SPLIT = [
+    ("projects", "user_id = :uid"),
+    ("trades", "project_id IN (SELECT id FROM main.projects)"),
+    ("project_stats", "project_id IN (SELECT id FROM main.projects)"),
+    ("backtest_setups", "user_id = :uid"),
+    ("backtest_screenshots", "setup_id IN (SELECT id FROM main.backtest_setups)"),
+    ("upload_jobs", "user_id = :uid"),
+]
+
+_create_lock = threading.Lock()     # alembic keeps its migration context in module globals
+
+
+def configure(app):
+    app.config.setdefault("TENANCY", os.environ.get("JOURNAL_TENANCY", "single"))
+    app.config.setdefault("TENANT_DIR", "tenants")
+    app.config.setdefault("TENANT_POOL_SIZE", 2)        # idle connections kept per tenant file
+    app.config.setdefault("TENANT_FANOUT_WORKERS", 8)
+    if app.config["TENANCY"] not in MODES:
+        raise ValueError(f"TENANCY must be one of {', '.join(MODES)}")
+
+
+def enabled(config):
+    return config["TENANCY"] == "user"
+
+
+def current():
+    """The user whose file this context works on; None means the catalog (or single-file mode)."""
+    if not enabled(current_app.config):
+        return None
+    if "tenant" in g:               # set by the API token check and the upload workers
+        return g.tenant
+    return session.get("user_id") if has_request_context() else None
+
+
+def path(config, user_id):
+    return os.path.join(config["TENANT_DIR"], f"user-{user_id}.db")
+
+
+def _ids(config, pattern):
+    try:
+        names = os.listdir(config["TENANT_DIR"])
+    except FileNotFoundError:
+        return set()
+    return {int(m.group(1)) for m in map(pattern.match, names) if m}
+
+
+def tenants(config):
+    """Ids of the users that have a tenant file in service, ascending."""
+    return sorted(_ids(config, TENANT_FILE) - _ids(config, RETIRING_FILE))
+
+
+def retiring(config):
+    """Ids of deleted users whose files wait for every worker to let go (see retire)."""
+    return sorted(_ids(config, RETIRING_FILE))
+
+
+def image_root(config, user_id):
+    return config["IMAGE_DIR"] if user_id is None else os.path.join(config["IMAGE_DIR"], "tenants", str(user_id))
+
+
+# ── creating tenant files ──
+
+def create(config, user_id, source, migrate, copy=False, replace=False):
+    """Build user_id's file from `source` (the catalog, or a single-file journal being split).
+
+    The file is migrated and filled under a temporary name and only then
+    linked into place, so a half-built tenant is never opened. Returns
+    the number of rows copied per table (with `copy`), else {}.
+    """
+    dest = path(config, user_id)
+    os.makedirs(config["TENANT_DIR"], exist_ok=True)
+    tmp = f"{dest}.{os.getpid()}-{threading.get_ident()}.tmp"
+    with _create_lock:
+        if os.path.exists(dest) and not replace:
+            return {}
+        try:
+            migrate(tmp)
+            counts = _fill(tmp, source, user_id, copy)
+            if replace:
+                os.replace(tmp, dest)
+            else:
+                try:
+                    os.link(tmp, dest)
+                except FileExistsError:     # another process got there first
+                    pass
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+    if copy:
+        _link_images(config, user_id, dest)
+    return counts
+
+
+def _fill(tmp, source, user_id, copy):
+    db = sqlite3.connect(tmp)
+    db.execute("ATTACH DATABASE ? AS src", (os.path.abspath(source),))
+    counts = {}
+    # the user's own row, so tenant-local joins on users still work; the password hash stays in the catalog
+    db.execute("INSERT INTO users (id, username, role, email) SELECT id, username, role, email FROM src.users WHERE id=?",
+               (user_id,))
+    # cache versions carry on from the source's (see cache.carry), never restart at 0
+    db.execute("INSERT INTO cache_versions (user_id, version) SELECT user_id, version FROM src.cache_versions WHERE user_id=?",
+               (user_id,))
+    if copy:
+        for table, where in SPLIT:
+            cols = ", ".join(c[1] for c in db.execute(f"PRAGMA main.table_info({table})"))
+            counts[table] = db.execute(f"INSERT INTO main.{table} ({cols}) SELECT {cols} FROM src.{table} WHERE {where}",
+                                       {"uid": user_id}).rowcount
+        # refcounts restart from this tenant's own references
+        counts["images"] = db.execute("""INSERT INTO main.images (hash, size, mime, refs)
+            SELECT i.hash, i.size, i.mime,
+                   (SELECT COUNT(*) FROM main.trades WHERE screenshot_hash = i.hash)
+                 + (SELECT COUNT(*) FROM main.backtest_screenshots WHERE image_hash = i.hash)
+            FROM src.images i WHERE i.hash IN (SELECT screenshot_hash FROM main.trades
+                                               UNION SELECT image_hash FROM main.backtest_screenshots)""").rowcount
+    db.commit()
+    db.execute("DETACH DATABASE src")
+    db.close()
+    return counts
+
+
+def _link_images(config, user_id, dest):
+    """Hard-link (or copy, across filesystems) the tenant's image files under its own root."""
+    root = image_root(config, user_id)
+    db = sqlite3.connect(dest)
+    for (h,) in db.execute("SELECT hash FROM images"):
+        src, dst = os.path.join(config["IMAGE_DIR"], h[:2], h), os.path.join(root, h[:2], h)
+        if os.path.exists(dst) or not os.path.exists(src):
+            continue
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+    db.close()
+
+
+def retire(config, user_id):
+    """Take a deleted user's file out of service and move it aside once nothing has it open.
+
+    Other workers may still hold connections to the file, and one that
+    outlived a rename would go on writing to (or, closing, delete) the
+    -wal and -shm beside the path. So the file is marked instead: db_pool
+    stops handing it out and drops idle connections to it, and it moves
+    here or on a later gc (finish_retire). Returns whether it moved now.
+    """
+    dest = path(config, user_id)
+    if os.path.exists(dest):
+        open(dest + db_pool.RETIRING, "a").close()
+    db_pool.get_pool(dest, config).close()
+    return finish_retire(config, user_id)
+
+
+def finish_retire(config, user_id):
+    """Move a retiring file (and the user's images) to TENANT_DIR/retired if no connection is left."""
+    dest = path(config, user_id)
+    stamp = time.strftime("%Y%m%d%H%M%S")
+    retired = os.path.join(config["TENANT_DIR"], "retired")
+    if os.path.exists(dest):
+        # Leaving WAL mode needs every other connection, in any process,
+        # closed, so it doubles as the check; the file is self-contained after.
+        db = sqlite3.connect(dest, timeout=0)
+        try:
+            db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            mode = db.execute("PRAGMA journal_mode=DELETE").fetchone()[0]
+        except sqlite3.OperationalError:
+            mode = None
+        finally:
+            db.close()
+        if mode != "delete":
+            return False
+        os.makedirs(retired, exist_ok=True)
+        os.replace(dest, os.path.join(retired, f"user-{user_id}-{stamp}.db"))
+    images = image_root(config, user_id)
+    if os.path.isdir(images):
+        os.makedirs(retired, exist_ok=True)
+        os.replace(images, os.path.join(retired, f"images-{user_id}-{stamp}"))
+    try:
+        os.unlink(dest + db_pool.RETIRING)
+    except FileNotFoundError:
+        pass
+    return True
+
+
+# ── fan-out ──
+
+def fan_out(config, fn, user_ids=None):
+    """fn(db, user_id) on every tenant file (or `user_ids`), in parallel; results in id order.
+
+    SQLite lets go of the GIL while it steps a query, so the threads
+    overlap the actual reads. `fn` must return plain values, not Rows
+    it means to read after its connection goes back to the pool.
+    """
+    ids = tenants(config) if user_ids is None else user_ids
+
+    def one(uid):
+        pool = db_pool.get_pool(path(config, uid), config, config["TENANT_POOL_SIZE"])
+        db = pool.acquire()
+        try:
+            return fn(db, uid)
+        finally:
+            pool.release(db)
+
+    if len(ids) <= 1:
+        return [one(uid) for uid in ids]
+    with ThreadPoolExecutor(max_workers=config["TENANT_FANOUT_WORKERS"]) as ex:
+        return list(ex.map(one, ids))
@@ -0,0 +1,39 @@
+import os, sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app as journal  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """The journal app on a fresh, migrated journal.db under tmp_path."""
+    monkeypatch.chdir(tmp_path)         # DB_NAME, IMAGE_DIR and the rest are relative paths
+    journal.app.config["TESTING"] = True
+    journal.cache._backends.clear()     # cache keys repeat across tests' fresh databases
+    journal.reports._cache.clear()
+    with journal.app.app_context():
+        journal.init_db()
+    return journal.app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin(client):
+    """A client signed in as the first registered user, who is made admin."""
+    client.post("/register", data={"email": "admin@example.com", "username": "admin",
+                                   "password": "pw", "confirm_password": "pw"})
+    client.post("/login", data={"username": "admin", "password": "pw"})
+    return client
+
+
+@pytest.fixture
+def token(app, admin):
+    """An API token for the admin, who owns project 1."""
+    admin.post("/add_project", data={"name": "P1", "category": "fx"})
+    out = app.test_cli_runner().invoke(args=["create-token", "1"]).output
+    return {"Authorization": f"Bearer {out.split()[1]}"}
@@ -0,0 +1,24 @@
+import analytics
+
+
+def test_analytics_is_computed_once_per_data_version(app, admin, monkeypatch):
+    admin.post("/add_project", data={"name": "P1", "category": "fx"})
+    admin.get("/open_project/1")
+    admin.post("/trade/add", data={"date": "2024-03-01", "symbol": "EURUSD", "direction": "Buy",
+                                   "entry": "1.1", "exit": "1.2", "result": "Win", "profit": "5"})
+    loads = []
+    real_load = analytics.load
+    monkeypatch.setattr(analytics, "load", lambda *a: loads.append(a) or real_load(*a))
+
+    r = admin.get("/project/1/analytics.json")
+    assert r.status_code == 200 and r.json["trades"] == 1
+    etag = r.headers["ETag"]
+    assert admin.get("/project/1/analytics.json").json == r.json
+    assert admin.get("/project/1/analytics.json", headers={"If-None-Match": etag}).status_code == 304
+    assert len(loads) == 1
+
+    admin.post("/trade/add", data={"date": "2024-03-02", "symbol": "EURUSD", "direction": "Buy",
+                                   "entry": "1.1", "exit": "1.2", "result": "Loss", "profit": "-2"})
+    r = admin.get("/project/1/analytics.json", headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.json["trades"] == 2
+    assert len(loads) == 2
@@ -0,0 +1,39 @@
+import pytest
+import app as journal
+
+
+@pytest.mark.parametrize("body", [[{"client_id": "a"}], "x", 1, None])
+@pytest.mark.parametrize("url", ["/api/v1/trades", "/api/v1/setups"])
+def test_body_that_is_not_an_object_is_rejected(client, token, url, body):
+    r = client.post(url, json=body, headers=token)
+    assert r.status_code == 400
+    assert "error" in r.get_json()
+
+
+def test_bool_project_id_is_rejected(client, token):
+    r = client.post("/api/v1/trades", json={"project_id": True, "trades": []}, headers=token)
+    assert r.status_code == 404
+
+
+@pytest.mark.parametrize("field", ["profit", "lot_size", "rr"])
+def test_bool_numeric_field_is_rejected(client, token, field):
+    trade = {"client_id": "a", "date": "2024-04-01", "symbol": "EURUSD", "direction": "Buy", field: True}
+    r = client.post("/api/v1/trades", json={"project_id": 1, "trades": [trade]}, headers=token)
+    assert r.status_code == 400
+    assert r.get_json()["index"] == 0
+
+
+def test_batch_is_written(client, token):
+    trade = {"client_id": "a", "date": "2024-04-01", "symbol": "EURUSD", "direction": "Buy", "result": "Win", "profit": 5}
+    r = client.post("/api/v1/trades", json={"project_id": 1, "trades": [trade]}, headers=token)
+    assert r.status_code == 200
+    assert r.get_json()["created"] == 1
+
+
+def test_trade_without_result_is_counted_in_rollups(app, client, token):
+    trade = {"client_id": "a", "date": "2024-04-01", "symbol": "EURUSD", "direction": "Buy", "profit": 5}
+    r = client.post("/api/v1/trades", json={"project_id": 1, "trades": [trade]}, headers=token)
+    assert r.status_code == 200
+    with app.app_context():
+        row = journal.get_db().execute("SELECT trades, wins, losses, profit FROM rollup_project_day").fetchone()
+    assert tuple(row) == (1, 0, 0, 5)
@@ -0,0 +1,56 @@
+import gzip, time
+import pytest
+
+
+@pytest.fixture
+def project(app, admin):
+    admin.post("/add_project", data={"name": "P1", "category": "fx"})
+    admin.get("/open_project/1")
+    for i, profit in enumerate(("5", "-2", "7")):
+        admin.post("/trade/add", data={"date": f"2024-03-0{i + 1}", "symbol": "EURUSD", "direction": "Buy",
+                                       "entry": "1.1", "exit": "1.2", "result": "Win", "profit": profit})
+    return admin
+
+
+def fetch(client, url, headers=None, timeout=60):
+    """Poll `url` the way the reports page does until the chart is ready."""
+    deadline = time.monotonic() + timeout
+    while True:
+        r = client.get(url, headers=headers)
+        if r.status_code != 503 or time.monotonic() > deadline:
+            return r
+        time.sleep(0.2)
+
+
+def test_cold_chart_answers_at_once_and_renders_in_the_background(app, project, monkeypatch):
+    monkeypatch.setitem(app.config, "CHART_WAIT", 0)
+    t = time.perf_counter()
+    r = project.get("/project/1/chart/equity.png?size=sm")
+    assert time.perf_counter() - t < 0.5
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == "1"
+
+    r = fetch(project, "/project/1/chart/equity.png?size=sm")
+    assert r.status_code == 200
+    assert r.data.startswith(b"\x89PNG")
+
+
+def test_svg_chart_is_served_gzipped(project):
+    r = fetch(project, "/project/1/chart/pnl.svg?size=sm", headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in r.headers["Vary"]
+    assert gzip.decompress(r.data).lstrip().startswith(b"<?xml")
+
+
+def test_svg_chart_is_served_plain_without_accept_encoding(project):
+    r = fetch(project, "/project/1/chart/pnl.svg?size=sm", headers={"Accept-Encoding": "identity"})
+    assert r.status_code == 200
+    assert "Content-Encoding" not in r.headers
+    assert r.data.lstrip().startswith(b"<?xml")
+
+
+def test_png_chart_has_no_content_encoding(project):
+    r = fetch(project, "/project/1/chart/pnl.png?size=sm")
+    assert r.status_code == 200
+    assert "Content-Encoding" not in r.headers
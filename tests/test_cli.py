@@ -0,0 +1,25 @@
+import json
+import pytest
+
+
+@pytest.fixture
+def rules(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps([]))
+    return str(path)
+
+
+@pytest.mark.parametrize("dates", [("2024-13-01", "2024-02-01"), ("yesterday", "2024-02-01"), ("2024-01-01", "2024/02/01")])
+def test_replay_rejects_a_bad_date(app, rules, dates):
+    result = app.test_cli_runner().invoke(args=["replay", rules, "--user-id", "1", "--symbols", "EURUSD",
+                                                "--from", dates[0], "--to", dates[1]])
+    assert result.exit_code == 2
+    assert "Invalid value" in result.output
+    assert not isinstance(result.exception, ValueError)
+
+
+def test_replay_rejects_an_empty_range(app, rules):
+    result = app.test_cli_runner().invoke(args=["replay", rules, "--user-id", "1", "--symbols", "EURUSD",
+                                                "--from", "2024-02-01", "--to", "2024-01-01"])
+    assert result.exit_code == 2
+    assert "--to" in result.output
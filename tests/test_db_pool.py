@@ -0,0 +1,48 @@
+import os, sqlite3
+import pytest
+import db_pool
+
+PRAGMAS = dict(db_pool.DEFAULT_PRAGMAS)
+
+
+def make(path, name):
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE owner (name TEXT)")
+    db.execute("INSERT INTO owner VALUES (?)", (name,))
+    db.commit()
+    db.close()
+
+
+def test_idle_connection_to_a_replaced_file_is_not_reused(tmp_path):
+    path = str(tmp_path / "user-5.db")
+    make(path, "deleted user")
+    pool = db_pool.Pool(path, 2, PRAGMAS, 16)
+    pool.release(pool.acquire())                     # left idle, as in another worker
+
+    os.replace(path, str(tmp_path / "retired.db"))   # tenancy.retire, without this pool's close()
+    make(path, "new user")
+
+    db = pool.acquire()
+    assert db.execute("SELECT name FROM owner").fetchone()[0] == "new user"
+
+
+def test_checked_out_connection_is_closed_on_release_after_a_replace(tmp_path):
+    path = str(tmp_path / "user-5.db")
+    make(path, "deleted user")
+    pool = db_pool.Pool(path, 2, PRAGMAS, 16)
+    stale = pool.acquire()
+    os.replace(path, str(tmp_path / "retired.db"))
+    make(path, "new user")
+    pool.release(stale)
+    assert pool.acquire() is not stale
+
+
+def test_retiring_file_is_not_handed_out(tmp_path):
+    path = str(tmp_path / "user-5.db")
+    make(path, "deleted user")
+    pool = db_pool.Pool(path, 2, PRAGMAS, 16)
+    db = pool.acquire()
+    open(path + db_pool.RETIRING, "w").close()
+    pool.release(db)                                # closed, not kept idle
+    with pytest.raises(db_pool.Retiring):
+        pool.acquire()
@@ -0,0 +1,52 @@
+import os
+import pytest
+import app as journal
+import image_store
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\0" * 64
+
+
+@pytest.fixture
+def db(app):
+    with app.app_context():
+        yield journal.get_db()
+
+
+def test_rolled_back_put_leaves_only_a_stray_file(db):
+    h = image_store.put(db, PNG, prefetch=False)
+    db.rollback()
+    assert db.execute("SELECT 1 FROM images WHERE hash=?", (h,)).fetchone() is None
+    assert image_store.strays(db, 0) == [image_store.path_for(h)]
+
+
+def test_release_keeps_the_file_until_collected(db):
+    h = image_store.put(db, PNG, prefetch=False)
+    db.commit()
+    image_store.release(db, h)
+    db.commit()
+    assert os.path.exists(image_store.path_for(h))
+
+    assert image_store.collect(db, 10) == 1
+    db.commit()
+    assert not os.path.exists(image_store.path_for(h))
+    assert db.execute("SELECT 1 FROM images WHERE hash=?", (h,)).fetchone() is None
+
+
+def test_released_image_is_revived_by_a_new_put(db):
+    h = image_store.put(db, PNG, prefetch=False)
+    image_store.release(db, h)
+    db.commit()
+    assert image_store.put(db, PNG, prefetch=False) == h
+    db.commit()
+    assert image_store.collect(db, 10) == 0
+    assert db.execute("SELECT refs FROM images WHERE hash=?", (h,)).fetchone()[0] == 1
+
+
+def test_put_rewrites_a_file_collected_under_a_surviving_row(db):
+    h = image_store.put(db, PNG, prefetch=False)
+    db.commit()
+    os.unlink(image_store.path_for(h))        # collect() unlinked it, then its commit failed
+    image_store.put(db, PNG, prefetch=False)
+    db.commit()
+    with open(image_store.path_for(h), "rb") as f:
+        assert f.read() == PNG
@@ -0,0 +1,60 @@
+import io
+import pytest
+import app as journal
+import importer
+
+
+@pytest.mark.parametrize("raw, decimal, value", [
+    ("1234.56", ".", 1234.56),
+    ("1,234.56", ".", 1234.56),
+    ("1.234,56", ",", 1234.56),
+    ("12.345.678,9", ",", 12345678.9),
+    ("-1 234,5", ",", -1234.5),
+    ("0,5", ",", 0.5),
+    ("1,234,567", ".", 1234567),
+    ("1.234.567", ",", 1234567),
+    ("1,234", ".", 1234),
+    ("1,234", ",", 1.234),
+    ("", ".", None),
+])
+def test_num(raw, decimal, value):
+    assert importer._num(raw, decimal) == value
+
+
+@pytest.mark.parametrize("raw, decimal", [("1.234,5,6", ","), ("1,2.3.4", "."), ("1.5,0", "."), ("abc", ".")])
+def test_num_rejects_malformed_values(raw, decimal):
+    with pytest.raises(ValueError):
+        importer._num(raw, decimal)
+
+
+@pytest.mark.parametrize("values, decimal", [
+    (["1,234", "1,234.5"], "."),
+    (["1,234", "0,5"], ","),
+    (["1.234", "1.234.567"], ","),
+    (["1,234", "", None], None),
+])
+def test_detect_decimal(values, decimal):
+    assert importer.detect_decimal(values) == decimal
+
+
+@pytest.fixture
+def db(app):
+    with app.app_context():
+        db = journal.get_db()
+        db.execute("INSERT INTO users (id, username, email) VALUES (1, 'a', 'a@example.com')")
+        db.execute("INSERT INTO projects (id, user_id, name) VALUES (1, 1, 'P')")
+        db.commit()
+        yield db
+
+
+def imported_profits(db, text, **kw):
+    db.execute("DELETE FROM trades")
+    for _ in importer.import_trades(db, 1, io.BytesIO(text.encode()), **kw):
+        pass
+    return [r[0] for r in db.execute("SELECT profit FROM trades ORDER BY id")]
+
+
+def test_separator_is_decided_once_per_file(db):
+    text = 'date;symbol;type;price;profit\n2024-01-01;EURUSD;buy;1.08512;"1,234"\n2024-01-02;EURUSD;sell;1.0851;-5\n'
+    assert imported_profits(db, text) == [1234, -5]         # the 1.0851 price shows periods are decimals
+    assert imported_profits(db, text, decimal=",") == [1.234, -5]
@@ -0,0 +1,13 @@
+import re
+import app as journal
+
+# "SCAN t", "SCAN trades", "SCAN s USING INDEX …" (a full index walk is still a scan)
+TABLE_SCAN = re.compile(r"^SCAN (t|trades|s|backtest_setups|backtest_screenshots)\b")
+
+
+def test_hot_queries_use_indexes(app):
+    with app.app_context():
+        plans = list(journal.explain_hot_queries(journal.get_db()))
+    assert {name for name, _, _ in plans} == set(journal.HOT_QUERIES)
+    assert [(name, detail) for name, detail, ok in plans if not ok] == []
+    assert [(name, detail) for name, detail, _ in plans if TABLE_SCAN.match(detail)] == []
@@ -0,0 +1,25 @@
+import glob, io, os
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\0" * 64
+
+
+def test_page_renders_before_any_task_has_run(admin):
+    r = admin.get("/admin/maintenance")
+    assert r.status_code == 200
+    assert b"never run" in r.data
+
+
+def test_gc_deletes_the_screenshot_of_a_deleted_trade(app, admin):
+    admin.post("/add_project", data={"name": "P1", "category": "fx"})
+    admin.get("/open_project/1")
+    admin.post("/trade/add", content_type="multipart/form-data", data={
+        "date": "2024-03-01", "symbol": "EURUSD", "direction": "Buy", "entry": "1.1", "exit": "1.2", "result": "Win", "profit": "5",
+        "screenshot": (io.BytesIO(PNG), "a.png")})
+    files = lambda: glob.glob(os.path.join("images", "??", "*"))
+    assert len(files()) == 1
+
+    admin.post("/trade/delete/1")
+    assert len(files()) == 1                # nothing is unlinked on the request path
+    result = app.test_cli_runner().invoke(args=["maintenance", "gc"])
+    assert "1 unused images" in result.output
+    assert files() == []
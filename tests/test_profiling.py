@@ -0,0 +1,24 @@
+import pytest
+
+
+@pytest.fixture
+def profiled(app, monkeypatch):
+    monkeypatch.setitem(app.config, "PROFILING", True)
+    monkeypatch.setitem(app.config, "METRICS_TOKEN", "s3cret")
+    return app
+
+
+def test_metrics_need_the_token_or_an_admin(profiled, client):
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics", headers={"Authorization": "Bearer nope"}).status_code == 403
+    assert client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
+
+    client.post("/register", data={"email": "admin@example.com", "username": "admin",
+                                   "password": "pw", "confirm_password": "pw"})
+    client.post("/login", data={"username": "admin", "password": "pw"})
+    assert client.get("/metrics").status_code == 200
+
+
+def test_metrics_without_a_token_are_admin_only(profiled, client, monkeypatch):
+    monkeypatch.setitem(profiled.config, "METRICS_TOKEN", None)
+    assert client.get("/metrics").status_code == 403
@@ -0,0 +1,44 @@
+# Query counts of the paged pages, the check routes_bench.py runs on a
+# generated journal: a page may not cost a query per row it shows.
+import pytest
+import app as journal
+import profiling, stats
+
+PAGED = ("/dashboard", "/setups")
+
+
+@pytest.fixture
+def filled(app, admin, monkeypatch):
+    monkeypatch.setitem(app.config, "CACHE_BACKEND", "none")
+    admin.post("/add_project", data={"name": "P1", "category": "fx"})
+    admin.get("/open_project/1")
+    with app.app_context():
+        db = journal.get_db()
+        db.executemany("INSERT INTO trades (project_id, date, symbol, result, profit, rr) "
+                       "VALUES (1, ?, 'EURUSD', 'Win', 5, 2)", [(f"2024-01-{d:02}",) for d in range(1, 29)] * 3)
+        db.executemany("INSERT INTO backtest_setups (user_id, date, title, result, r_multiple, profit) "
+                       "VALUES (1, ?, 'ORB', 'Win', 2, 5)", [(f"2024-01-{d:02}",) for d in range(1, 29)] * 3)
+        stats.rebuild(db)
+        db.commit()
+    return admin
+
+
+def queries(app, client, url):
+    app.config["PROFILING"] = True
+    try:
+        before = profiling.totals()
+        assert client.get(url).status_code == 200
+        after = profiling.totals()
+    finally:
+        app.config["PROFILING"] = False
+    return {k: after.get(k, 0) - before.get(k, 0) for k in ("db_queries_total", "db_blob_fetches_total")}
+
+
+@pytest.mark.parametrize("url", PAGED)
+def test_page_costs_the_same_queries_however_many_rows_it_shows(app, filled, monkeypatch, url):
+    monkeypatch.setitem(app.config, "PAGE_SIZE", 5)
+    small = queries(app, filled, url)
+    monkeypatch.setitem(app.config, "PAGE_SIZE", 50)
+    full = queries(app, filled, url)
+    assert 0 < small["db_queries_total"] == full["db_queries_total"]
+    assert full["db_blob_fetches_total"] == 0
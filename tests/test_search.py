@@ -0,0 +1,26 @@
+import pytest
+import app as journal
+import search
+
+
+@pytest.fixture
+def db(app):
+    with app.app_context():
+        db = journal.get_db()
+        db.executemany("INSERT INTO users (id, username, email) VALUES (?, ?, ?)",
+                       [(1, "a", "a@example.com"), (2, "b", "b@example.com")])
+        db.executemany("INSERT INTO projects (id, user_id, name) VALUES (?, ?, ?)", [(1, 1, "A"), (2, 2, "B")])
+        db.executemany("INSERT INTO trades (project_id, date, symbol, notes) VALUES (?, ?, 'EURUSD', ?)",
+                       [(1, "2024-01-01", "london breakout")]
+                       + [(2, f"2024-01-{d:02}", "london breakout") for d in range(1, 11)])
+        db.commit()
+        yield db
+
+
+def test_rank_cutoff_counts_only_the_users_own_hits(db, monkeypatch):
+    monkeypatch.setattr(search, "RANK_MAX", 5)
+    match = search.parse_query("london")
+    rows, ranked = search.search_trades(db, 1, match)
+    assert len(rows) == 1 and ranked             # user 2's ten hits don't push user 1 past RANK_MAX
+    rows, ranked = search.search_trades(db, 2, match)
+    assert len(rows) == 10 and not ranked
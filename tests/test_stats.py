@@ -0,0 +1,27 @@
+import app as journal
+import reports
+import stats
+
+
+def test_reused_project_id_never_sees_the_old_projects_reports(app):
+    with app.app_context():
+        db = journal.get_db()
+        db.execute("INSERT INTO users (id, username, email) VALUES (1, 'a', 'a@example.com')")
+        db.execute("INSERT INTO projects (id, user_id, name) VALUES (1, 1, 'old')")
+        trade = {"result": "Win", "profit": 50, "rr": 2}
+        db.execute("INSERT INTO trades (project_id, date, symbol, result, profit, rr) "
+                   "VALUES (1, '2024-01-01', 'EURUSD', 'Win', 50, 2)")
+        stats.apply_trade(db, 1, trade)
+        assert reports.breakdown(db, 1, "symbol")    # cached by this "other worker"
+        old = stats.data_version(db, 1)
+
+        # Deleted elsewhere: this worker's report cache is never told
+        db.execute("DELETE FROM trades WHERE project_id=1")
+        db.execute("DELETE FROM projects WHERE id=1")
+        stats.forget_project(db, 1)
+        stats.rebuild(db)
+        db.execute("INSERT INTO projects (id, user_id, name) VALUES (1, 1, 'new')")
+
+        assert stats.data_version(db, 1) > old
+        assert stats.summary(db, 1)["total_trades"] == 0
+        assert not reports.breakdown(db, 1, "symbol")
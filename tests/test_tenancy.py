@@ -0,0 +1,61 @@
+import os, sqlite3
+import pytest
+import app as journal
+import db_pool, tenancy
+
+
+@pytest.fixture
+def tenant_app(app, monkeypatch):
+    monkeypatch.setitem(app.config, "TENANCY", "user")
+    return app
+
+
+def sign_up(app, name):
+    c = app.test_client()
+    c.post("/register", data={"email": f"{name}@example.com", "username": name, "password": "pw", "confirm_password": "pw"})
+    c.post("/login", data={"username": name, "password": "pw"})
+    return c
+
+
+def test_reused_id_does_not_see_the_deleted_users_cached_pages(tenant_app, admin):
+    bob = sign_up(tenant_app, "bob")
+    bob.post("/add_project", data={"name": "BOB-SECRET", "category": "fx"})
+    assert b"BOB-SECRET" in bob.get("/select_project").data          # now cached
+
+    admin.post("/admin/delete/2")
+    carol = sign_up(tenant_app, "carol")
+    carol.post("/add_project", data={"name": "CAROL-OWN", "category": "fx"})
+    page = carol.get("/select_project").data
+    assert b"CAROL-OWN" in page
+    assert b"BOB-SECRET" not in page
+
+
+def test_deleted_users_id_is_not_reused(tenant_app, admin):
+    sign_up(tenant_app, "bob")
+    admin.post("/admin/delete/2")
+    sign_up(tenant_app, "carol")
+    with tenant_app.app_context():
+        ids = [r[0] for r in journal.get_catalog().execute("SELECT id FROM users ORDER BY id")]
+    assert ids == [1, 3]
+
+
+def test_file_held_open_elsewhere_is_retired_once_released(tenant_app, admin):
+    bob = sign_up(tenant_app, "bob")
+    bob.post("/add_project", data={"name": "BOB", "category": "fx"})
+    path = tenancy.path(tenant_app.config, 2)
+    other_worker = sqlite3.connect(path)
+    other_worker.execute("SELECT * FROM projects").fetchall()
+
+    admin.post("/admin/delete/2")
+    assert os.path.exists(path)                     # not moved under the open connection
+    assert 2 not in tenancy.tenants(tenant_app.config)
+    assert tenancy.retiring(tenant_app.config) == [2]
+    r = bob.get("/select_project")                  # still signed in: sent to the login page
+    assert r.status_code == 302 and "/login" in r.headers["Location"]
+
+    other_worker.close()
+    result = tenant_app.test_cli_runner().invoke(args=["maintenance", "gc"])
+    assert "1 retired tenants" in result.output
+    assert not any(os.path.exists(path + suffix) for suffix in ("", "-wal", "-shm", db_pool.RETIRING))
+    retired = os.listdir(os.path.join(tenant_app.config["TENANT_DIR"], "retired"))
+    assert [n for n in retired if n.endswith(".db")] == [n for n in retired if n.startswith("user-2-")]
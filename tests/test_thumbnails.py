@@ -0,0 +1,23 @@
+import io
+from PIL import Image
+import thumbnails
+
+
+def png(tmp_path, w, h):
+    buf = io.BytesIO()
+    Image.new("RGB", (w, h), "white").save(buf, format="PNG")
+    path = tmp_path / "src.png"
+    path.write_bytes(buf.getvalue())
+    return str(path)
+
+
+def test_undecodable_image_falls_back_to_the_original(app, tmp_path, monkeypatch):
+    src = png(tmp_path, 100, 100)
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 10)          # 100x100 is now a "bomb"
+    assert thumbnails.get(str(tmp_path), src, "bomb", 80, "jpeg", 1 << 20, 5) is None
+
+
+def test_hit_is_served_and_bumped(app, tmp_path):
+    src = png(tmp_path, 100, 100)
+    dest = thumbnails.get(str(tmp_path), src, "ok", 80, "jpeg", 1 << 20, 5)
+    assert dest and thumbnails.get(str(tmp_path), src, "ok", 80, "jpeg", 1 << 20, 5) == dest
@@ -0,0 +1,130 @@
+# thumbnails.py – downscaled copies of stored screenshots
+#
+# Thumbnails are rendered by a small thread pool (Pillow releases the GIL
+# while resampling) either right after upload or on the first request
+# for a size, and kept under <IMAGE_DIR>/thumbs. The directory is an LRU
+# cache: every hit bumps the file's mtime and the oldest files are
+# evicted once the directory grows past THUMB_CACHE_BYTES.
+
+import os, tempfile, threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+SIZES = (80, 160, 320)          # thumbnail heights in px
+FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg"}
+PREFETCH_SIZES = (80, 160)
+
+_pool = None
+_pending = {}
+_lock = threading.Lock()
+
+
+def configure(app):
+    global _pool
+    app.config.setdefault("THUMB_WORKERS", 2)
+    app.config.setdefault("THUMB_CACHE_BYTES", 256 * 1024 * 1024)
+    app.config.setdefault("THUMB_WAIT", 5.0)
+    _pool = ThreadPoolExecutor(app.config["THUMB_WORKERS"], thread_name_prefix="thumbs")
+
+
+def pick_size(requested):
+    """Smallest supported height that is at least `requested`."""
+    for s in SIZES:
+        if requested <= s:
+            return s
+    return SIZES[-1]
+
+
+def pick_format(accept):
+    return "webp" if accept and "image/webp" in accept else "jpeg"
+
+
+def thumb_dir(root):
+    return os.path.join(root, "thumbs")
+
+
+def thumb_path(root, h, size, fmt):
+    return os.path.join(thumb_dir(root), f"{h}-{size}.{fmt}")
+
+
+def _render(src, dest, size, fmt, budget):
+    from PIL import Image
+    with Image.open(src) as im:
+        im.draft("RGB", (size * 4, size))
+        im.thumbnail((size * 4, size), Image.LANCZOS)
+        if fmt == "jpeg" and im.mode not in ("RGB", "L"):
+            im = im.convert("RGB")
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), prefix=".thumb-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                im.save(out, format=fmt.upper(), quality=80)
+            os.replace(tmp, dest)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    evict(os.path.dirname(dest), budget)
+    return dest
+
+
+def _submit(src, dest, size, fmt, budget):
+    with _lock:
+        fut = _pending.get(dest)
+        if fut is None:
+            fut = _pool.submit(_render, src, dest, size, fmt, budget)
+            _pending[dest] = fut
+            fut.add_done_callback(lambda _: _pending.pop(dest, None))
+    return fut
+
+
+def get(root, src, h, size, fmt, budget, wait):
+    """Path of the thumbnail, rendering it if needed; None if not ready in time."""
+    from PIL import Image
+    dest = thumb_path(root, h, size, fmt)
+    try:
+        os.utime(dest)
+        return dest
+    except FileNotFoundError:       # never rendered, or evicted meanwhile
+        pass
+    os.makedirs(thumb_dir(root), exist_ok=True)
+    try:
+        return _submit(src, dest, size, fmt, budget).result(timeout=wait)
+    except FutureTimeout:
+        return None
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        # Not something Pillow can (or will) decode; the caller serves the original.
+        return None
+
+
+def prefetch(root, src, h, budget):
+    if _pool is None:
+        return
+    os.makedirs(thumb_dir(root), exist_ok=True)
+    for size in PREFETCH_SIZES:
+        for fmt in FORMATS:
+            if not os.path.exists(thumb_path(root, h, size, fmt)):
+                _submit(src, thumb_path(root, h, size, fmt), size, fmt, budget)
+
+
+def discard(root, h):
+    for size in SIZES:
+        for fmt in FORMATS:
+            try:
+                os.unlink(thumb_path(root, h, size, fmt))
+            except FileNotFoundError:
+                pass
+
+
+def evict(directory, budget):
+    entries = []
+    for e in os.scandir(directory):
+        if e.is_file() and not e.name.startswith("."):
+            st = e.stat()
+            entries.append((st.st_mtime, st.st_size, e.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= budget:
+            break
+        try:
+            os.unlink(path)
+            total -= size
+        except FileNotFoundError:
+            pass
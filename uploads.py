@@ -0,0 +1,189 @@
+# uploads.py – background ingestion of backtest setup screenshots
+#
+# The upload request only streams each file to IMAGE_DIR/spool and records
+# an upload_jobs row in the same transaction as the setup, so it returns
+# without touching Pillow and holds the write lock for a couple of inserts.
+# A few worker threads per process then claim pending jobs, validate the
+# image, downscale anything larger than UPLOAD_MAX_EDGE, and store it via
+# image_store. Jobs live in SQLite, so there is no broker to run: any
+# worker process can finish a job another one queued, and a job left
+# 'processing' by a dead worker is claimed again once it goes stale.
+# `flask process-uploads` drains the queue by hand. In tenant mode each
+# user's jobs sit in their own database, so workers only look at the
+# tenants they were notified about (plus the catalog on every poll).
+
+import logging, os, tempfile, threading
+from flask import current_app, g
+import image_store, cache
+
+ACCEPTED = {"PNG", "JPEG", "WEBP", "GIF"}
+STALE = "-10 minutes"       # a 'processing' job untouched this long is retried
+
+log = logging.getLogger("trading_journal.uploads")
+
+_lock = threading.Lock()
+_workers = {"pid": None, "wake": None, "tenants": {None}}
+
+
+class Rejected(Exception):
+    """The upload can never be stored; retrying won't help."""
+
+
+def configure(app, get_db):
+    app.config.setdefault("UPLOAD_WORKERS", 2)
+    app.config.setdefault("UPLOAD_MAX_EDGE", 4096)          # px; larger images are downscaled
+    app.config.setdefault("UPLOAD_MAX_PIXELS", 50_000_000)
+    app.config.setdefault("UPLOAD_ATTEMPTS", 3)
+    app.config.setdefault("UPLOAD_POLL", 5.0)               # s between queue checks when idle
+    app.extensions["uploads"] = get_db
+
+
+def spool_dir():
+    return os.path.join(image_store.root(), "spool")
+
+
+def spool(file):
+    """Stream an uploaded FileStorage to a spool file and return its path."""
+    os.makedirs(spool_dir(), exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=spool_dir(), prefix="upload-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            file.save(out)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+def enqueue(db, setup_id, user_id, path, filename):
+    db.execute("INSERT INTO upload_jobs (setup_id, user_id, spool_path, filename) VALUES (?, ?, ?, ?)",
+               (setup_id, user_id, path, filename))
+
+
+def status(db, setup_id):
+    """The setup's uploads that haven't been stored (yet)."""
+    return db.execute("""SELECT id, filename, status, error FROM upload_jobs
+        WHERE setup_id=? AND status != 'done' ORDER BY id""", (setup_id,)).fetchall()
+
+
+# ── workers ──
+
+def notify(app, tenant=None):
+    """Wake this process's workers, starting them on first use; call after the jobs commit.
+
+    `tenant` is the user whose database holds the jobs (tenancy.current()).
+    """
+    with _lock:
+        if _workers["pid"] != os.getpid():          # none yet, or inherited across a fork
+            _workers.update(pid=os.getpid(), wake=threading.Event(), tenants={None})
+            for i in range(app.config["UPLOAD_WORKERS"]):
+                threading.Thread(target=_work, args=(app, _workers["wake"]),
+                                 name=f"uploads-{i}", daemon=True).start()
+        _workers["tenants"].add(tenant)
+        _workers["wake"].set()
+
+
+def _work(app, wake):
+    while True:
+        wake.wait(app.config["UPLOAD_POLL"])
+        wake.clear()
+        with _lock:             # a notify() from here on lands in the fresh set and wakes us again
+            tenants, _workers["tenants"] = _workers["tenants"], {None}
+        for tenant in tenants:
+            try:
+                while run_one(app, tenant):
+                    pass
+            except Exception:
+                log.exception("upload worker failed")
+
+
+def run_one(app, tenant=None):
+    """Claim and process one of `tenant`'s pending jobs; False when its queue is empty."""
+    with app.app_context():
+        g.tenant = tenant
+        db = app.extensions["uploads"]()
+        job = claim(db)
+        if job is None:
+            return False
+        process(db, job)
+        return True
+
+
+def claim(db):
+    job = db.execute("""UPDATE upload_jobs SET status='processing', attempts=attempts+1,
+            updated_at=CURRENT_TIMESTAMP
+        WHERE id = (SELECT id FROM upload_jobs WHERE status='pending'
+                    OR (status='processing' AND updated_at < datetime('now', ?)) ORDER BY id LIMIT 1)
+        RETURNING id, setup_id, user_id, spool_path, filename, attempts""", (STALE,)).fetchone()
+    db.commit()
+    return job
+
+
+def prepare(path, config):
+    """Validate the spooled image; path of the bytes to store (a downscaled copy if it was too big)."""
+    from PIL import Image, UnidentifiedImageError
+    try:
+        with Image.open(path) as im:
+            fmt, (w, h) = im.format, im.size
+            if fmt not in ACCEPTED:
+                raise Rejected(f"{fmt} images aren't accepted")
+            if w * h > config["UPLOAD_MAX_PIXELS"]:
+                raise Rejected(f"image is too large ({w}×{h})")
+            im.verify()
+    except (UnidentifiedImageError, Image.DecompressionBombError, SyntaxError, OSError) as e:
+        raise Rejected("not a readable image") from e
+
+    edge = config["UPLOAD_MAX_EDGE"]
+    if max(w, h) <= edge:
+        return path                 # stored byte for byte
+    with Image.open(path) as im:    # verify() leaves the image unusable
+        im.thumbnail((edge, edge), Image.LANCZOS)
+        fd, out = tempfile.mkstemp(dir=os.path.dirname(path), prefix="scaled-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                im.save(f, format=fmt, **({"optimize": True} if fmt == "PNG" else
+                                          {"quality": 90} if fmt in ("JPEG", "WEBP") else {}))
+        except BaseException:
+            os.unlink(out)
+            raise
+    return out
+
+
+def process(db, job):
+    config = current_app.config
+    try:
+        if not db.execute("SELECT 1 FROM backtest_setups WHERE id=?", (job["setup_id"],)).fetchone():
+            raise Rejected("setup no longer exists")
+        path = prepare(job["spool_path"], config)
+        try:
+            with open(path, "rb") as f:
+                h = image_store.put(db, f)
+        finally:
+            if path != job["spool_path"]:
+                os.unlink(path)
+        shot = db.execute("INSERT INTO backtest_screenshots (setup_id, image_hash, filename) VALUES (?, ?, ?)",
+                          (job["setup_id"], h, job["filename"])).lastrowid
+        finish(db, job, "done", screenshot_id=shot)
+    except Rejected as e:
+        db.rollback()
+        finish(db, job, "failed", error=str(e))
+    except Exception as e:
+        db.rollback()
+        log.exception("upload job %s failed (attempt %s)", job["id"], job["attempts"])
+        if job["attempts"] >= config["UPLOAD_ATTEMPTS"]:
+            finish(db, job, "failed", error="could not be stored")
+        else:
+            db.execute("UPDATE upload_jobs SET status='pending', error=?, updated_at=CURRENT_TIMESTAMP WHERE id=?",
+                       (str(e), job["id"]))
+            db.commit()
+
+
+def finish(db, job, state, error=None, screenshot_id=None):
+    db.execute("""UPDATE upload_jobs SET status=?, error=?, screenshot_id=?, updated_at=CURRENT_TIMESTAMP
+        WHERE id=?""", (state, error, screenshot_id, job["id"]))
+    cache.bump(db, job["user_id"])          # view_setup lists pending uploads
+    db.commit()
+    try:
+        os.unlink(job["spool_path"])
+    except FileNotFoundError:
+        pass